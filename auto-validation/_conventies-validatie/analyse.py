@@ -3,18 +3,33 @@ try:
     from .analyseHtml import checkProject as _checkHtml, HtmlChecks
     from .analyseCss import checkProject as _checkCss, CssChecks
     from .analyseJs import checkProject as _checkJs, JsChecks
+    from .parallel import workers as _workers
+    from .resultCache import setEnabled as _setResultCacheEnabled, isEnabled as _isResultCacheEnabled
+    from .resultRecords import recordOutputFile as _recordOutputFile, emitResults as _emitResults, emitRecords as _emitRecords, readRecords as _readRecords, outputFormats as _recordFormats, getResultRecords as _getResultRecords
+    from .bulkReport import bulkReportFile as _bulkReportFile, getColumns as _getBulkReportColumns, bulkReportFormats as _bulkReportFormats
+    from .profiler import setEnabled as _setProfileEnabled, isEnabled as _isProfileEnabled, instrumentChecks as _instrumentChecks, measure as _measure, profileProject as _profileProject, takeProjectProfile as _takeProjectProfile, addProjectProfile as _addProjectProfile, writeProfile as _writeProfile, formatSlowestFiles as _formatSlowestFiles
 except ImportError:
     ## SCRIPT (when run as script) ##
     from analyseHtml import checkProject as _checkHtml, HtmlChecks
     from analyseCss import checkProject as _checkCss, CssChecks
     from analyseJs import checkProject as _checkJs, JsChecks
+    from parallel import workers as _workers
+    from resultCache import setEnabled as _setResultCacheEnabled, isEnabled as _isResultCacheEnabled
+    from resultRecords import recordOutputFile as _recordOutputFile, emitResults as _emitResults, emitRecords as _emitRecords, readRecords as _readRecords, outputFormats as _recordFormats, getResultRecords as _getResultRecords
+    from bulkReport import bulkReportFile as _bulkReportFile, getColumns as _getBulkReportColumns, bulkReportFormats as _bulkReportFormats
+    from profiler import setEnabled as _setProfileEnabled, isEnabled as _isProfileEnabled, instrumentChecks as _instrumentChecks, measure as _measure, profileProject as _profileProject, takeProjectProfile as _takeProjectProfile, addProjectProfile as _addProjectProfile, writeProfile as _writeProfile, formatSlowestFiles as _formatSlowestFiles
 
 import os
+import sys
+import time
+from collections import Counter
+import signal
 import argparse
+import multiprocessing
+from multiprocessing.connection import wait as _waitForProcesses
 from enum import Enum
 
 # global settings
-excludeDirs = ['auto-validation']
 outputFilenameHtml = 'validatie-01_html-01_kdg-algemeen.txt'
 outputFilenameHtmlProject = 'validatie-01_html-02_kdg-project.txt'
 outputFilenameHtmlInfo = 'validatie-01_html-03_kdg-info.txt'
@@ -24,18 +39,36 @@ outputFilenameCssInfo = 'validatie-02_css-03_kdg-info.txt'
 outputFilenameJs = 'validatie-03_js-01_kdg-algemeen.txt'
 outputFilenameJsProject = 'validatie-03_js-02_kdg-project.txt'
 outputFilenameJsInfo = 'validatie-03_js-03_kdg-info.txt'
+outputFilenameRecords = 'validatie-resultaten' # + '.ndjson' or '.json'
+outputFilenameBulk = 'validatie-bulk' # + '.csv' or '.json' (in the directory of the projects)
+outputFilenameProfile = 'validatie-profiel.json' # --profile (in the directory of the projects)
 okSuffix = '_OK'
 
 checkHtml = True
 checkCss = True
 checkJavaScript = True
 analyseLevel = 1 # = Normal
+cssFastTokenizer = False # css property-checks and duplicatie with cssTokenizer (falls back to cssutils)
+recordFormat = None # 'ndjson' or 'json': also write the results as records (see resultRecords), None = only the text reports
 splitOutputPerCriteria = False
 
+# reports written per checked type (see _writeResultsToOutputDir)
+outputFilenamesPerType = {"html": [outputFilenameHtml, outputFilenameHtmlProject, outputFilenameHtmlInfo],
+                          "css": [outputFilenameCss, outputFilenameCssProject, outputFilenameCssInfo],
+                          "js": [outputFilenameJs, outputFilenameJsInfo]}
+checkTypesPerType = {"html": HtmlChecks, "css": CssChecks, "js": JsChecks}
+
 class AnalyseLevel(Enum):
     Normal = 1
     Full = 2
 
+# js-checks only reported at level Full (skipped, and not parsed for, at level Normal)
+jsFullLevelChecks = [JsChecks.SourceType, JsChecks.StrictMode, JsChecks.UndeclaredVariables]
+def _getJsChecks():
+    if analyseLevel == AnalyseLevel.Full:
+        return None # all
+    return tuple(check for check in JsChecks if not check in jsFullLevelChecks)
+
 def _analyseProject(projectDir):
     #print(f'{projectDir}')
     results = {}
@@ -46,118 +79,119 @@ def _analyseProject(projectDir):
             results["html"] = _checkHtml(projectDir)
         except Exception as e:
             results["html"] = {"error":str(e)}
+            _emitResults([[None, HtmlChecks.Error, str(e)]])
     # CSS
     if checkCss:
         try:
-            results["css"] = _checkCss(projectDir)
+            results["css"] = _checkCss(projectDir, cssFastTokenizer)
         except Exception as e:
             results["css"] = {"error":str(e)}
+            _emitResults([[None, CssChecks.Error, str(e)]])
     # JS
     if checkJavaScript:
         try:
-            results["js"] = _checkJs(projectDir)
+            results["js"] = _checkJs(projectDir, _getJsChecks())
         except Exception as e:
             results["js"] = {"error":str(e)}
+            _emitResults([[None, JsChecks.Error, str(e)]])
 
     return results
 
 
-def _getAllFiles(dir, ext, filenamePrefix = None, recursive = True, ignoreDotDirs = True):
-    files = []
-    for entry in os.listdir(dir):
-        fullPath = os.path.join(dir, entry)
-        if os.path.isdir(fullPath):
-            if ignoreDotDirs and entry.startswith('.'):
-                continue
-            if not entry in excludeDirs and recursive:
-                files += _getAllFiles(fullPath, ext, filenamePrefix, recursive, ignoreDotDirs)
-        elif fullPath.endswith('.'+ext if ext[0] != '.' else ext):
-            if not filenamePrefix or entry.startswith(filenamePrefix):
-                files.append(fullPath)
-    return files
-
-def _clearOutputFile(outputFile):
-    if os.path.exists(outputFile):
-        os.remove(outputFile)
-    # OK-variant
-    outputPathInfo = os.path.split(outputFile)
-    outputFilenameInfo = os.path.splitext(outputPathInfo[1])
-    okOutputFile = os.path.join(outputPathInfo[0], outputFilenameInfo[0]+okSuffix+outputFilenameInfo[1])
-    if os.path.exists(okOutputFile):
-        os.remove(okOutputFile)
-
-def _clearOutputFiles(outputDir):
-    _clearOutputFile(os.path.join(outputDir, outputFilenameHtml))
-    _clearOutputFile(os.path.join(outputDir, outputFilenameHtmlProject))
-    _clearOutputFile(os.path.join(outputDir, outputFilenameHtmlInfo))
-    _clearOutputFile(os.path.join(outputDir, outputFilenameCss))
-    _clearOutputFile(os.path.join(outputDir, outputFilenameCssProject))
-    _clearOutputFile(os.path.join(outputDir, outputFilenameCssInfo))
-    _clearOutputFile(os.path.join(outputDir, outputFilenameJs))
-    _clearOutputFile(os.path.join(outputDir, outputFilenameJsProject))
-    _clearOutputFile(os.path.join(outputDir, outputFilenameJsInfo))
-
-def _getCheckTypeResult(results, checkType, projectLevel=False):
-    return list(filter(lambda r : (r[0] == None if projectLevel else True) and r[1] == checkType, results)) if results else []
-
-def _formatCheckResult(results, title = None, resultIndent = '\t'):
-    output = ''
-    isTitleAdded = False
+def _getRecordsOutputFile(outputDir):
+    return os.path.join(outputDir, f'{outputFilenameRecords}.{recordFormat}') if recordFormat else None
+
+def _clearRecordsOutputFiles(outputDir):
+    for outputFormat in _recordFormats:
+        outputFile = os.path.join(outputDir, f'{outputFilenameRecords}.{outputFormat}')
+        if os.path.exists(outputFile):
+            os.remove(outputFile)
+
+def _getKeptRecords(outputDir):
+    # partial re-check (e.g. --watch): records of the types that are not checked again, from the previous record output
+    keptCheckPrefixes = tuple(f'{checkTypesPerType[checkedType].__name__}.' for checkedType in checkTypesPerType if not checkedType in _getCheckedTypes())
+    if not keptCheckPrefixes:
+        return []
+    for outputFormat in _recordFormats:
+        outputFile = os.path.join(outputDir, f'{outputFilenameRecords}.{outputFormat}')
+        if os.path.exists(outputFile):
+            return [record for record in _readRecords(outputFile) if str(record.get('check')).startswith(keptCheckPrefixes)]
+    return []
+
+def _getCheckTypeIndex(results):
+    # check type => results (in order), grouped once for all reports of an analyser
+    checkTypeIndex = {}
+    if isinstance(results, list): # not {"error": ...} of a failed analyser
+        for result in results:
+            checkTypeIndex.setdefault(result[1], []).append(result)
+    return checkTypeIndex
+
+def _getCheckTypeResult(checkTypeIndex, checkType, projectLevel=False):
+    results = checkTypeIndex.get(checkType, [])
+    return [r for r in results if r[0] == None] if projectLevel else results
+
+def _getCheckResultLines(results, resultIndent = '\t'):
+    lines = []
     if results:
         for result in results:
             if result[2]:
-                if title and not isTitleAdded:
-                    output += f'{title}'+'\n'
-                    isTitleAdded = True
                 if result[0]:
-                    output += f'{result[0]}'+'\n'
+                    lines.append(f'{result[0]}')
                 if type(result[2]) is str:
-                    output += f'{resultIndent}{result[2]}'+'\n'
+                    lines.append(f'{resultIndent}{result[2]}')
                 else:
                     for resultLine in result[2]:
-                        output += f'{resultIndent}{resultLine}'+'\n'
-    return output[:-1]
+                        lines.append(f'{resultIndent}{resultLine}')
+    return lines
 
-def _formatMultipleCriteriaResult(results):
-    outputText = ""
-    # create outputtext
+def _iterMultipleCriteriaResult(results):
+    # generator => the sections of the outputtext, one check at a time (nothing = empty report)
     isFirstCriteriaAdded = False
     for criteria,checks in results.items():
         isCriteriaTitleAdded = False
-        isFirstCheckResultAdded = False
         for check,result in checks.items():
             indent = '\t'
             if type(result) is tuple:
                 indent = result[1]
                 result = result[0]
-            resultFormatted = _formatCheckResult(result, f'*** {check} ***', indent)
-            if resultFormatted:
-                # add criteria-title
-                if not isCriteriaTitleAdded:
-                    if not isFirstCriteriaAdded:
-                        outputText += '=== '+criteria+' ==='+'\n'
-                        isFirstCriteriaAdded = True
-                    else:
-                        outputText += '\n\n'+'=== '+criteria+' ==='+'\n'
-                    isCriteriaTitleAdded = True   
-                # add resultformatted (title+result)
-                if not isFirstCheckResultAdded:
-                    outputText += resultFormatted+'\n'
-                else:
-                    outputText += '\n'+resultFormatted+'\n'
-                isFirstCheckResultAdded = True
-    return outputText
-
-def _writeResultsToOutputFile(outputFile, content):
-    # write outputtext
-    if not content:
-        outputPathInfo = os.path.split(outputFile)
-        outputFilenameInfo = os.path.splitext(outputPathInfo[1])
-        outputFile = os.path.join(outputPathInfo[0], outputFilenameInfo[0]+okSuffix+outputFilenameInfo[1])
-    with open(outputFile, 'a', encoding='utf-8') as output:
-        output.write(content)
+            if not result or not any(checkResult[2] for checkResult in result):
+                continue
+            # add criteria-title
+            if not isCriteriaTitleAdded:
+                yield ('\n\n' if isFirstCriteriaAdded else '')+'=== '+criteria+' ===\n'
+                isFirstCriteriaAdded = True
+                isCriteriaTitleAdded = True
+            else:
+                yield '\n'
+            # add check (title+result)
+            yield '\n'.join([f'*** {check} ***'] + _getCheckResultLines(result, indent))+'\n'
+
+def _getOkOutputFile(outputFile):
+    outputPathInfo = os.path.split(outputFile)
+    outputFilenameInfo = os.path.splitext(outputPathInfo[1])
+    return os.path.join(outputPathInfo[0], outputFilenameInfo[0]+okSuffix+outputFilenameInfo[1])
+
+def _writeResultsToOutputFile(outputFile, contentParts):
+    # stream outputtext to a temp file, then rename it to the report (or its OK-variant if empty):
+    # a report is always complete (old or new), the other variant is removed
+    okOutputFile = _getOkOutputFile(outputFile)
+    tempFile = os.path.join(os.path.dirname(outputFile), f'.{os.path.basename(outputFile)}.{os.getpid()}.tmp')
+    try:
+        with open(tempFile, 'w', encoding='utf-8') as output:
+            for part in contentParts:
+                output.write(part)
+            isEmpty = output.tell() == 0
+        os.replace(tempFile, okOutputFile if isEmpty else outputFile)
+    except BaseException:
+        if os.path.exists(tempFile):
+            os.remove(tempFile)
+        raise
+    staleOutputFile = outputFile if isEmpty else okOutputFile
+    if os.path.exists(staleOutputFile):
+        os.remove(staleOutputFile)
 
 def _writeHtmlResultsToOutputDir(outputDir, results):
+    checkTypeResults = _getCheckTypeIndex(results)
     criteriaList = []
     # OUTPUTFILE: validatie-html-kdg.txt
     outputFile = os.path.join(outputDir, outputFilenameHtml)
@@ -165,22 +199,22 @@ def _writeHtmlResultsToOutputDir(outputDir, results):
     # Algemeen
     criteria = 'HTML_Geldige HTML'
     output = {}
-    output['Error'] = _getCheckTypeResult(results, HtmlChecks.Error)
-    output['Invalide basis structuur'] = _getCheckTypeResult(results, HtmlChecks.BaseStructure)
-    output['Code buiten body'] = _getCheckTypeResult(results, HtmlChecks.OutsideBody)
+    output['Error'] = _getCheckTypeResult(checkTypeResults, HtmlChecks.Error)
+    output['Invalide basis structuur'] = _getCheckTypeResult(checkTypeResults, HtmlChecks.BaseStructure)
+    output['Code buiten body'] = _getCheckTypeResult(checkTypeResults, HtmlChecks.OutsideBody)
     resultsStructured[criteria] = output
     # Semantics
     criteria = 'HTML_Semantiek_tags'
     output = {}
-    output['Ongeldige tags'] = _getCheckTypeResult(results, HtmlChecks.ForbiddenTags)
-    output['Geneste \'article\''] = _getCheckTypeResult(results, HtmlChecks.NestedArticles)
+    output['Ongeldige tags'] = _getCheckTypeResult(checkTypeResults, HtmlChecks.ForbiddenTags)
+    output['Geneste \'article\''] = _getCheckTypeResult(checkTypeResults, HtmlChecks.NestedArticles)
     resultsStructured[criteria] = output
     # Afbeeldingen
     criteria = 'HTML_Afbeeldingen_afmeting'
     output = {}
-    output['onjuist_herschalen'] = _getCheckTypeResult(results, HtmlChecks.ImageScaling)
+    output['onjuist_herschalen'] = _getCheckTypeResult(checkTypeResults, HtmlChecks.ImageScaling)
     resultsStructured[criteria] = output
-    _writeResultsToOutputFile(outputFile, _formatMultipleCriteriaResult(resultsStructured))
+    _writeResultsToOutputFile(outputFile, _iterMultipleCriteriaResult(resultsStructured))
 
     # OUTPUTFILE: validatie-html-kdg-project.txt
     outputFile = os.path.join(outputDir, outputFilenameHtmlProject)
@@ -188,9 +222,9 @@ def _writeHtmlResultsToOutputDir(outputDir, results):
     # Semantics
     criteria = 'HTML_Semantiek_inhoud'
     output = {}
-    output['Main'] = _getCheckTypeResult(results, HtmlChecks.Main)
+    output['Main'] = _getCheckTypeResult(checkTypeResults, HtmlChecks.Main)
     resultsStructured[criteria] = output
-    _writeResultsToOutputFile(outputFile, _formatMultipleCriteriaResult(resultsStructured))
+    _writeResultsToOutputFile(outputFile, _iterMultipleCriteriaResult(resultsStructured))
 
     # OUTPUTFILE: validatie-html-kdg-info.txt
     outputFile = os.path.join(outputDir, outputFilenameHtmlInfo)
@@ -198,56 +232,57 @@ def _writeHtmlResultsToOutputDir(outputDir, results):
     # Semantics
     criteria = 'HTML_Semantiek_inhoud'
     output = {}
-    output['Semi-verboden_tags'] = _getCheckTypeResult(results, HtmlChecks.SemiForbiddenTags)
+    output['Semi-verboden_tags'] = _getCheckTypeResult(checkTypeResults, HtmlChecks.SemiForbiddenTags)
     if analyseLevel == AnalyseLevel.Full:
-        output['page_title_and_h1'] = _getCheckTypeResult(results, HtmlChecks.PageTitleAndH1Info)
-        output['img_alt'] = _getCheckTypeResult(results, HtmlChecks.ImageAltInfo)
-        output['specific_semantic_tags'] = _getCheckTypeResult(results, HtmlChecks.SemanticTags, projectLevel=True)
+        output['page_title_and_h1'] = _getCheckTypeResult(checkTypeResults, HtmlChecks.PageTitleAndH1Info)
+        output['img_alt'] = _getCheckTypeResult(checkTypeResults, HtmlChecks.ImageAltInfo)
+        output['specific_semantic_tags'] = _getCheckTypeResult(checkTypeResults, HtmlChecks.SemanticTags, projectLevel=True)
     resultsStructured[criteria] = output
     # Formulieren
     criteria = 'HTML_Form_inhoud'
     output = {}
     if analyseLevel == AnalyseLevel.Full:
-        output['input, select, textarea'] = _getCheckTypeResult(results, HtmlChecks.FormInputTypes)
-        output['validatie attributen'] = _getCheckTypeResult(results, HtmlChecks.FormInputValidation)
+        output['input, select, textarea'] = _getCheckTypeResult(checkTypeResults, HtmlChecks.FormInputTypes)
+        output['validatie attributen'] = _getCheckTypeResult(checkTypeResults, HtmlChecks.FormInputValidation)
     resultsStructured[criteria] = output
     criteria = 'HTML_Form_tags'
     output = {}
     if analyseLevel == AnalyseLevel.Full:
-        output['Ontbrekend name-attribuut'] = _getCheckTypeResult(results, HtmlChecks.FormInputNameAttr)
+        output['Ontbrekend name-attribuut'] = _getCheckTypeResult(checkTypeResults, HtmlChecks.FormInputNameAttr)
     resultsStructured[criteria] = output
     # # Summary
     # criteria = 'HTML_Overzicht'
     # output = {}
     # if analyseLevel == AnalyseLevel.Full:
-    #     outputResults = _getCheckTypeResult(results, HtmlChecks.FormInputNameAttr, projectLevel=True)
+    #     outputResults = _getCheckTypeResult(checkTypeResults, HtmlChecks.FormInputNameAttr, projectLevel=True)
     #     output[None] = (outputResults, '')
     # resultsStructured[criteria] = output
-    _writeResultsToOutputFile(outputFile, _formatMultipleCriteriaResult(resultsStructured))
+    _writeResultsToOutputFile(outputFile, _iterMultipleCriteriaResult(resultsStructured))
 
 def _writeCssResultsToOutputDir(outputDir, results):
+    checkTypeResults = _getCheckTypeIndex(results)
     # OUTPUTFILE: validatie-css-kdg.txt
     outputFile = os.path.join(outputDir, outputFilenameCss)
     resultsStructured = {}
     # Algemeen
     criteria = 'CSS_Geldige CSS'
     output = {}
-    output['Error'] = _getCheckTypeResult(results, CssChecks.Error)
-    output['Verboden properties/eigenschappen'] = _getCheckTypeResult(results, CssChecks.ForbiddenProperties)
+    output['Error'] = _getCheckTypeResult(checkTypeResults, CssChecks.Error)
+    output['Verboden properties/eigenschappen'] = _getCheckTypeResult(checkTypeResults, CssChecks.ForbiddenProperties)
     resultsStructured[criteria] = output
     # Libraries
     criteria = 'CSS_Libraries CSS'
     output = {}
-    output['CSS Links'] = _getCheckTypeResult(results, CssChecks.ExternStylesHttp)
+    output['CSS Links'] = _getCheckTypeResult(checkTypeResults, CssChecks.ExternStylesHttp)
     resultsStructured[criteria] = output
     # Files
     criteria = 'CSS_Bestanden CSS'
     output = {}
-    output['Error HTML'] = _getCheckTypeResult(results, CssChecks.ErrorHtml)
-    output['Intern styles: <style>...</style>'] = _getCheckTypeResult(results, CssChecks.InternStyles)
-    output['Inline styles: style="..."'] = _getCheckTypeResult(results, CssChecks.InlineStyles)
+    output['Error HTML'] = _getCheckTypeResult(checkTypeResults, CssChecks.ErrorHtml)
+    output['Intern styles: <style>...</style>'] = _getCheckTypeResult(checkTypeResults, CssChecks.InternStyles)
+    output['Inline styles: style="..."'] = _getCheckTypeResult(checkTypeResults, CssChecks.InlineStyles)
     resultsStructured[criteria] = output
-    _writeResultsToOutputFile(outputFile, _formatMultipleCriteriaResult(resultsStructured))
+    _writeResultsToOutputFile(outputFile, _iterMultipleCriteriaResult(resultsStructured))
 
     # OUTPUTFILE: validatie-css-kdg-project.txt
     outputFile = os.path.join(outputDir, outputFilenameCssProject)
@@ -256,9 +291,9 @@ def _writeCssResultsToOutputDir(outputDir, results):
     criteria = 'CSS_Verborgen titels'
     output = {}
     if analyseLevel == AnalyseLevel.Full:
-        output['Verborgen titels'] = _getCheckTypeResult(results, CssChecks.HiddenTitle)
+        output['Verborgen titels'] = _getCheckTypeResult(checkTypeResults, CssChecks.HiddenTitle)
     resultsStructured[criteria] = output
-    _writeResultsToOutputFile(outputFile, _formatMultipleCriteriaResult(resultsStructured))
+    _writeResultsToOutputFile(outputFile, _iterMultipleCriteriaResult(resultsStructured))
 
     # OUTPUTFILE: validatie-css-kdg-info.txt
     outputFile = os.path.join(outputDir, outputFilenameCssInfo)
@@ -267,69 +302,70 @@ def _writeCssResultsToOutputDir(outputDir, results):
     criteria = 'CSS_Geldige CSS'
     output = {}
     if analyseLevel == AnalyseLevel.Full:
-        output['Semi-verboden properties/eigenschappen'] = _getCheckTypeResult(results, CssChecks.SemiForbiddenProperties)
+        output['Semi-verboden properties/eigenschappen'] = _getCheckTypeResult(checkTypeResults, CssChecks.SemiForbiddenProperties)
     resultsStructured[criteria] = output
     # Files
     criteria = 'CSS_Bestanden CSS'
     output = {}
     if analyseLevel == AnalyseLevel.Full:
-        output['CSS Links'] = _getCheckTypeResult(results, CssChecks.ExternStylesLocal)
+        output['CSS Links'] = _getCheckTypeResult(checkTypeResults, CssChecks.ExternStylesLocal)
     resultsStructured[criteria] = output
     # Lay-out
     criteria = 'CSS_Lay-out'
     output = {}
     if analyseLevel == AnalyseLevel.Full:
-        output['Flexbox'] = _getCheckTypeResult(results, CssChecks.Flexbox)
+        output['Flexbox'] = _getCheckTypeResult(checkTypeResults, CssChecks.Flexbox)
     resultsStructured[criteria] = output
     # Lay-out Grid
     criteria = 'CSS_Lay-out_Grid'
     output = {}
     if analyseLevel == AnalyseLevel.Full:
-        output['Grid'] = _getCheckTypeResult(results, CssChecks.Grid)
+        output['Grid'] = _getCheckTypeResult(checkTypeResults, CssChecks.Grid)
     resultsStructured[criteria] = output
     # Duplicatie
     criteria = 'CSS_Duplicatie'
     output = {}
-    outputResults = _getCheckTypeResult(results, CssChecks.DuplicatesOnSelectorLevel)
+    outputResults = _getCheckTypeResult(checkTypeResults, CssChecks.DuplicatesOnSelectorLevel)
     output['selector/property/value combinatie'] = (outputResults, '')
-    outputResults = _getCheckTypeResult(results, CssChecks.DuplicatesOnPropertyLevel)
+    outputResults = _getCheckTypeResult(checkTypeResults, CssChecks.DuplicatesOnPropertyLevel)
     output['property/value combinatie'] = (outputResults, '')
     resultsStructured[criteria] = output
     # Comments
     # criteria = 'CSS_Commentaar'
     # output = {}
     # if AnalyseLevel.Full:
-    #     output['Comments'] = _getCheckTypeResult(results, CssChecks.Comments)
+    #     output['Comments'] = _getCheckTypeResult(checkTypeResults, CssChecks.Comments)
     # resultsStructured[criteria] = output
-    _writeResultsToOutputFile(outputFile, _formatMultipleCriteriaResult(resultsStructured))
+    _writeResultsToOutputFile(outputFile, _iterMultipleCriteriaResult(resultsStructured))
 
 def _writeJsResultsToOutputDir(outputDir, results):
+    checkTypeResults = _getCheckTypeIndex(results)
     # OUTPUTFILE: validatie-js-kdg.txt
     outputFile = os.path.join(outputDir, outputFilenameJs)
     resultsStructured = {}
     # Algemeen
     criteria = 'JS_Geldige JS'
     output = {}
-    output['Error'] = _getCheckTypeResult(results, JsChecks.Error)
+    output['Error'] = _getCheckTypeResult(checkTypeResults, JsChecks.Error)
     resultsStructured[criteria] = output
     # Files
     criteria = 'JS_Bestanden JS'
     output = {}
-    output['Error HTML'] = _getCheckTypeResult(results, JsChecks.ErrorHtml)
-    output['Intern: <script>...</script>'] = _getCheckTypeResult(results, JsChecks.InternScript)
+    output['Error HTML'] = _getCheckTypeResult(checkTypeResults, JsChecks.ErrorHtml)
+    output['Intern: <script>...</script>'] = _getCheckTypeResult(checkTypeResults, JsChecks.InternScript)
     resultsStructured[criteria] = output
     # Variables
     criteria = 'JS_Variabelen'
     output = {}
-    output['All "var" declared variables'] = _getCheckTypeResult(results, JsChecks.VarVariables)
+    output['All "var" declared variables'] = _getCheckTypeResult(checkTypeResults, JsChecks.VarVariables)
     resultsStructured[criteria] = output
     # Events
     criteria = 'JS_Events'
     output = {}
-    output['Html-attribute event-handling: on...="..."'] = _getCheckTypeResult(results, JsChecks.EventAttributeHandling)
-    output['DOM Events Level 0: <element>.on... = ...'] = _getCheckTypeResult(results, JsChecks.EventLevelHandling)
+    output['Html-attribute event-handling: on...="..."'] = _getCheckTypeResult(checkTypeResults, JsChecks.EventAttributeHandling)
+    output['DOM Events Level 0: <element>.on... = ...'] = _getCheckTypeResult(checkTypeResults, JsChecks.EventLevelHandling)
     resultsStructured[criteria] = output
-    _writeResultsToOutputFile(outputFile, _formatMultipleCriteriaResult(resultsStructured))
+    _writeResultsToOutputFile(outputFile, _iterMultipleCriteriaResult(resultsStructured))
 
     # OUTPUTFILE: validatie-js-kdg-info.txt
     outputFile = os.path.join(outputDir, outputFilenameJsInfo)
@@ -338,43 +374,190 @@ def _writeJsResultsToOutputDir(outputDir, results):
     criteria = 'JS_Algemeen'
     output = {}
     if analyseLevel == AnalyseLevel.Full:
-        output['script type'] = _getCheckTypeResult(results, JsChecks.SourceType)
-        output['strict-mode'] = _getCheckTypeResult(results, JsChecks.StrictMode)
+        output['script type'] = _getCheckTypeResult(checkTypeResults, JsChecks.SourceType)
+        output['strict-mode'] = _getCheckTypeResult(checkTypeResults, JsChecks.StrictMode)
     resultsStructured[criteria] = output
     criteria = 'JS_Variabelen'
     output = {}
-    output['Global declared variables'] = _getCheckTypeResult(results, JsChecks.GlobalVariables)
+    output['Global declared variables'] = _getCheckTypeResult(checkTypeResults, JsChecks.GlobalVariables)
     if analyseLevel == AnalyseLevel.Full:
-        output['Undeclared/leaked variables'] = _getCheckTypeResult(results, JsChecks.UndeclaredVariables)
+        output['Undeclared/leaked variables'] = _getCheckTypeResult(checkTypeResults, JsChecks.UndeclaredVariables)
     resultsStructured[criteria] = output
-    _writeResultsToOutputFile(outputFile, _formatMultipleCriteriaResult(resultsStructured))
+    _writeResultsToOutputFile(outputFile, _iterMultipleCriteriaResult(resultsStructured))
 
 
 def _writeResultsToOutputDir(outputDir, results):
-    _writeHtmlResultsToOutputDir(outputDir, results["html"])
-    _writeCssResultsToOutputDir(outputDir, results["css"])
-    _writeJsResultsToOutputDir(outputDir, results["js"])
+    # only the reports of the checked types
+    with _measure('write'):
+        if "html" in results:
+            _writeHtmlResultsToOutputDir(outputDir, results["html"])
+        if "css" in results:
+            _writeCssResultsToOutputDir(outputDir, results["css"])
+        if "js" in results:
+            _writeJsResultsToOutputDir(outputDir, results["js"])
+
+def _analyseProjectToOutputDir(projectDir, jobs = 1, outputToFile = True):
+    # analyse + reports and records of the checked types (records of the other types are kept, as are their reports)
+    keptRecords = _getKeptRecords(projectDir) if recordFormat else []
+    if outputToFile: _clearRecordsOutputFiles(projectDir)
+    with _profileProject(projectDir):
+        with _workers(jobs), _recordOutputFile(_getRecordsOutputFile(projectDir), recordFormat):
+            _emitRecords(keptRecords)
+            results = _analyseProject(projectDir)
+        if outputToFile: _writeResultsToOutputDir(projectDir, results)
+    return results
 
 
 ## MODULE (whem imported as module) ##
-def analyse(projectDir, html=True, css=True, js=True, level = AnalyseLevel.Normal, outputToFile=True):
+def analyse(projectDir, html=True, css=True, js=True, level = AnalyseLevel.Normal, outputToFile=True, jobs=1, fastCss=False, outputFormat=None):
+    # outputFormat: 'ndjson' or 'json' => results also as records in validatie-resultaten.<outputFormat>
     global singleProjectDirName, doBulkProjectsCheck
     global checkHtml, checkCss, checkJavaScript
-    global analyseLevel
+    global analyseLevel, cssFastTokenizer, recordFormat
     singleProjectDirName = None
     doBulkProjectsCheck = False
     checkHtml = html
     checkCss = css
     checkJavaScript = js
     analyseLevel = level
+    cssFastTokenizer = fastCss
+    recordFormat = outputFormat if outputToFile else None
 
-    if outputToFile: _clearOutputFiles(projectDir)
-    results = _analyseProject(projectDir)
-    if outputToFile: _writeResultsToOutputDir(projectDir, results)
-    return results
+    return _analyseProjectToOutputDir(projectDir, jobs, outputToFile)
 
 
 ## MAIN (executed as standalone script) ##
+def _enableProfile():
+    # measure the phases of the run + every _check* function of the analysers (see profiler)
+    _setProfileEnabled(True)
+    for checkProject in (_checkHtml, _checkCss, _checkJs):
+        _instrumentChecks(sys.modules[checkProject.__module__])
+
+def _getCheckedTypes():
+    return [checkedType for checkedType, isChecked in (("html", checkHtml), ("css", checkCss), ("js", checkJavaScript)) if isChecked]
+
+def _getBulkColumns():
+    # columns of the bulk report: reports and checks of the checked types
+    checkedTypes = _getCheckedTypes()
+    reportNames = [os.path.splitext(outputFilename)[0] for checkedType in checkedTypes for outputFilename in outputFilenamesPerType[checkedType]]
+    return _getBulkReportColumns(reportNames, [checkType for checkedType in checkedTypes for checkType in checkTypesPerType[checkedType]])
+
+def _getProjectSummary(outputDir, results):
+    # row of the bulk report (without project and status): OK/NOK per written report + number of results per check
+    summary = {}
+    for checkedType, checkResults in results.items():
+        for outputFilename in outputFilenamesPerType[checkedType]:
+            outputFile = os.path.join(outputDir, outputFilename)
+            summary[os.path.splitext(outputFilename)[0]] = 'NOK' if os.path.exists(outputFile) else 'OK' if os.path.exists(_getOkOutputFile(outputFile)) else ''
+        checkCounts = Counter()
+        if isinstance(checkResults, list):
+            for record in _getResultRecords(checkResults):
+                checkCounts[record.check] += 1
+        else: # {"error": ...} of a failed analyser
+            checkCounts[checkTypesPerType[checkedType].Error] += 1
+        for checkType in checkTypesPerType[checkedType]:
+            summary[str(checkType)] = checkCounts[checkType]
+    return summary
+
+def _analyseProjectInProcess(projectDir, settings, jobs, summarySender = None):
+    # runs in a separate process (per project) => set settings of parent process
+    if hasattr(os, 'setpgrp'):
+        os.setpgrp() # own process group, so a timeout also stops the worker processes of this project
+    global checkHtml, checkCss, checkJavaScript
+    global analyseLevel, cssFastTokenizer, recordFormat
+    (checkHtml, checkCss, checkJavaScript, analyseLevel, cssFastTokenizer, recordFormat, isResultCacheEnabled, isProfileEnabled) = settings
+    _setResultCacheEnabled(isResultCacheEnabled)
+    if isProfileEnabled:
+        _enableProfile()
+    results = _analyseProjectToOutputDir(projectDir, jobs)
+    if summarySender:
+        summarySender.send((_getProjectSummary(projectDir, results), _takeProjectProfile(projectDir)))
+        summarySender.close()
+
+def _writeErrorToOutputDir(outputDir, error):
+    # project could not be analysed (crash/timeout) => error in all reports of the checked types (instead of stale reports)
+    keptRecords = _getKeptRecords(outputDir) if recordFormat else []
+    _clearRecordsOutputFiles(outputDir)
+    results = {}
+    for checkedType in _getCheckedTypes():
+        results[checkedType] = [[None, checkTypesPerType[checkedType].Error, error]]
+    _writeResultsToOutputDir(outputDir, results)
+    with _recordOutputFile(_getRecordsOutputFile(outputDir), recordFormat):
+        _emitRecords(keptRecords)
+        for checkResults in results.values():
+            _emitResults(checkResults)
+    return _getProjectSummary(outputDir, results)
+
+def _killProcess(process):
+    # kill process and its worker processes
+    try:
+        os.killpg(process.pid, signal.SIGKILL)
+    except (AttributeError, OSError): # no process groups (Windows) or group not created (yet)
+        process.kill()
+
+def _analyseProjectsInBulk(projectDirs, workers=1, timeout=None, jobs=1, writeBulkRow=None):
+    # every project in its own process: a crashing or hanging project doesn't stop the others
+    # writeBulkRow(row): called (in this process) as soon as a project is done, with its summary
+    # (--profile: the profile of a project is added to the one of this process)
+    if not workers or workers < 1:
+        workers = os.cpu_count() or 1 # 0 = all cpu's
+    settings = (checkHtml, checkCss, checkJavaScript, analyseLevel, cssFastTokenizer, recordFormat, _isResultCacheEnabled(), _isProfileEnabled())
+    pendingProjectDirs = list(projectDirs)
+    runningProcesses = {} # sentinel => (process, projectDir, startTime, summaryReceiver)
+    receivedSummaries = {} # sentinel => (summary, profile) sent by the project process
+    try:
+        while pendingProjectDirs or runningProcesses:
+            # start projects
+            while pendingProjectDirs and len(runningProcesses) < workers:
+                projectDir = pendingProjectDirs.pop(0)
+                (summaryReceiver, summarySender) = multiprocessing.Pipe(duplex=False)
+                process = multiprocessing.Process(target=_analyseProjectInProcess, args=(projectDir, settings, jobs, summarySender))
+                process.start()
+                summarySender.close() # (copy of the project process)
+                runningProcesses[process.sentinel] = (process, projectDir, time.monotonic(), summaryReceiver)
+            # wait for (at least) one project to finish or to time out
+            waitTimeout = None
+            if timeout:
+                firstStartTime = min(startTime for (_, _, startTime, _) in runningProcesses.values())
+                waitTimeout = max(0, firstStartTime + timeout - time.monotonic())
+            # (and for summaries: a summary larger than the pipe buffer blocks the project process until it's read)
+            _waitForProcesses(list(runningProcesses) + [summaryReceiver for (_, _, _, summaryReceiver) in runningProcesses.values() if not summaryReceiver.closed], waitTimeout)
+            for sentinel, (process, projectDir, startTime, summaryReceiver) in list(runningProcesses.items()):
+                if not summaryReceiver.closed and summaryReceiver.poll():
+                    try:
+                        receivedSummaries[sentinel] = summaryReceiver.recv()
+                    except EOFError: # project process ended without summary
+                        pass
+                    summaryReceiver.close()
+                error = None
+                if process.is_alive():
+                    if not timeout or time.monotonic() - startTime < timeout:
+                        continue
+                    _killProcess(process)
+                    if not sentinel in receivedSummaries: # (reports are written before the summary is sent)
+                        error = f'Error while processing project... Timeout: not finished within {timeout} seconds'
+                elif process.exitcode != 0:
+                    _killProcess(process) # remaining worker processes
+                    error = f'Error while processing project... Crash: exit code {process.exitcode}'
+                (summary, projectProfile) = receivedSummaries.pop(sentinel, (None, None))
+                if error:
+                    summary = None
+                _addProjectProfile(projectDir, projectProfile)
+                process.join()
+                summaryReceiver.close()
+                del runningProcesses[sentinel]
+                if error:
+                    print(f'{projectDir}: {error}')
+                    summary = _writeErrorToOutputDir(projectDir, error)
+                if writeBulkRow:
+                    writeBulkRow({'project': os.path.basename(projectDir), 'status': error if error else 'OK', **(summary or {})})
+    finally:
+        # interrupted (e.g. ctrl-c) => stop running projects
+        for (process, _, _, summaryReceiver) in runningProcesses.values():
+            _killProcess(process)
+            summaryReceiver.close()
+
+
 def main():
     # script execution arguments
     parser = argparse.ArgumentParser()
@@ -384,37 +567,55 @@ def main():
     parser.add_argument('--css', help='Do CSS-check', action='store_true')
     parser.add_argument('--js', help='Do JS-check', action='store_true')
     parser.add_argument('--extended', help='Execute ALL checks, this includes informational checks!', action='store_true')
+    parser.add_argument('--jobs', help='Number of worker processes for the per-file checks (0 = all cpu\'s)', action='store', type=int, default=1)
+    parser.add_argument('--workers', help='Number of projects checked in parallel with --bulk (0 = all cpu\'s)', action='store', type=int, default=1)
+    parser.add_argument('--timeout', help='Max. seconds per project with --bulk', action='store', type=float)
+    parser.add_argument('--no-cache', help='Don\'t use (or fill) the cache of per-file results', action='store_true')
+    parser.add_argument('--fast-css', help='Read the css-rules for the property-checks and duplicatie with the fast tokenizer (falls back to cssutils)', action='store_true')
+    parser.add_argument('--bulk-report', help='Format of the consolidated report of --bulk (validatie-bulk.csv/.json: a row per project)', action='store', choices=_bulkReportFormats, default='csv')
+    parser.add_argument('--profile', help='Time the phases of the run (scan, parse, checks, write) per project and file => validatie-profiel.json + the N slowest files', action='store', nargs='?', type=int, const=10, metavar='N')
+    parser.add_argument('--format', help='Also write the results as records (file, check, line, column, message) to validatie-resultaten.ndjson/.json', action='store', choices=_recordFormats)
     args = parser.parse_args()
     
     global singleProjectDirName, doBulkProjectsCheck
     global checkHtml, checkCss, checkJavaScript
-    global analyseLevel
+    global analyseLevel, cssFastTokenizer, recordFormat
     singleProjectDirName = args.project if args.project else None
     doBulkProjectsCheck = True if args.bulk else False
     checkHtml = True if args.html else False
     checkCss = True if args.css else False
     checkJavaScript = True if args.js else False
     doExtendedCheck = True if args.extended else False
+    cssFastTokenizer = args.fast_css
+    recordFormat = args.format
+    _setResultCacheEnabled(not args.no_cache)
+    if args.profile is not None:
+        _enableProfile()
     
     # run main
     scriptDir = os.getcwd() # os.path.realpath(os.path.dirname(__file__))
     projectsBaseDir = scriptDir
     analyseLevel = AnalyseLevel.Full if doExtendedCheck else AnalyseLevel.Normal
     if doBulkProjectsCheck:
+        projectDirs = []
         for entry in os.listdir(projectsBaseDir):
             fullPath = os.path.join(projectsBaseDir, entry)
             if os.path.isdir(fullPath):
                 if entry.startswith('.'):
                     continue
-                _clearOutputFiles(fullPath)
-                results = _analyseProject(fullPath)
-                _writeResultsToOutputDir(fullPath, results)
+                projectDirs.append(fullPath)
+        bulkReportFile = os.path.join(projectsBaseDir, f'{outputFilenameBulk}.{args.bulk_report}')
+        with _bulkReportFile(bulkReportFile, args.bulk_report, _getBulkColumns()) as writeBulkRow:
+            _analyseProjectsInBulk(projectDirs, workers=args.workers, timeout=args.timeout, jobs=args.jobs, writeBulkRow=writeBulkRow)
     else:
         fullPath = projectsBaseDir if not singleProjectDirName else os.path.join(projectsBaseDir, singleProjectDirName)
         if os.path.isdir(fullPath):
-            _clearOutputFiles(fullPath)
-            results = _analyseProject(fullPath)
-            _writeResultsToOutputDir(fullPath, results)
+            _analyseProjectToOutputDir(fullPath, args.jobs)
+    if args.profile is not None:
+        profileFile = os.path.join(projectsBaseDir, outputFilenameProfile)
+        _writeProfile(profileFile, args.profile)
+        print(f'== Profile: {profileFile} ==')
+        print(_formatSlowestFiles(args.profile))
 
 if __name__ == "__main__":
     main()
@@ -2,8 +2,29 @@
 
 #v0.4
 
+try:
+    ## MODULE (when loaded as module) ##
+    from .documentStore import getParsedHtmlDocument as _getParsedHtmlDocument
+    from .htmlEvents import visitHtmlTags as _visitHtmlTags
+    from .parallel import mapFiles as _mapFiles
+    from .resultRecords import emitResults as _emitResults
+    from .projectFiles import getFiles as _getFiles
+    from .profiler import measure as _measure
+    from .cssTokenizer import tokenizeStyleRules as _tokenizeStyleRules, readStylesheet as _readStylesheet, CssTokenizeError, CommentTokens as _CommentTokens
+except ImportError:
+    ## SCRIPT (when run as script) ##
+    from documentStore import getParsedHtmlDocument as _getParsedHtmlDocument
+    from htmlEvents import visitHtmlTags as _visitHtmlTags
+    from parallel import mapFiles as _mapFiles
+    from resultRecords import emitResults as _emitResults
+    from projectFiles import getFiles as _getFiles
+    from profiler import measure as _measure
+    from cssTokenizer import tokenizeStyleRules as _tokenizeStyleRules, readStylesheet as _readStylesheet, CssTokenizeError, CommentTokens as _CommentTokens
+
 import os
+import sys
 import re #regex
+import heapq
 import cssutils # pip install cssutils
 import bs4 # pip install beautifulsoup4
 from enum import Enum
@@ -14,6 +35,7 @@ doCheckSubFolders = True
 excludeDirs = ['auto-validation','__MACOSX']
 excludeDotDirs = True # directories whose names begin with '.'
 projectBaseDir = '' # needed to get relative paths of project-files
+duplicatesTopCount = None # max. number of reported duplicates per check (None = all)
 
 # enum CSS-checks
 class CssChecks(Enum):
@@ -25,7 +47,24 @@ class CssChecks(Enum):
     DuplicatesOnSelectorLevel = 91; DuplicatesOnPropertyLevel = 92
 
 # custom types
-PropertyInfo = namedtuple('PropertyInfo', ['cssFilename', 'selector', 'property', 'value'])
+PropertyInfo = namedtuple('PropertyInfo', ['cssFilename', 'selector', 'property', 'value', 'line'])
+StyleRule = namedtuple('StyleRule', ['selector', 'line', 'properties']) # properties: [(name, value, line)], line None = unknown (cssutils)
+PropertyCheck = namedtuple('PropertyCheck', ['properties', 'styleRuleRequiresAllProperties'])
+PropertyMatcher = namedtuple('PropertyMatcher', ['conditions', 'checkConditions', 'matches']) # conditions: [(nameMatch, valueMatch)], checkConditions: check => [condition index], matches: (name, value) => condition indexes
+CssPropertyIndex = namedtuple('CssPropertyIndex', ['properties', 'groups']) # groups: uniqueness => {unique identifier: [PropertyInfo]}
+
+# property-checks: wanted properties as 'name', 'name:value' or ':value' ('*' = wildcard)
+propertyChecks = {
+    # check for selector with css-properties: 'position:absolute','width:1px','height:1px','left:-10000px','float:hidden'
+    CssChecks.HiddenTitle: PropertyCheck(['position:absolute','width','height','left','overflow:hidden'], True),
+    CssChecks.SemiForbiddenProperties: PropertyCheck(['overflow'], False),
+    CssChecks.ForbiddenProperties: PropertyCheck(['float', ':*!important'], False),
+    # check for selector with css-properties: 'display:grid','display:inline-grid','grid','grid-template-*','grid-area','justify-*','align-*','place-*','*gap'
+    CssChecks.Grid: PropertyCheck(['display:grid','display:inline-grid','grid','grid-template-*','grid-area'], False),
+    # check for selector with css-properties: 'display:flex','display:inline-flex','flex','flex-*','order','justify-*','align-*','*-gap'
+    CssChecks.Flexbox: PropertyCheck(['display:flex','display:inline-flex','flex','flex-*','order'], False),
+}
+propertyMatcher = None # compiled propertyChecks
 
 
 ## CSS files ##
@@ -37,19 +76,96 @@ def _parseCssFile(cssFile):
     if fileName in parsedCssFiles:
         sheet = parsedCssFiles[fileName]
     else:
-        sheet = cssutils.parseFile(cssFile, validate = False)
+        with _measure('parse.css', cssFile):
+            sheet = cssutils.parseFile(cssFile, validate = False)
         parsedCssFiles[fileName] = sheet
     return sheet
 
-def _flattenCssFile(cssFile):
-    cssFlatMap = []
-    fileName = os.path.relpath(cssFile, projectBaseDir)
+def _getStyleRulesOfSheet(cssFile):
+    # cssutils: full CSSOM
+    styleRules = []
     sheet = _parseCssFile(cssFile)
     for cssStyleRule in sheet.cssRules.rulesOfType(cssutils.css.CSSRule.STYLE_RULE):
-        selector = cssStyleRule.selectorText
-        declarationBlock = cssStyleRule.style
-        for property in declarationBlock.getProperties(all=True):
-            cssFlatMap.append(PropertyInfo(fileName, selector, property.name, property.value))
+        properties = [(property.name, property.value, None) for property in cssStyleRule.style.getProperties(all=True)]
+        styleRules.append(StyleRule(cssStyleRule.selectorText, None, properties))
+    return styleRules
+normalizedSelectors = {} # raw selector => selectorText of cssutils (None = invalid)
+normalizedDeclarations = {} # raw declaration => [(name, value, cssText)] of cssutils
+def _normalizeSelector(selector):
+    if not selector in normalizedSelectors:
+        try:
+            normalizedSelectors[selector] = cssutils.css.SelectorList(selectorText=selector).selectorText
+        except Exception as exc: # invalid selector => rule is skipped and logged (as by cssutils)
+            cssutils.log.error(str(exc), neverraise=True)
+            cssutils.log.error(f'SelectorList: Invalid Selector: {selector}', neverraise=True)
+            normalizedSelectors[selector] = None
+    return normalizedSelectors[selector]
+def _normalizeDeclaration(declaration):
+    if not declaration in normalizedDeclarations:
+        declarationBlock = cssutils.parseStyle(declaration, validate = False)
+        normalizedDeclarations[declaration] = [(property.name, property.value, property.cssText) for property in declarationBlock.getProperties(all=True)]
+    return normalizedDeclarations[declaration]
+def _getStyleRulesOfTokens(cssFile):
+    # fast tokenizer: only the raw texts of the style rules, every distinct selector/declaration is normalized once by cssutils
+    # (the comments and style rules for _checkComments are kept in commentRulesCssFiles, so the sheet isn't parsed by cssutils)
+    styleRules = []
+    commentRules = []
+    # (errors of cssutils are logged by the normalization: once per distinct selector/declaration, with its position within that text;
+    #  at-rules and the sheet itself are not parsed, so their errors are not logged)
+    with _measure('parse.css.tokenizer', cssFile):
+        for styleRuleTokens in _tokenizeStyleRules(_readStylesheet(cssFile), withComments = True):
+            if isinstance(styleRuleTokens, _CommentTokens):
+                commentRules.append((None, styleRuleTokens.text))
+                continue
+            selector = _normalizeSelector(styleRuleTokens.selector)
+            if selector is None:
+                continue
+            properties = []
+            children = []
+            for declarationTokens in styleRuleTokens.declarations:
+                if isinstance(declarationTokens, _CommentTokens):
+                    children.append((True, None, declarationTokens.text))
+                    continue
+                (declaration, line) = declarationTokens
+                for (name, value, cssText) in _normalizeDeclaration(declaration):
+                    properties.append((name, value, line))
+                    children.append((False, name, cssText))
+            styleRules.append(StyleRule(selector, styleRuleTokens.line, properties))
+            commentRules.append((selector, children))
+    commentRulesCssFiles[os.path.relpath(cssFile, projectBaseDir)] = commentRules
+    return styleRules
+styleRulesCssFiles = {}
+def _getStyleRules(cssFile, fastTokenizer = False):
+    # top-level style rules => [StyleRule] (the first call of a file decides the tokenizer)
+    global styleRulesCssFiles
+    fileName = os.path.relpath(cssFile, projectBaseDir)
+    if fileName in styleRulesCssFiles:
+        return styleRulesCssFiles[fileName]
+    styleRules = None
+    if fastTokenizer:
+        try:
+            styleRules = _getStyleRulesOfTokens(cssFile)
+        except CssTokenizeError:
+            pass # not understood by the fast tokenizer => cssutils
+    if styleRules is None:
+        styleRules = _getStyleRulesOfSheet(cssFile)
+    styleRulesCssFiles[fileName] = styleRules
+    return styleRules
+
+flatmapCssFiles = {}
+def _flattenCssFile(cssFile):
+    global flatmapCssFiles
+    fileName = os.path.relpath(cssFile, projectBaseDir)
+    if fileName in flatmapCssFiles:
+        return flatmapCssFiles[fileName]
+    cssFlatMap = []
+    # strings interned: equal names/values are one object (also after pickling the flatmap)
+    fileName = sys.intern(fileName)
+    for styleRule in _getStyleRules(cssFile):
+        selector = sys.intern(styleRule.selector)
+        for (propertyName, propertyValue, line) in styleRule.properties:
+            cssFlatMap.append(PropertyInfo(fileName, selector, sys.intern(propertyName), sys.intern(propertyValue), line))
+    flatmapCssFiles[fileName] = cssFlatMap
     return cssFlatMap
 def _getUniqueIdentifier(propertyInfo, uniqueness):
     uniqueValue = ''
@@ -60,131 +176,175 @@ def _getUniqueIdentifier(propertyInfo, uniqueness):
     if 'selector' in uniqueness:
         uniqueValue = propertyInfo.selector if len(uniqueValue) == 0 else propertyInfo.selector+'{'+uniqueValue+'}'
     return uniqueValue
-def _checkCssDuplicates(cssFiles, uniqueness = ['property'], sortByAmount = True, duplicateMinimum = 1):
-    cssFlatMap = []
+
+cssPropertyIndexes = {} # cssFiles => CssPropertyIndex
+def _getCssPropertyIndex(cssFiles):
+    # all properties of the css-files, shared by all duplicate-checks
+    global cssPropertyIndexes
+    indexKey = tuple(cssFiles)
+    if indexKey in cssPropertyIndexes:
+        return cssPropertyIndexes[indexKey]
+    properties = []
     for cssFile in cssFiles:
-        cssFlatMap += _flattenCssFile(cssFile)
-    
-    uniqueProperties = {}
-    for propertyInfo in cssFlatMap:
-        uniqueProperty = _getUniqueIdentifier(propertyInfo, uniqueness)
-        if not uniqueProperty in uniqueProperties:
-            uniqueProperties[uniqueProperty] = [1, []]
-            uniqueProperties[uniqueProperty][1].append(propertyInfo)
-        else:
-            uniqueProperties[uniqueProperty][0] += 1
-            uniqueProperties[uniqueProperty][1].append(propertyInfo)
-    
-    uniquePropertiesSorted = {key: val for key, val in sorted(uniqueProperties.items(), key=lambda item: item[1] if sortByAmount else item[0], reverse=sortByAmount)}
-    #print(uniqueProperties)
+        properties += _flattenCssFile(cssFile)
+    cssPropertyIndex = CssPropertyIndex(properties, {})
+    cssPropertyIndexes[indexKey] = cssPropertyIndex
+    return cssPropertyIndex
+def _getCssPropertyGroups(cssPropertyIndex, uniqueness):
+    # view on the index: properties grouped by unique identifier (built once per uniqueness)
+    view = tuple(sorted(uniqueness))
+    if not view in cssPropertyIndex.groups:
+        groups = {}
+        for propertyInfo in cssPropertyIndex.properties:
+            uniqueProperty = _getUniqueIdentifier(propertyInfo, uniqueness)
+            if not uniqueProperty in groups:
+                groups[uniqueProperty] = [propertyInfo]
+            else:
+                groups[uniqueProperty].append(propertyInfo)
+        cssPropertyIndex.groups[view] = groups
+    return cssPropertyIndex.groups[view]
+def _checkCssDuplicates(cssFiles, uniqueness = ['property'], sortByAmount = True, duplicateMinimum = 1, topCount = None):
+    groups = _getCssPropertyGroups(_getCssPropertyIndex(cssFiles), uniqueness)
+    duplicates = [(key, propertyInfos) for key, propertyInfos in groups.items() if len(propertyInfos) >= duplicateMinimum]
+    if topCount is None:
+        topCount = len(duplicates)
+    if sortByAmount:
+        # most found first (same amount: by found properties, as before)
+        duplicatesSorted = heapq.nlargest(topCount, duplicates, key=lambda duplicate: (len(duplicate[1]), duplicate[1]))
+    else:
+        duplicatesSorted = heapq.nsmallest(topCount, duplicates, key=lambda duplicate: duplicate[0])
     results = []
-    for key,val in uniquePropertiesSorted.items():
-        if (val[0] >= duplicateMinimum):
-            cssFilenames = {}
-            for propertyInfo in val[1]:
-                cssFilename = propertyInfo.cssFilename
-                if not cssFilename in cssFilenames:
-                    cssFilenames[cssFilename] = 1
-                else:
-                    cssFilenames[cssFilename] +=1
-            cssFilesInfo = ','.join(f'{key} ({val})' for key,val in cssFilenames.items())
-            results.append(f'{val[0]}\t{key}\t[{cssFilesInfo}]')
+    for key, propertyInfos in duplicatesSorted:
+        cssFilenames = {}
+        for propertyInfo in propertyInfos:
+            cssFilename = propertyInfo.cssFilename
+            if not cssFilename in cssFilenames:
+                cssFilenames[cssFilename] = 1
+            else:
+                cssFilenames[cssFilename] +=1
+        cssFilesInfo = ','.join(f'{key} ({val})' for key,val in cssFilenames.items())
+        results.append(f'{len(propertyInfos)}\t{key}\t[{cssFilesInfo}]')
     return results
-def _isWantedProperty(property, condition):
-    (propertyName, propertyValue) = property
-    (conditionName, conditionValue) = condition
-    if not conditionName and not conditionValue:
-        return False
-    isValid = True
-    if conditionName:
-        conditionNameRegex = conditionName.replace('*','.*')
-        isValid = isValid and re.match(conditionNameRegex, propertyName)
-    if conditionValue:
-        conditionValueRegex = conditionValue.replace('*','.*')
-        isValid = isValid and re.match(conditionValueRegex, propertyValue)
-    return isValid
-def _checkProperties(cssFile, properties, styleRuleRequiresAllProperties = False):
-    propertiesWanted = []
-    for item in properties:
-        itemParts = item.split(':')
-        if len(itemParts) == 2:
-            propertyName = itemParts[0] if itemParts[0] != '' else '*'
-            propertyValue = itemParts[1] if itemParts[1] != '' else '*'
-            propertiesWanted.append((propertyName, propertyValue))
-        elif itemParts[0] != '':
-            propertiesWanted.append((itemParts[0], None))
-    results = []
-    sheet = _parseCssFile(cssFile)
-    for cssStyleRule in sheet.cssRules.rulesOfType(cssutils.css.CSSRule.STYLE_RULE):
-        selector = cssStyleRule.selectorText
-        declarationBlock = cssStyleRule.style
-        ruleProperties = declarationBlock.getProperties(all=True)
+def _getPropertyCondition(item):
+    # 'name:value' => (name, value) ('' = '*'), 'name' => (name, None)
+    itemParts = item.split(':')
+    if len(itemParts) == 2:
+        propertyName = itemParts[0] if itemParts[0] != '' else '*'
+        propertyValue = itemParts[1] if itemParts[1] != '' else '*'
+        return (propertyName, propertyValue)
+    elif itemParts[0] != '':
+        return (itemParts[0], None)
+    return None
+def _compilePropertyMatcher(propertyChecks):
+    # the wanted properties of all checks, compiled once ('*' = wildcard, matched from the start)
+    conditions = []
+    conditionIndexes = {}
+    checkConditions = {}
+    for check, propertyCheck in propertyChecks.items():
+        checkConditions[check] = []
+        for item in propertyCheck.properties:
+            condition = _getPropertyCondition(item)
+            if not condition:
+                continue
+            if not condition in conditionIndexes:
+                conditionIndexes[condition] = len(conditions)
+                conditions.append(tuple(re.compile(part.replace('*','.*')).match if part else None for part in condition))
+            checkConditions[check].append(conditionIndexes[condition])
+    return PropertyMatcher(conditions, checkConditions, {})
+def _getMatchingConditions(propertyMatcher, propertyName, propertyValue):
+    # => indexes of the matching conditions (every name/value is matched only once)
+    key = (propertyName, propertyValue)
+    matches = propertyMatcher.matches.get(key)
+    if matches is None:
+        matches = frozenset(index for index, (nameMatch, valueMatch) in enumerate(propertyMatcher.conditions)
+            if (not nameMatch or nameMatch(propertyName)) and (not valueMatch or valueMatch(propertyValue)))
+        propertyMatcher.matches[key] = matches
+    return matches
+checkedPropertiesCssFiles = {}
+def _checkProperties(cssFile):
+    # all property-checks in one pass over the style rules => check => results
+    global checkedPropertiesCssFiles, propertyMatcher
+    fileName = os.path.relpath(cssFile, projectBaseDir)
+    if fileName in checkedPropertiesCssFiles:
+        return checkedPropertiesCssFiles[fileName]
+    if not propertyMatcher:
+        propertyMatcher = _compilePropertyMatcher(propertyChecks)
+    results = {check: [] for check in propertyChecks}
+    for styleRule in _getStyleRules(cssFile):
         foundedProperties = []
-        for property in ruleProperties:
-            for propertyWanted in propertiesWanted:
-                if _isWantedProperty((property.name, property.value), propertyWanted):
-                    foundedProperties.append((property.name, property.value))
-                    break
-        if foundedProperties:
-            if not styleRuleRequiresAllProperties:
-                results.append(selector+' { '+', '.join(prop[0]+':'+prop[1] for prop in foundedProperties)+' }')
-            else:
-                hasAllWantedProperties = True
-                for propertyWanted in propertiesWanted:
-                    isWantedFounded = False
-                    for propFounded in foundedProperties:
-                        isWantedFounded = isWantedFounded or _isWantedProperty((propFounded[0], propFounded[1]), propertyWanted)
-                        if isWantedFounded: break
-                    hasAllWantedProperties = hasAllWantedProperties and isWantedFounded
-                if hasAllWantedProperties:
-                    results.append(selector+' { '+', '.join(prop[0]+':'+prop[1] for prop in foundedProperties)+' }')
+        for (propertyName, propertyValue, _) in styleRule.properties:
+            matches = _getMatchingConditions(propertyMatcher, propertyName, propertyValue)
+            if matches:
+                foundedProperties.append((propertyName, propertyValue, matches))
+        if not foundedProperties:
+            continue
+        selector = styleRule.selector
+        for check, propertyCheck in propertyChecks.items():
+            conditions = propertyMatcher.checkConditions[check]
+            checkFoundedProperties = [prop for prop in foundedProperties if not prop[2].isdisjoint(conditions)]
+            if not checkFoundedProperties:
+                continue
+            if propertyCheck.styleRuleRequiresAllProperties:
+                foundedConditions = set().union(*(prop[2] for prop in checkFoundedProperties))
+                if not foundedConditions.issuperset(conditions):
+                    continue
+            results[check].append(selector+' { '+', '.join(prop[0]+':'+prop[1] for prop in checkFoundedProperties)+' }')
+    checkedPropertiesCssFiles[fileName] = results
     return results
 def _checkSemiForbiddenProperties(cssFile):
-    forbiddenProperties = ['overflow']
-    results = _checkProperties(cssFile, forbiddenProperties)
-    return results
+    return _checkProperties(cssFile)[CssChecks.SemiForbiddenProperties]
 def _checkForbiddenProperties(cssFile):
-    forbiddenProperties = ['float', ':*!important']
-    results = _checkProperties(cssFile, forbiddenProperties)
-    return results
+    return _checkProperties(cssFile)[CssChecks.ForbiddenProperties]
 def _checkGrid(cssFile):
-    # check for selector with css-properties: 'display:grid','display:inline-grid','grid','grid-template-*','grid-area','justify-*','align-*','place-*','*gap'
-    gridProperties = ['display:grid','display:inline-grid','grid','grid-template-*','grid-area']
-    results = _checkProperties(cssFile, gridProperties)
+    results = _checkProperties(cssFile)[CssChecks.Grid]
     outputResults = []
     for result in results:
         outputResults.append(result.replace('{','{\n\t\t').replace(',',',\n\t\t'))
     return outputResults
 def _checkFlexbox(cssFile):
-    # check for selector with css-properties: 'display:flex','display:inline-flex','flex','flex-*','order','justify-*','align-*','*-gap'
-    flexboxProperties = ['display:flex','display:inline-flex','flex','flex-*','order']
-    results = _checkProperties(cssFile, flexboxProperties)
+    results = _checkProperties(cssFile)[CssChecks.Flexbox]
     outputResults = []
     for result in results:
         outputResults.append(result.replace('{','{\n\t\t').replace(',',',\n\t\t'))
     return outputResults
 def _checkHiddenTitle(cssFile):
-    # check for selector with css-properties: 'position:absolute','width:1px','height:1px','left:-10000px','float:hidden'
-    hiddenTitleProperties = ['position:absolute','width','height','left','overflow:hidden']
-    return _checkProperties(cssFile, hiddenTitleProperties, styleRuleRequiresAllProperties=True)
-def _checkComments(cssFile):
-    requiredCommentedProperties = ['position', 'box-sizing']
-    results = []
+    return _checkProperties(cssFile)[CssChecks.HiddenTitle]
+commentRulesCssFiles = {} # fileName => comment rules of the fast tokenizer
+def _getCommentRulesOfSheet(cssFile):
+    # cssutils: [(None, comment)] or [(selector, [(isComment, propertyName, cssText)])] of the top-level rules
+    commentRules = []
     sheet = _parseCssFile(cssFile)
-    # sheet loop all rules
-    isPrevRuleAComment = False
     for rule in sheet.cssRules:
-        #check type of rule
         if rule.type == cssutils.css.CSSRule.COMMENT:
-            commentRule = rule
-            # TODO: check if comment is css-code?
-            results.append((None, commentRule.cssText))
-            isPrevRuleAComment = True
+            commentRules.append((None, rule.cssText))
         elif rule.type == cssutils.css.CSSRule.STYLE_RULE:
-            styleRule = rule
-            selector = styleRule.selectorText
+            children = []
+            for styleRuleChild in rule.style.children():
+                if isinstance(styleRuleChild, cssutils.css.csscomment.CSSComment):
+                    children.append((True, None, styleRuleChild.cssText))
+                elif isinstance(styleRuleChild, cssutils.css.property.Property):
+                    children.append((False, styleRuleChild.name, styleRuleChild.cssText))
+                else:
+                    children.append((False, None, None))
+            commentRules.append((rule.selectorText, children))
+    return commentRules
+def _getCommentRules(cssFile):
+    # comments and style rules: of the fast tokenizer (if used for the file), else of cssutils
+    fileName = os.path.relpath(cssFile, projectBaseDir)
+    if fileName in commentRulesCssFiles:
+        return commentRulesCssFiles[fileName]
+    return _getCommentRulesOfSheet(cssFile)
+def _checkComments(cssFile):
+    requiredCommentedProperties = ['position', 'box-sizing']
+    results = []
+    # loop all rules
+    for (selector, content) in _getCommentRules(cssFile):
+        if selector is None:
+            # TODO: check if comment is css-code?
+            results.append((None, content))
+        else:
             styleRuleResults = []
-            styleRuleChildren = list(styleRule.style.children())
+            styleRuleChildren = content # (isComment, propertyName, cssText)
             isPrevRuleChildAComment = False
             isPrevRuleChildRequired = False
             isPrevRuleChildPartOfGap = False
@@ -193,22 +353,20 @@ def _checkComments(cssFile):
                 isCurrentRuleChildRequired = False
                 isCurrentRuleChildPartOfGap = False
                 isCurrentRuleChildStartOfGap = False
-                styleRuleChild = styleRuleChildren[j]
-                if isinstance(styleRuleChild, cssutils.css.csscomment.CSSComment):
-                    comment = styleRuleChild
-                    styleRuleResults.append(comment.cssText)
+                (isComment, propertyName, cssText) = styleRuleChildren[j]
+                if isComment:
+                    styleRuleResults.append(cssText)
                     isCurrentRuleChildAComment = True
-                if isinstance(styleRuleChild, cssutils.css.property.Property):
-                    property = styleRuleChild
-                    if property.name in requiredCommentedProperties:
-                        styleRuleResults.append(property.cssText+';')
+                elif propertyName is not None:
+                    if propertyName in requiredCommentedProperties:
+                        styleRuleResults.append(cssText+';')
                         isCurrentRuleChildRequired = True
                     else:
                         isNextRuleChildAComment = False
                         if j < len(styleRuleChildren)-1:
-                            isNextRuleChildAComment = isinstance(styleRuleChildren[j+1], cssutils.css.csscomment.CSSComment)
+                            isNextRuleChildAComment = styleRuleChildren[j+1][0]
                         if isPrevRuleChildAComment or isNextRuleChildAComment:
-                            styleRuleResults.append(property.cssText+';')
+                            styleRuleResults.append(cssText+';')
                         else:
                             if not isPrevRuleChildPartOfGap:
                                 #fill gaps for props that doesn't needed a comment with '...'
@@ -228,67 +386,84 @@ def _checkComments(cssFile):
         else:
             outputResults.append(selector+' { '+'\n\t\t'+'\n\t\t'.join(re.sub('\s+',' ',item.replace('\n','').replace('\r','')) for item in content)+' }')
     return outputResults
-def _checkCssFiles(cssFiles):
+def _checkCssFile(cssFile, fastTokenizer = False):
+    # checks on individual file => (isValidFile, results, cssFlatMap)
+    fileName = os.path.relpath(cssFile, projectBaseDir)
+    results = []
+    hiddenTitleResult = None
+    semiForbiddenPropertiesResult = None
+    forbiddenPropertiesResult = None
+    gridResult = None
+    flexboxResult = None
+    commentsResult = None
+    try:
+        _getStyleRules(cssFile, fastTokenizer) # style rules for the property-checks and duplicatie
+        hiddenTitleResult = _checkHiddenTitle(cssFile)
+        semiForbiddenPropertiesResult = _checkSemiForbiddenProperties(cssFile)
+        forbiddenPropertiesResult = _checkForbiddenProperties(cssFile)
+        gridResult = _checkGrid(cssFile)
+        flexboxResult = _checkFlexbox(cssFile)
+        commentsResult = _checkComments(cssFile)
+        cssFlatMap = _flattenCssFile(cssFile) # used by duplicatie
+    except Exception as exc:
+        results.append([fileName, CssChecks.Error, f'Error while processing file... {type(exc).__name__}: {str(exc)}'])
+        return (False, results, None)
+    # algemeen
+    results.append([fileName, CssChecks.HiddenTitle, hiddenTitleResult])
+    results.append([fileName, CssChecks.SemiForbiddenProperties, semiForbiddenPropertiesResult])
+    results.append([fileName, CssChecks.ForbiddenProperties, forbiddenPropertiesResult])
+    # grid / flexbox
+    results.append([fileName, CssChecks.Grid, gridResult])
+    results.append([fileName, CssChecks.Flexbox, flexboxResult])
+    # comments
+    results.append([fileName, CssChecks.Comments, commentsResult])
+    return (True, results, cssFlatMap)
+def _checkCssFiles(cssFiles, fastTokenizer = False):
+    global flatmapCssFiles
     if not cssFiles: return []
     ## DO CHECKs
     results = []
     validCssFiles = []
-    # individual file checks
-    for cssFile in cssFiles:
-        fileName = os.path.relpath(cssFile, projectBaseDir)
-        hiddenTitleResult = None
-        semiForbiddenPropertiesResult = None
-        forbiddenPropertiesResult = None
-        gridResult = None
-        flexboxResult = None
-        commentsResult = None
-        try:
-            hiddenTitleResult = _checkHiddenTitle(cssFile)
-            semiForbiddenPropertiesResult = _checkSemiForbiddenProperties(cssFile)
-            forbiddenPropertiesResult = _checkForbiddenProperties(cssFile)
-            gridResult = _checkGrid(cssFile)
-            flexboxResult = _checkFlexbox(cssFile)
-            commentsResult = _checkComments(cssFile)
-        except Exception as exc:
-            results.append([fileName, CssChecks.Error, f'Error while processing file... {type(exc).__name__}: {str(exc)}'])
-            continue
-        validCssFiles.append(cssFile)
-        # algemeen
-        results.append([fileName, CssChecks.HiddenTitle, hiddenTitleResult])
-        results.append([fileName, CssChecks.SemiForbiddenProperties, semiForbiddenPropertiesResult])
-        results.append([fileName, CssChecks.ForbiddenProperties, forbiddenPropertiesResult])
-        # grid / flexbox
-        results.append([fileName, CssChecks.Grid, gridResult])
-        results.append([fileName, CssChecks.Flexbox, flexboxResult])
-        # comments
-        results.append([fileName, CssChecks.Comments, commentsResult])
+    # individual file checks (possibly in worker processes, results in order of cssFiles)
+    for cssFile, (isValidCssFile, fileResults, cssFlatMap) in zip(cssFiles, _mapFiles(_checkCssFile, cssFiles, projectBaseDir, fastTokenizer)):
+        results += fileResults
+        _emitResults(fileResults) # records of the file (if a record output is open)
+        if isValidCssFile:
+            validCssFiles.append(cssFile)
+            flatmapCssFiles[os.path.relpath(cssFile, projectBaseDir)] = cssFlatMap
     # duplicatie
-    results.append([None, CssChecks.DuplicatesOnSelectorLevel, _checkCssDuplicates(validCssFiles, ['selector','property','value'], False, 2)])
-    results.append([None, CssChecks.DuplicatesOnPropertyLevel, _checkCssDuplicates(validCssFiles, ['property','value'], True, 5)])
-    return results
-
+    projectResults = [[None, CssChecks.DuplicatesOnSelectorLevel, _checkCssDuplicates(validCssFiles, ['selector','property','value'], False, 2, duplicatesTopCount)],
+                      [None, CssChecks.DuplicatesOnPropertyLevel, _checkCssDuplicates(validCssFiles, ['property','value'], True, 5, duplicatesTopCount)]]
+    _emitResults(projectResults)
+    return results + projectResults
 
 ## HTML Files ##
-parsedHtmlFiles = {}
-def _parseHtmlFile(htmlFile):
-    fileName = os.path.relpath(htmlFile, projectBaseDir)
-    document = None
-    if fileName in parsedHtmlFiles:
-        document = parsedHtmlFiles[fileName]
-    else:
-        with open(htmlFile) as file:
-            document = bs4.BeautifulSoup(file.read(), 'html.parser')
-            parsedHtmlFiles[fileName] = document
-    return document
-def _checkExternStylesInHtml(htmlFile, local = True, external = True): # link-elementen (in head-element)
+# the html-checks only need name, attributes and position of tags:
+# one walk of the shared document (if parsed already), else one stream of the file (see htmlEvents)
+def _visitHtmlFile(htmlFile, visitTags):
+    def visitTag(tag, ancestorTags):
+        for visit in visitTags:
+            visit(tag, ancestorTags)
+    _visitHtmlTags(htmlFile, visitTag, _getParsedHtmlDocument(htmlFile))
+def _isInTag(tag, ancestorTag):
+    while tag.parent is not None:
+        tag = tag.parent
+        if tag is ancestorTag:
+            return True
+    return False
+def _externStylesVisitor(local = True, external = True): # link-elementen (in head-element)
     ignoreInUrls = 'fonts'
     result = []
-    document = _parseHtmlFile(htmlFile)
-    linkTags = document.head.find_all('link') if document.head else []
-    for linkTag in linkTags:
+    headTags = [] # = document.head (first head-element)
+    def visit(tag, ancestorTags):
+        if tag.name == 'head' and not headTags:
+            headTags.append(tag)
+        if tag.name != 'link' or not headTags or not _isInTag(tag, headTags[0]):
+            return
+        linkTag = tag
         if linkTag.has_attr('href'):
             if linkTag.has_attr('rel') and not 'stylesheet' in linkTag['rel']:
-                continue
+                return
             hrefStartsWithHttp = re.match('http', linkTag['href'], re.IGNORECASE)
             if local and not hrefStartsWithHttp:
                 result.append(str(linkTag['href']))
@@ -296,81 +471,87 @@ def _checkExternStylesInHtml(htmlFile, local = True, external = True): # link-el
                 if not ignoreInUrls in linkTag['href']:
                     result.append(str(linkTag['href'])) 
         # TODO: get list of 'imports' in css-file
-    return result
-def _checkInternStylesInHtml(htmlFile): # style-elementen
+    return (visit, lambda: result)
+def _internStylesVisitor(): # style-elementen
     result = []
-    document = _parseHtmlFile(htmlFile)
-    styleTags = document.find_all('style')
-    for styleTag in styleTags:
-        result.append(str(styleTag.sourceline)+':'+str(styleTag.sourcepos))
-    return result
-def _checkInlineStylesInHtml(htmlFile): # style-attributen
+    def visit(tag, ancestorTags):
+        if tag.name == 'style':
+            result.append(str(tag.sourceline)+':'+str(tag.sourcepos))
+    return (visit, lambda: result)
+def _inlineStylesVisitor(): # style-attributen
     result = []
-    document = _parseHtmlFile(htmlFile)
-    tags = document.find_all(lambda tag : tag.has_attr('style'))
-    for tag in tags:
-        result.append(f'{str(tag.sourceline)}:{str(tag.sourcepos)} <{tag.name} style="'+tag['style']+'">')
-    return result
+    def visit(tag, ancestorTags):
+        if tag.has_attr('style'):
+            result.append(f'{str(tag.sourceline)}:{str(tag.sourcepos)} <{tag.name} style="'+tag['style']+'">')
+    return (visit, lambda: result)
+def _checkHtmlFileWithVisitors(htmlFile, visitors):
+    _visitHtmlFile(htmlFile, [visit for (visit, _) in visitors])
+    return [result() for (_, result) in visitors]
+def _checkExternStylesInHtml(htmlFile, local = True, external = True):
+    return _checkHtmlFileWithVisitors(htmlFile, [_externStylesVisitor(local, external)])[0]
+def _checkInternStylesInHtml(htmlFile):
+    return _checkHtmlFileWithVisitors(htmlFile, [_internStylesVisitor()])[0]
+def _checkInlineStylesInHtml(htmlFile):
+    return _checkHtmlFileWithVisitors(htmlFile, [_inlineStylesVisitor()])[0]
+def _checkHtmlFile(htmlFile):
+    # checks on individual file => results
+    fileName = os.path.relpath(htmlFile, projectBaseDir)
+    results = []
+    externStylesHttpResult = None
+    externStylesLocalResult = None
+    internStylesResult = None
+    inlineStylesResult = None
+    try:
+        # all in one walk (or stream) of the file
+        (externStylesHttpResult, externStylesLocalResult, internStylesResult, inlineStylesResult) = _checkHtmlFileWithVisitors(htmlFile, [
+            _externStylesVisitor(local=False, external=True), _externStylesVisitor(local=True, external=False),
+            _internStylesVisitor(), _inlineStylesVisitor()])
+    except Exception as exc:
+        results.append([fileName, CssChecks.ErrorHtml, f'Error while processing file... {type(exc).__name__}: {str(exc)}'])
+        return results
+    results.append([fileName, CssChecks.ExternStylesHttp, externStylesHttpResult])
+    results.append([fileName, CssChecks.ExternStylesLocal, externStylesLocalResult])
+    results.append([fileName, CssChecks.InternStyles, internStylesResult])
+    results.append([fileName, CssChecks.InlineStyles, inlineStylesResult])
+    return results
 def _checkHtmlFiles(htmlFiles):
     if not htmlFiles: return []
     ## DO CHECKs
     results = []
-    for htmlFile in htmlFiles:
-        fileName = os.path.relpath(htmlFile, projectBaseDir)
-        externStylesHttpResult = None
-        externStylesLocalResult = None
-        internStylesResult = None
-        inlineStylesResult = None
-        try:
-            externStylesHttpResult = _checkExternStylesInHtml(htmlFile, local=False, external=True)
-            externStylesLocalResult = _checkExternStylesInHtml(htmlFile, local=True, external=False)
-            internStylesResult = _checkInternStylesInHtml(htmlFile)
-            inlineStylesResult = _checkInlineStylesInHtml(htmlFile)
-        except Exception as exc:
-            results.append([fileName, CssChecks.ErrorHtml, f'Error while processing file... {type(exc).__name__}: {str(exc)}'])
-            continue
-        results.append([fileName, CssChecks.ExternStylesHttp, externStylesHttpResult])
-        results.append([fileName, CssChecks.ExternStylesLocal, externStylesLocalResult])
-        results.append([fileName, CssChecks.InternStyles, internStylesResult])
-        results.append([fileName, CssChecks.InlineStyles, inlineStylesResult])
+    for fileResults in _mapFiles(_checkHtmlFile, htmlFiles, projectBaseDir):
+        results += fileResults
+        _emitResults(fileResults)
     return results
 
 
-def _getAllFiles(dir, ext, filenamePrefix = None, recursive = True, ignoreDotDirs = True):
-    files = []
-    for entry in os.listdir(dir):
-        fullPath = os.path.join(dir, entry)
-        if os.path.isdir(fullPath):
-            if ignoreDotDirs and entry.startswith('.'):
-                continue
-            if not entry in excludeDirs and recursive:
-                files += _getAllFiles(fullPath, ext, filenamePrefix, recursive, ignoreDotDirs)
-        elif fullPath.endswith('.'+ext if ext[0] != '.' else ext):
-            if not filenamePrefix or entry.startswith(filenamePrefix):
-                files.append(fullPath)
-    return files
-
-
 ## MODULE (whem imported as module) ##
-def checkProject(projectDir):
+def _resetProjectData(projectDir):
     # reset project-cached-data
-    global parsedCssFiles, parsedHtmlFiles
+    global parsedCssFiles, styleRulesCssFiles, commentRulesCssFiles, flatmapCssFiles, checkedPropertiesCssFiles, cssPropertyIndexes
     parsedCssFiles = {}
-    parsedHtmlFiles = {}
-    # check project
+    styleRulesCssFiles = {}
+    commentRulesCssFiles = {}
+    flatmapCssFiles = {}
+    checkedPropertiesCssFiles = {}
+    cssPropertyIndexes = {}
     global projectBaseDir
     projectBaseDir = projectDir
+
+def checkProject(projectDir, fastTokenizer = False):
+    # fastTokenizer: style rules for the property-checks and duplicatie by cssTokenizer (instead of cssutils)
+    _resetProjectData(projectDir)
+    # check project
     results = []
-    htmlFiles = _getAllFiles(projectDir, '.html', recursive=doCheckSubFolders, ignoreDotDirs=excludeDotDirs)
+    htmlFiles = _getFiles(projectDir, '.html', recursive=doCheckSubFolders, ignoreDotDirs=excludeDotDirs, excludeDirs=excludeDirs)
     results += _checkHtmlFiles(htmlFiles)
-    cssFiles = _getAllFiles(projectDir, '.css', recursive=doCheckSubFolders, ignoreDotDirs=excludeDotDirs)
-    results += _checkCssFiles(cssFiles)
+    cssFiles = _getFiles(projectDir, '.css', recursive=doCheckSubFolders, ignoreDotDirs=excludeDotDirs, excludeDirs=excludeDirs)
+    results += _checkCssFiles(cssFiles, fastTokenizer)
     return results
 
 
 ## MAIN (executed as standalone script) ##
 def _clearOutputFiles(outputDir, outputFilenamePrefix):
-    resultFiles = _getAllFiles(outputDir, '.txt', filenamePrefix = outputFilenamePrefix)
+    resultFiles = _getFiles(outputDir, '.txt', filenamePrefix=outputFilenamePrefix, excludeDirs=excludeDirs)
     for resultFile in resultFiles:
         os.remove(resultFile)
 
@@ -2,6 +2,21 @@
 
 #v0.4
 
+try:
+    ## MODULE (when loaded as module) ##
+    from .documentStore import getHtmlDocument as _getHtmlDocument, getParsedHtmlDocument as _getParsedHtmlDocument
+    from .htmlEvents import visitHtmlTags as _visitHtmlTags
+    from .parallel import mapFiles as _mapFiles
+    from .resultRecords import emitResults as _emitResults
+    from .projectFiles import getFiles as _getFiles
+except ImportError:
+    ## SCRIPT (when run as script) ##
+    from documentStore import getHtmlDocument as _getHtmlDocument, getParsedHtmlDocument as _getParsedHtmlDocument
+    from htmlEvents import visitHtmlTags as _visitHtmlTags
+    from parallel import mapFiles as _mapFiles
+    from resultRecords import emitResults as _emitResults
+    from projectFiles import getFiles as _getFiles
+
 import os
 import re #regex
 import bs4 # pip install beautifulsoup4
@@ -26,6 +41,7 @@ class HtmlChecks(Enum):
 
 # custom types
 TagInfo = namedtuple('TagInfo', ['htmlFilename', 'name', 'count'])
+TagCountMatrix = namedtuple('TagCountMatrix', ['fileNames', 'tagCounts']) # fileNames: sorted, tagCounts: tag name (sorted) => [count per file]
 
 # constants
 sectioningElements = ['body', 'nav', 'aside', 'article', 'section']
@@ -33,21 +49,14 @@ headingRegex = re.compile('^h([1-6])$')
 
 
 ## HTML Files ##
-parsedHtmlFiles = {} # all lower case (= case insensitive)
 #parsedAsXmlFiles = {} # as is (= case sensitive)
 def _parseHtmlFile(htmlFile, caseSensitive=False):
-    global parsedHtmlFiles
-    fileName = os.path.relpath(htmlFile, projectBaseDir)
     document = None
     if not caseSensitive:
-        if fileName in parsedHtmlFiles:
-            document = parsedHtmlFiles[fileName]
-        else:
-            with open(htmlFile) as file:
-                document = bs4.BeautifulSoup(file.read(), 'html.parser')
-                #document = bs4.BeautifulSoup(file.read(), 'html5lib') # requires 'pip install html5lib' # creates valid HTML5, but we wan't the original code + is slow
-                parsedHtmlFiles[fileName] = document
+        # all lower case (= case insensitive), shared with the other analysers
+        document = _getHtmlDocument(htmlFile)
     # elif caseSensitive: # TODO: requires original tag names from source
+    #     fileName = os.path.relpath(htmlFile, projectBaseDir)
     #     if fileName in parsedAsXmlFiles:
     #         document = parsedAsXmlFiles[fileName]
     #     else:
@@ -56,33 +65,59 @@ def _parseHtmlFile(htmlFile, caseSensitive=False):
     #             parsedAsXmlFiles[fileName] = document
     return document
 
-flatmapHtmlFiles = []
+## HTML rules (single-pass) ##
+# a rule registers a visit-callback for the tags (or attributes) it's interested in,
+# all rules of a file are fed during one walk of the document (or one stream of the file, see htmlEvents)
+# needsTree: the rule uses more than name, attributes and position of a tag (e.g. str(tag))
+HtmlRule = namedtuple('HtmlRule', ['check', 'tags', 'attributes', 'visit', 'result', 'needsTree'], defaults=[False])
+def _getRulesVisitor(rules):
+    tagVisitors = {}
+    attributeVisitors = []
+    allTagVisitors = []
+    for rule in rules:
+        if rule.tags:
+            for tagName in rule.tags:
+                tagVisitors.setdefault(tagName, []).append(rule.visit)
+        elif rule.attributes:
+            attributeVisitors.append((set(rule.attributes), rule.visit))
+        else:
+            allTagVisitors.append(rule.visit)
+    def visitTag(tag, ancestorTags):
+        for visit in allTagVisitors:
+            visit(tag, ancestorTags)
+        for visit in tagVisitors.get(tag.name, ()):
+            visit(tag, ancestorTags)
+        if attributeVisitors and tag.attrs:
+            for attributes, visit in attributeVisitors:
+                if not attributes.isdisjoint(tag.attrs):
+                    visit(tag, ancestorTags)
+    return visitTag
+def _checkHtmlFileWithRules(htmlFile, rules):
+    # the shared document if parsed already (or needed by a rule), else the file is streamed (no tree)
+    document = _getParsedHtmlDocument(htmlFile)
+    if document is None and any(rule.needsTree for rule in rules):
+        document = _parseHtmlFile(htmlFile)
+    _visitHtmlTags(htmlFile, _getRulesVisitor(rules), document)
+    return {rule.check: rule.result() for rule in rules}
+
+flatmapHtmlFiles = {} # fileName => [TagInfo]
 def _flattenHtmlFile(htmlFile):
     global flatmapHtmlFiles
     fileName = os.path.relpath(htmlFile, projectBaseDir)
-    tagsFlatmap = []
-    found = False
-    for tagInfo in flatmapHtmlFiles:
-        (flattenFileName, name, count) = tagInfo
-        if flattenFileName == fileName:
-            tagsFlatmap.append(tagInfo)
-            found = True
-    if not found:
-        document = _parseHtmlFile(htmlFile)
-        tags = document.select('*')
-        uniqueTagsCounted = sorted(Counter([tag.name for tag in tags]).items(), key=lambda item: item[0])
-        for key,val in uniqueTagsCounted:
-            tagName = key
-            tagCount = val
-            tagInfo = TagInfo(fileName, tagName, tagCount)
-            flatmapHtmlFiles.append(tagInfo)
-            tagsFlatmap.append(tagInfo)
-    return tagsFlatmap
-def _flattenHtmlFiles(htmlFiles):
-    tagsFlatmap = []
+    if not fileName in flatmapHtmlFiles:
+        flatmapHtmlFiles[fileName] = _checkHtmlFileWithRules(htmlFile, [_tagCountRule(fileName)])[HtmlChecks.TagSummary]
+    return flatmapHtmlFiles[fileName]
+def _getTagCountMatrix(htmlFiles):
+    # counts of all tags in all files, in one pass over the flatmaps
+    fileNames = sorted(os.path.relpath(htmlFile, projectBaseDir) for htmlFile in htmlFiles)
+    fileIndexes = {fileName: index for index, fileName in enumerate(fileNames)}
+    tagCounts = {}
     for htmlFile in htmlFiles:
-        tagsFlatmap += _flattenHtmlFile(htmlFile)
-    return tagsFlatmap
+        for (fileName, name, count) in _flattenHtmlFile(htmlFile):
+            if not name in tagCounts:
+                tagCounts[name] = [0] * len(fileNames)
+            tagCounts[name][fileIndexes[fileName]] += count
+    return TagCountMatrix(fileNames, {name: tagCounts[name] for name in sorted(tagCounts)})
 def _getTagsSummaryOfFile(htmlFile, tags = None, includeOtherTags = False):
     uniqueTags = {}
     for tagInfo in _flattenHtmlFile(htmlFile):
@@ -119,63 +154,39 @@ def _getTagsSummaryOfFile(htmlFile, tags = None, includeOtherTags = False):
             count = val
             results.append(f'{tagName:<10}{count:>5}')
     return results
-def _getTagsSummaryOfFiles(htmlFiles, tags = None, includeOtherTags = False, showFileNames = False, uniqueTagsDictionary = None):
-    projectFiles = []
-    for htmlFile in htmlFiles:
-        fileName = os.path.relpath(htmlFile, projectBaseDir)
-        projectFiles.append(fileName)
-    projectFilesSorted = sorted(projectFiles)
-    uniqueTagsSorted = {}
-    if uniqueTagsDictionary:
-        uniqueTagsSorted = uniqueTagsDictionary
-    else:
-        uniqueTags = {}
-        for tagInfo in _flattenHtmlFiles(htmlFiles):
-            (fileName, name, count) = tagInfo
-            if not name in uniqueTags:
-                uniqueTags[name] = [count, {}]
-                uniqueTags[name][1][fileName] = count
-            else:
-                uniqueTags[name][0] += count
-                if not fileName in uniqueTags[name]:
-                    uniqueTags[name][1][fileName] = count
-                else:
-                    uniqueTags[name][1][fileName] += count
-        uniqueTagsSorted = {key: val for key, val in sorted(uniqueTags.items())}
-    def getTagResultInfo(tagName, uniqueTagValue, projectFiles):
-        totalCount = uniqueTagValue[0]
-        fileCounts = []
-        for file in projectFiles:
-            fileCounts.append(0)
-        for (fileName, count) in uniqueTagValue[1].items():
-            fileIndex = projectFiles.index(fileName)
-            fileCounts[fileIndex] = count
-        fileCountInfo = ', '.join(f'{str(fileCount):>2}' for fileCount in fileCounts)
-        return (totalCount, fileCountInfo)
+def _formatTagCountRow(tagCountMatrix, tagName):
+    fileCounts = tagCountMatrix.tagCounts.get(tagName)
+    if fileCounts is None:
+        return f'{tagName:<10}{0:>5}'
+    fileCountInfo = ', '.join(f'{str(fileCount):>2}' for fileCount in fileCounts)
+    return f'{tagName:<10}{sum(fileCounts):>5}\t[{fileCountInfo}]'
+def _getTagCountRows(tagCountMatrix, tags, shownTagNames):
+    # a row per tag (a list = group, followed by an empty line), every tag is counted in one row only
+    results = []
+    for item in tags:
+        if isinstance(item, list):
+            results += _getTagCountRows(tagCountMatrix, item, shownTagNames)
+            results.append('')
+        elif not item in shownTagNames and item in tagCountMatrix.tagCounts:
+            shownTagNames.add(item)
+            results.append(_formatTagCountRow(tagCountMatrix, item))
+        else:
+            results.append(f'{item:<10}{0:>5}')
+    return results
+def _getOtherTagCountRows(tagCountMatrix, shownTagNames):
+    return [_formatTagCountRow(tagCountMatrix, tagName) for tagName in tagCountMatrix.tagCounts if not tagName in shownTagNames]
+def _getTagsSummaryOfFiles(htmlFiles, tags = None, includeOtherTags = False, showFileNames = False, tagCountMatrix = None):
+    if not tagCountMatrix:
+        tagCountMatrix = _getTagCountMatrix(htmlFiles)
     results = []
     if showFileNames:
         results.append('*** HTML-files ***')
-        results.append('\n'.join(fileName for fileName in projectFilesSorted))
+        results.append('\n'.join(fileName for fileName in tagCountMatrix.fileNames))
         results.append('\n')
         results.append('*** Overzicht tags (per file) ***')
+    shownTagNames = set()
     if tags:
-        for item in tags:
-            if isinstance(item, list):
-                results += _getTagsSummaryOfFiles(htmlFiles, item, uniqueTagsDictionary=uniqueTagsSorted)
-                results.append('')
-            else:
-                tagName = item
-                result = None
-                for key,val in uniqueTagsSorted.items():
-                    if tagName == key:
-                        result = getTagResultInfo(key, val, projectFilesSorted)
-                        uniqueTagsSorted.pop(key)
-                        break
-                if result:
-                    (totalCount, fileCountInfo) = result
-                    results.append(f'{tagName:<10}{totalCount:>5}\t[{fileCountInfo}]')
-                else:
-                    results.append(f'{tagName:<10}{0:>5}')
+        results += _getTagCountRows(tagCountMatrix, tags, shownTagNames)
     else:
         groupedTags = [['html','head','meta','style','link'],
                 ['title','body','main'],
@@ -192,14 +203,13 @@ def _getTagsSummaryOfFiles(htmlFiles, tags = None, includeOtherTags = False, sho
                 ['form','fieldset','label','input','textarea','select','button'],
                 ['div','span','hr','br'],
                 ['b','i','u']]
-        results += _getTagsSummaryOfFiles(htmlFiles, groupedTags, includeOtherTags=True, uniqueTagsDictionary=uniqueTagsSorted)
+        results += _getTagCountRows(tagCountMatrix, groupedTags, shownTagNames)
+        results.append('')
+        results += _getOtherTagCountRows(tagCountMatrix, shownTagNames)
     # other tags (not part of tags-param)
     if includeOtherTags:
         results.append('')
-        for key,val in uniqueTagsSorted.items():
-            tagName = key
-            (totalCount, fileCountInfo) = getTagResultInfo(key, val, projectFilesSorted)
-            results.append(f'{tagName:<10}{totalCount:>5}\t[{fileCountInfo}]')    
+        results += _getOtherTagCountRows(tagCountMatrix, shownTagNames)
     return results
 def _checkBaseStructure(htmlFile):
     outputResult = []
@@ -252,116 +262,86 @@ def _checkPageTitleAndH1Info(htmlFile):
 def _checkSemanticTagsInfoOfFile(htmlFile):
     outputResults = _getTagsSummaryOfFile(htmlFile, ['nav','article','aside','figure','blockquote','q','cite','address'])
     return outputResults
-def _checkSemanticTagsInfoOfFiles(htmlFiles):
-    outputResults = _getTagsSummaryOfFiles(htmlFiles, ['nav','article','aside','figure','blockquote','q','cite','address'])
+def _checkSemanticTagsInfoOfFiles(htmlFiles, tagCountMatrix = None):
+    outputResults = _getTagsSummaryOfFiles(htmlFiles, ['nav','article','aside','figure','blockquote','q','cite','address'], tagCountMatrix=tagCountMatrix)
     return outputResults
-def _checkMain(htmlFile):
-    outputResult = []
-    document = _parseHtmlFile(htmlFile)
-    tags = document.find_all('main')
-    if not tags:
-        outputResult.append('[MISSING main]')
-    elif len(tags) > 1:
-        results = {}
-        for tag in tags:
-            if tag.name in results:
-                results[tag.name].append(str(tag.sourceline))#+':'+str(tag.sourcepos))
-            else:
-                results[tag.name] = [str(tag.sourceline)]#+':'+str(tag.sourcepos)]
-        for key,val in results.items():
-            outputResult.append('[MULTIPLE main] <'+key+'>: '+'; '.join(val))
-    return outputResult
-def _checkNestedArticles(htmlFile):
+def _tagCountRule(fileName):
+    tagCounts = Counter()
+    def visit(tag, ancestorTags):
+        tagCounts[tag.name] += 1
+    def result():
+        return [TagInfo(fileName, tagName, tagCount) for tagName, tagCount in sorted(tagCounts.items())]
+    return HtmlRule(HtmlChecks.TagSummary, None, None, visit, result)
+def _tagSourceLinesRule(check, tags, outputLabel, isWantedTag = None):
     results = {}
-    document = _parseHtmlFile(htmlFile)
-    tags = document.select('article article')
-    for tag in tags:
+    def visit(tag, ancestorTags):
+        if isWantedTag and not isWantedTag(tag, ancestorTags):
+            return
         if tag.name in results:
             results[tag.name].append(str(tag.sourceline))#+':'+str(tag.sourcepos))
         else:
             results[tag.name] = [str(tag.sourceline)]#+':'+str(tag.sourcepos)]
-    outputResults = []
-    for key,val in results.items():
-        outputResults.append('[NESTED articles] <'+key+'>: '+'; '.join(val))
-    return outputResults
-def _checkSemiForbiddenTags(htmlFile):
+    def result():
+        outputResults = []
+        for key,val in results.items():
+            outputResults.append(outputLabel+' <'+key+'>: '+'; '.join(val))
+        return outputResults
+    return HtmlRule(check, tags, None, visit, result)
+def _mainRule():
+    tags = []
+    def visit(tag, ancestorTags):
+        tags.append(tag)
+    def result():
+        outputResult = []
+        if not tags:
+            outputResult.append('[MISSING main]')
+        elif len(tags) > 1:
+            results = {}
+            for tag in tags:
+                if tag.name in results:
+                    results[tag.name].append(str(tag.sourceline))#+':'+str(tag.sourcepos))
+                else:
+                    results[tag.name] = [str(tag.sourceline)]#+':'+str(tag.sourcepos)]
+            for key,val in results.items():
+                outputResult.append('[MULTIPLE main] <'+key+'>: '+'; '.join(val))
+        return outputResult
+    return HtmlRule(HtmlChecks.Main, ['main'], None, visit, result)
+def _nestedArticlesRule():
+    # = document.select('article article')
+    return _tagSourceLinesRule(HtmlChecks.NestedArticles, ['article'], '[NESTED articles]', lambda tag, ancestorTags: ancestorTags['article'] > 0)
+def _semiForbiddenTagsRule():
     forbiddenTags = ['div','span','br']
-    results = {}
-    document = _parseHtmlFile(htmlFile)
-    tags = document.find_all(forbiddenTags)
-    for tag in tags:
-        # if tag.name == 'br' and tag.parent and tag.parent.name == 'p':
-        #     continue
-        if tag.name in results:
-            results[tag.name].append(str(tag.sourceline))#+':'+str(tag.sourcepos))
-        else:
-            results[tag.name] = [str(tag.sourceline)]#+':'+str(tag.sourcepos)]
-    outputResults = []
-    for key,val in results.items():
-        outputResults.append('[Semi-verboden tag] <'+key+'>: '+'; '.join(val))
-    return outputResults
-def _checkForbiddenTags(htmlFile):
+    # if tag.name == 'br' and tag.parent and tag.parent.name == 'p': => ignore
+    return _tagSourceLinesRule(HtmlChecks.SemiForbiddenTags, forbiddenTags, '[Semi-verboden tag]')
+def _forbiddenTagsRule():
     forbiddenTags = ['b','i','u','hr']
-    results = {}
-    document = _parseHtmlFile(htmlFile)
-    tags = document.find_all(forbiddenTags)
-    for tag in tags:
-        # if tag.name == 'br' and tag.parent and tag.parent.name == 'p':
-        #     continue
-        if tag.name in results:
-            results[tag.name].append(str(tag.sourceline))#+':'+str(tag.sourcepos))
-        else:
-            results[tag.name] = [str(tag.sourceline)]#+':'+str(tag.sourcepos)]
-    outputResults = []
-    for key,val in results.items():
-        outputResults.append('[Verboden tag] <'+key+'>: '+'; '.join(val))
-    return outputResults
-def _checkUpperCaseTags(htmlFile):
-    # TODO: requires original tag-names with possible uppercase characters
-    results = {}
-    document = _parseHtmlFile(htmlFile, caseSensitive=True)
-    tags = document.find_all(re.compile('[A-Z]'))
-    for tag in tags:
-        if tag.name in results:
-            results[tag.name].append(str(tag.sourceline)+':'+str(tag.sourcepos))
-        else:
-            results[tag.name] = [str(tag.sourceline)+':'+str(tag.sourcepos)]
-    outputResults = []
-    for key,val in results.items():
-        outputResults.append('[UPPER] <'+key+'>: '+'; '.join(val))
-    return outputResults
-def _checkImageScaling(htmlFile):
-    results = {}
-    document = _parseHtmlFile(htmlFile)
-    def loopTags(tags):
-        for tag in tags:
-            # if tag.name == 'br' and tag.parent and tag.parent.name == 'p':
-            #     continue
-            if tag.name in results:
-                if not str(tag.sourceline) in results[tag.name]:
-                    results[tag.name].append(str(tag.sourceline))#+':'+str(tag.sourcepos))
-            else:
-                results[tag.name] = [str(tag.sourceline)]#+':'+str(tag.sourcepos)]
-    loopTags(document.find_all('img', width=True))
-    loopTags(document.find_all('img', height=True))
-    outputResults = []
-    for key,val in results.items():
-        outputResults.append('[Image scaling] <'+key+'>: '+'; '.join(val))
-    return outputResults
-def _checkImageAltInfo(htmlFile):
+    return _tagSourceLinesRule(HtmlChecks.ForbiddenTags, forbiddenTags, '[Verboden tag]')
+def _imageScalingRule():
+    widthLines = []
+    heightLines = []
+    def visit(tag, ancestorTags):
+        if tag.has_attr('width'):
+            widthLines.append(str(tag.sourceline))
+        if tag.has_attr('height'):
+            heightLines.append(str(tag.sourceline))
+    def result():
+        # same order as before: first all scaled widths, then scaled heights (unique lines)
+        lines = []
+        for line in widthLines + heightLines:
+            if not line in lines:
+                lines.append(line)#+':'+str(tag.sourcepos))
+        return ['[Image scaling] <img>: '+'; '.join(lines)] if lines else []
+    return HtmlRule(HtmlChecks.ImageScaling, ['img'], None, visit, result)
+def _imageAltInfoRule():
     outputResult = []
-    document = _parseHtmlFile(htmlFile)
-    tags = document.find_all('img')
-    for tag in tags:
+    def visit(tag, ancestorTags):
         #outputResult.append(str(tag))
         outputResult.append(str(tag.sourceline)+': '+str(tag))
-    return outputResult
-def _checkFormInputTypes(htmlFile):
+    return HtmlRule(HtmlChecks.ImageAltInfo, ['img'], None, visit, lambda: outputResult, needsTree=True)
+def _formInputTypesRule():
     formInputTags = ['input','select','textarea']
     results = {}
-    document = _parseHtmlFile(htmlFile)
-    tags = document.find_all(formInputTags)
-    for tag in tags:
+    def visit(tag, ancestorTags):
         inputType = None
         if tag.name == 'input':
             inputType = None
@@ -371,142 +351,158 @@ def _checkFormInputTypes(htmlFile):
                 inputType = 'input_'+tag['type']
         else:
             inputType = tag.name
-        
+
         if inputType and inputType in results:
             results[inputType] += 1
         else:
             results[inputType] = 1
-    outputResults = []
-    for key,val in results.items():
-        outputResults.append(str(val)+'\t'+key)
-    return outputResults
-def _checkFormInputValidations(htmlFile):
+    def result():
+        outputResults = []
+        for key,val in results.items():
+            outputResults.append(str(val)+'\t'+key)
+        return outputResults
+    return HtmlRule(HtmlChecks.FormInputTypes, formInputTags, None, visit, result)
+def _formInputValidationsRule():
     formInputTags = ['input','select','textarea']
     valAttributes = ['required','minlength','maxlength','min','max','step','pattern']
     results = {}
-    document = _parseHtmlFile(htmlFile)
-    tags = document.find_all(formInputTags)
-    for tag in tags:
+    def visit(tag, ancestorTags):
         for valAttr in valAttributes:
             if tag.has_attr(valAttr):
                 if valAttr in results:
                     results[valAttr] += 1
                 else:
                     results[valAttr] = 1
-    outputResults = []
-    for key,val in results.items():
-        outputResults.append(str(val)+'\t'+key)
-    return outputResults
-def _checkFormInputNameAttr(htmlFile):
+    def result():
+        outputResults = []
+        for key,val in results.items():
+            outputResults.append(str(val)+'\t'+key)
+        return outputResults
+    return HtmlRule(HtmlChecks.FormInputValidation, formInputTags, None, visit, result)
+def _formInputNameAttrRule():
     formInputTags = ['input','select','textarea']
     outputResults = []
-    document = _parseHtmlFile(htmlFile)
-    tags = document.find_all(formInputTags)
-    for tag in tags:
+    def visit(tag, ancestorTags):
         if tag.name == 'input' and tag.has_attr('type') and (tag['type'] == 'submit' or tag['type'] == 'reset'):
-            continue
+            return
         if not tag.has_attr('name') or not tag['name']:
             outputResults.append(str(tag.sourceline)+': '+str(tag))
+    return HtmlRule(HtmlChecks.FormInputNameAttr, formInputTags, None, visit, lambda: outputResults, needsTree=True)
+def _getHtmlFileRules():
+    # order of the rules = order of the results
+    return [_mainRule(), _nestedArticlesRule(), _forbiddenTagsRule(), _semiForbiddenTagsRule(),
+            _imageScalingRule(), _imageAltInfoRule(),
+            _formInputTypesRule(), _formInputNameAttrRule(), _formInputValidationsRule()]
+def _checkMain(htmlFile):
+    return _checkHtmlFileWithRules(htmlFile, [_mainRule()])[HtmlChecks.Main]
+def _checkNestedArticles(htmlFile):
+    return _checkHtmlFileWithRules(htmlFile, [_nestedArticlesRule()])[HtmlChecks.NestedArticles]
+def _checkSemiForbiddenTags(htmlFile):
+    return _checkHtmlFileWithRules(htmlFile, [_semiForbiddenTagsRule()])[HtmlChecks.SemiForbiddenTags]
+def _checkForbiddenTags(htmlFile):
+    return _checkHtmlFileWithRules(htmlFile, [_forbiddenTagsRule()])[HtmlChecks.ForbiddenTags]
+def _checkUpperCaseTags(htmlFile):
+    # TODO: requires original tag-names with possible uppercase characters
+    results = {}
+    document = _parseHtmlFile(htmlFile, caseSensitive=True)
+    tags = document.find_all(re.compile('[A-Z]'))
+    for tag in tags:
+        if tag.name in results:
+            results[tag.name].append(str(tag.sourceline)+':'+str(tag.sourcepos))
+        else:
+            results[tag.name] = [str(tag.sourceline)+':'+str(tag.sourcepos)]
+    outputResults = []
+    for key,val in results.items():
+        outputResults.append('[UPPER] <'+key+'>: '+'; '.join(val))
     return outputResults
+def _checkImageScaling(htmlFile):
+    return _checkHtmlFileWithRules(htmlFile, [_imageScalingRule()])[HtmlChecks.ImageScaling]
+def _checkImageAltInfo(htmlFile):
+    return _checkHtmlFileWithRules(htmlFile, [_imageAltInfoRule()])[HtmlChecks.ImageAltInfo]
+def _checkFormInputTypes(htmlFile):
+    return _checkHtmlFileWithRules(htmlFile, [_formInputTypesRule()])[HtmlChecks.FormInputTypes]
+def _checkFormInputValidations(htmlFile):
+    return _checkHtmlFileWithRules(htmlFile, [_formInputValidationsRule()])[HtmlChecks.FormInputValidation]
+def _checkFormInputNameAttr(htmlFile):
+    return _checkHtmlFileWithRules(htmlFile, [_formInputNameAttrRule()])[HtmlChecks.FormInputNameAttr]
+def _checkHtmlFile(htmlFile):
+    # checks on individual file => (isValidFile, results, tagsFlatmap)
+    fileName = os.path.relpath(htmlFile, projectBaseDir)
+    results = []
+    # algemeen
+    baseStructureResults = None
+    pageTitleAndH1Results = None
+    codeOutsideBodyResults = None
+    #semanticTagsOfFileResults = None
+    #upperCaseTagsResults = None
+    ruleResults = None
+    try:
+        baseStructureResults = _checkBaseStructure(htmlFile)
+        if not baseStructureResults:
+            pageTitleAndH1Results = _checkPageTitleAndH1Info(htmlFile)
+            codeOutsideBodyResults = _checkCodeOutsideBody(htmlFile)
+            #semanticTagsOfFileResults = _checkSemanticTagsInfoOfFile(htmlFile)
+            #upperCaseTagsResults = _checkUpperCaseTags(htmlFile)
+            # main, nested articles, (semi-)forbidden tags, images, forms + tag-count: one walk of the document
+            ruleResults = _checkHtmlFileWithRules(htmlFile, _getHtmlFileRules() + [_tagCountRule(fileName)])
+        else:
+            ruleResults = _checkHtmlFileWithRules(htmlFile, [_tagCountRule(fileName)])
+    except Exception as exc:
+        results.append([fileName, HtmlChecks.Error, f'Error while processing file... {type(exc).__name__}: {str(exc)}'])
+        return (False, results, None)
+    # tag-count (used by summary)
+    tagsFlatmap = ruleResults.pop(HtmlChecks.TagSummary)
+    results.append([fileName, HtmlChecks.BaseStructure, baseStructureResults])
+    if not baseStructureResults:
+        results.append([fileName, HtmlChecks.PageTitleAndH1Info, pageTitleAndH1Results])
+        results.append([fileName, HtmlChecks.OutsideBody, codeOutsideBodyResults])
+        #results.append([fileName, HtmlChecks.SemanticTags, semanticTagsOfFileResults])
+        #results.append([fileName, HtmlChecks.UpperCaseTagNames, upperCaseTagsResults])
+        # main, nested articles, (semi-)forbidden tags, afbeeldingen, forms
+        for check, ruleResult in ruleResults.items():
+            results.append([fileName, check, ruleResult])
+    return (True, results, tagsFlatmap)
 def _checkHtmlFiles(htmlFiles):
+    global flatmapHtmlFiles
     if not htmlFiles: return []
     ## DO CHECKs
     results = []
     validHtmlFiles = []
-    # checks on individual file
-    for htmlFile in htmlFiles:
-        fileName = os.path.relpath(htmlFile, projectBaseDir)
-        # algemeen
-        baseStructureResults = None
-        pageTitleAndH1Results = None
-        codeOutsideBodyResults = None
-        #semanticTagsOfFileResults = None
-        #upperCaseTagsResults = None
-        mainResults = None
-        nestedArticlesResults = None
-        forbiddenTagsResults = None
-        semiForbiddenTagsResults = None
-        imageScalingResults = None
-        imageAltInfoResults = None
-        formInputTypesResults = None
-        formInputNameAttrResults = None
-        formInputValidationsResults = None
-        try:
-            baseStructureResults = _checkBaseStructure(htmlFile)
-            if not baseStructureResults:
-                pageTitleAndH1Results = _checkPageTitleAndH1Info(htmlFile)
-                codeOutsideBodyResults = _checkCodeOutsideBody(htmlFile)
-                #semanticTagsOfFileResults = _checkSemanticTagsInfoOfFile(htmlFile)
-                #upperCaseTagsResults = _checkUpperCaseTags(htmlFile)
-                mainResults = _checkMain(htmlFile)
-                nestedArticlesResults = _checkNestedArticles(htmlFile)
-                forbiddenTagsResults = _checkForbiddenTags(htmlFile)
-                semiForbiddenTagsResults = _checkSemiForbiddenTags(htmlFile)
-                imageScalingResults = _checkImageScaling(htmlFile)
-                imageAltInfoResults = _checkImageAltInfo(htmlFile)
-                formInputTypesResults = _checkFormInputTypes(htmlFile)
-                formInputNameAttrResults = _checkFormInputNameAttr(htmlFile)
-                formInputValidationsResults = _checkFormInputValidations(htmlFile)
-        except Exception as exc:
-            results.append([fileName, HtmlChecks.Error, f'Error while processing file... {type(exc).__name__}: {str(exc)}'])
-            continue
-        validHtmlFiles.append(htmlFile)
-        results.append([fileName, HtmlChecks.BaseStructure, baseStructureResults])
-        if not baseStructureResults:
-            results.append([fileName, HtmlChecks.PageTitleAndH1Info, pageTitleAndH1Results])
-            results.append([fileName, HtmlChecks.OutsideBody, codeOutsideBodyResults])
-            #results.append([fileName, HtmlChecks.SemanticTags, semanticTagsOfFileResults])
-            #results.append([fileName, HtmlChecks.UpperCaseTagNames, upperCaseTagsResults])
-            results.append([fileName, HtmlChecks.Main, mainResults])
-            results.append([fileName, HtmlChecks.NestedArticles, nestedArticlesResults])
-            results.append([fileName, HtmlChecks.ForbiddenTags, forbiddenTagsResults])
-            results.append([fileName, HtmlChecks.SemiForbiddenTags, semiForbiddenTagsResults])
-            # afbeeldingen
-            results.append([fileName, HtmlChecks.ImageScaling, imageScalingResults])
-            results.append([fileName, HtmlChecks.ImageAltInfo, imageAltInfoResults])
-            # forms
-            results.append([fileName, HtmlChecks.FormInputTypes, formInputTypesResults])
-            results.append([fileName, HtmlChecks.FormInputNameAttr, formInputNameAttrResults])
-            results.append([fileName, HtmlChecks.FormInputValidation, formInputValidationsResults])
-    # summary
-    results.append([None, HtmlChecks.TagSummary, _getTagsSummaryOfFiles(validHtmlFiles, showFileNames=True)])
-    results.append([None, HtmlChecks.SemanticTags, _checkSemanticTagsInfoOfFiles(validHtmlFiles)])
-    return results
-
-
-def _getAllFiles(dir, ext, filenamePrefix = None, recursive = True, ignoreDotDirs = True):
-    files = []
-    for entry in os.listdir(dir):
-        fullPath = os.path.join(dir, entry)
-        if os.path.isdir(fullPath):
-            if ignoreDotDirs and entry.startswith('.'):
-                continue
-            if not entry in excludeDirs and recursive:
-                files += _getAllFiles(fullPath, ext, filenamePrefix, recursive, ignoreDotDirs)
-        elif fullPath.endswith('.'+ext if ext[0] != '.' else ext):
-            if not filenamePrefix or entry.startswith(filenamePrefix):
-                files.append(fullPath)
-    return files
+    # checks on individual file (possibly in worker processes, results in order of htmlFiles)
+    for htmlFile, (isValidHtmlFile, fileResults, tagsFlatmap) in zip(htmlFiles, _mapFiles(_checkHtmlFile, htmlFiles, projectBaseDir)):
+        results += fileResults
+        _emitResults(fileResults) # records of the file (if a record output is open)
+        if isValidHtmlFile:
+            validHtmlFiles.append(htmlFile)
+            flatmapHtmlFiles[os.path.relpath(htmlFile, projectBaseDir)] = tagsFlatmap
+    # summary (both from the same counts)
+    tagCountMatrix = _getTagCountMatrix(validHtmlFiles)
+    projectResults = [[None, HtmlChecks.TagSummary, _getTagsSummaryOfFiles(validHtmlFiles, showFileNames=True, tagCountMatrix=tagCountMatrix)],
+                      [None, HtmlChecks.SemanticTags, _checkSemanticTagsInfoOfFiles(validHtmlFiles, tagCountMatrix)]]
+    _emitResults(projectResults)
+    return results + projectResults
 
 
 ## MODULE (whem imported as module) ##
-def checkProject(projectDir):
+def _resetProjectData(projectDir):
     # reset project-cached-data
-    global parsedHtmlFiles, flatmapHtmlFiles
-    parsedHtmlFiles = {}
-    flatmapHtmlFiles = []
-    # check project
+    global flatmapHtmlFiles
+    flatmapHtmlFiles = {}
     global projectBaseDir
     projectBaseDir = projectDir
+
+def checkProject(projectDir):
+    _resetProjectData(projectDir)
+    # check project
     results = []
-    htmlFiles = _getAllFiles(projectDir, '.html', recursive=doCheckSubFolders, ignoreDotDirs=excludeDotDirs)
+    htmlFiles = _getFiles(projectDir, '.html', recursive=doCheckSubFolders, ignoreDotDirs=excludeDotDirs, excludeDirs=excludeDirs)
     results += _checkHtmlFiles(htmlFiles)
     return results
 
 
 ## MAIN (executed as standalone script) ##
 def _clearOutputFiles(outputDir, outputFilenamePrefix):
-    resultFiles = _getAllFiles(outputDir, '.txt', filenamePrefix = outputFilenamePrefix)
+    resultFiles = _getFiles(outputDir, '.txt', filenamePrefix=outputFilenamePrefix, excludeDirs=excludeDirs)
     for resultFile in resultFiles:
         os.remove(resultFile)
 
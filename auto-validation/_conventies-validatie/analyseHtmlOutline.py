@@ -11,12 +11,22 @@ __maintainer__ = "Kenneth De Keulenaer"
 __email__ = "kenneth.dekeulenaer@kdg.be"
 __status__ = "Production"
 
+try:
+    ## MODULE (when loaded as module) ##
+    from .documentStore import getHtmlDocument as _getHtmlDocument
+    from .parallel import mapFiles as _mapFiles
+    from .projectFiles import getFiles as _getFiles
+except ImportError:
+    ## SCRIPT (when run as script) ##
+    from documentStore import getHtmlDocument as _getHtmlDocument
+    from parallel import mapFiles as _mapFiles
+    from projectFiles import getFiles as _getFiles
+
 from importlib.resources import path
 import os
 import os.path
 import re
 import bs4
-from bs4.element import NavigableString
 import argparse
 
 
@@ -35,21 +45,14 @@ headingRegex = re.compile('^h([1-6])$')
 
 
 ## HTML Files ##
-parsedHtmlFiles = {} # all lower case (= case insensitive)
 #parsedAsXmlFiles = {} # as is (= case sensitive)
 def _parseHtmlFile(htmlFile, caseSensitive=False):
-    global parsedHtmlFiles
-    fileName = os.path.relpath(htmlFile, projectBaseDir)
     document = None
     if not caseSensitive:
-        if fileName in parsedHtmlFiles:
-            document = parsedHtmlFiles[fileName]
-        else:
-            with open(htmlFile) as file:
-                document = bs4.BeautifulSoup(file.read(), 'html.parser')
-                #document = bs4.BeautifulSoup(file.read(), 'html5lib') # requires 'pip install html5lib' # creates valid HTML5, but we wan't the original code + is slow
-                parsedHtmlFiles[fileName] = document
+        # all lower case (= case insensitive), shared with the other analysers => do NOT modify!
+        document = _getHtmlDocument(htmlFile)
     # elif caseSensitive: # TODO: requires original tag names from source
+    #     fileName = os.path.relpath(htmlFile, projectBaseDir)
     #     if fileName in parsedAsXmlFiles:
     #         document = parsedAsXmlFiles[fileName]
     #     else:
@@ -58,72 +61,64 @@ def _parseHtmlFile(htmlFile, caseSensitive=False):
     #             parsedAsXmlFiles[fileName] = document
     return document
 
-def _deleteDisplayedText(soup):
-    new_children = []
-    for child in soup.contents:
-        if not isinstance(child, NavigableString):
-            new_children.append(_deleteDisplayedText(child))
-    soup.contents = new_children
-    return soup
-def _deleteNonOutlineTags(soup, removeSectioningRootTags=False):
+def _copyOutlineTags(soup, skeletonParent, removeSectioningRootTags=False):
+    # copy sectioning- and heading-tags only (without displayed text), other tags are 'unwrapped'
     sectioningRootElements = [] # ['figure', 'blockquote', 'details', 'dialog', 'fieldset', 'td']
     for tag in soup:
         if isinstance(tag, bs4.Tag):
             if removeSectioningRootTags and tag.name in sectioningRootElements:
-                tag.extract() # remove element (with content)
-                continue
+                continue # skip element (with content)
             if not (tag.name in sectioningElements or headingRegex.match(tag.name)):
-                tag.unwrap()
-                _deleteNonOutlineTags(soup)
+                _copyOutlineTags(tag, skeletonParent, removeSectioningRootTags)
             else:
-                _deleteNonOutlineTags(tag)
+                outlineTag = bs4.Tag(name=tag.name, sourceline=tag.sourceline, sourcepos=tag.sourcepos)
+                skeletonParent.append(outlineTag)
+                _copyOutlineTags(tag, outlineTag, removeSectioningRootTags)
 def _getOutlineSkeleton(soup):
-    soup = _deleteDisplayedText(soup)
-    #print(soup.prettify())
-    _deleteNonOutlineTags(soup)
-    #print(soup.prettify())
-    return soup
-
-def _hasPreviousSiblingSectioningElement(tag):
-    hasPrevSiblingSectioningElement = False
-    for prevSibling in tag.previous_siblings:
-        if isinstance(prevSibling, bs4.Tag):
-            if prevSibling.name in sectioningElements:
-                hasPrevSiblingSectioningElement = True
-                break
-    return hasPrevSiblingSectioningElement
-def _pairwiseSum(tuple1, tuple2):
-    return tuple(list1 + list2 for (list1, list2) in zip(tuple1, tuple2))
-def _checkOutline(soup, level=0):
-    headingCount = 0
-    prevSectioningCount = 0
-    errors = ([], [], [])
-    for tag in soup:
-        if isinstance(tag, bs4.Tag):
+    # build a new skeleton, the (shared) parsed document is left untouched
+    skeleton = bs4.Tag(name=soup.name)
+    _copyOutlineTags(soup, skeleton)
+    #print(skeleton.prettify())
+    return skeleton
+
+def _newOutlineSection(sourceline, level):
+    return {'sourceline': sourceline, 'level': level, 'headingCount': 0, 'prevSectioningCount': 0, 'hasSectioningChild': False}
+def _closeOutlineSection(section, errors):
+    if (section['headingCount'] == 0 and section['level'] > 0) or section['prevSectioningCount'] > 0:
+        errors[0].append(section['sourceline'])
+    if section['headingCount'] > 1:
+        errors[2].append(section['sourceline'])
+def _checkOutline(soup):
+    # one walk in document order (without recursion), the open sectioning elements on a stack
+    # other tags are transparent, the content of a heading is not part of the outline
+    errors = ([], [], []) # untitled, level conflict, multiple headings
+    sections = [_newOutlineSection(None, 0)] # document (not a sectioning element => never closed)
+    stack = [(iter(soup.contents), False)]
+    while stack:
+        for tag in stack[-1][0]:
+            if not isinstance(tag, bs4.Tag):
+                continue
+            section = sections[-1]
             headingMatch = headingRegex.match(tag.name)
-            if tag.name in sectioningElements:
-                _, _, nestedErrors = _checkOutline(tag, level + 1)
-                errors = _pairwiseSum(errors, nestedErrors)
-            elif headingMatch:
-                if _hasPreviousSiblingSectioningElement(tag) and headingCount == 0:
-                    prevSectioningCount += 1
-                headingCount += 1
-                headingLevel = int(headingMatch.group(1))
-                if headingLevel != level:
+            if headingMatch:
+                if section['hasSectioningChild'] and section['headingCount'] == 0:
+                    section['prevSectioningCount'] += 1
+                section['headingCount'] += 1
+                if int(headingMatch.group(1)) != section['level']:
                     errors[1].append(tag.sourceline)
-            else:
-                if _hasPreviousSiblingSectioningElement(tag) and headingCount == 0:
-                    prevSectioningCount += 1
-                nestedHeadingCount, nestedPrevSectioningCount, nestedErrors = _checkOutline(tag, level)
-                headingCount += nestedHeadingCount
-                prevSectioningCount += nestedPrevSectioningCount
-                errors = _pairwiseSum(errors, nestedErrors)
-    if soup.name in sectioningElements:
-        if (headingCount == 0 and level > 0) or prevSectioningCount > 0:
-            errors[0].append(soup.sourceline)
-        if headingCount > 1:
-            errors[2].append(soup.sourceline)
-    return headingCount, prevSectioningCount, errors
+            elif tag.name in sectioningElements:
+                section['hasSectioningChild'] = True
+                sections.append(_newOutlineSection(tag.sourceline, section['level'] + 1))
+                stack.append((iter(tag.contents), True))
+                break
+            elif tag.contents:
+                stack.append((iter(tag.contents), False))
+                break
+        else:
+            (_, isSection) = stack.pop()
+            if isSection:
+                _closeOutlineSection(sections.pop(), errors)
+    return errors
 
 def getHtmlOutlineSkeleton(filePath):
     soup = _parseHtmlFile(filePath)
@@ -132,44 +127,33 @@ def getHtmlOutlineSkeleton(filePath):
 
 def checkOutline(filePath):
     soup = _parseHtmlFile(filePath)
-    soupOfOutlineSkeleton = _getOutlineSkeleton(soup)
-    _, _, errors = _checkOutline(soupOfOutlineSkeleton)
-    return errors
-
-
-def _getAllFiles(dir, ext, filenamePrefix = None, recursive = True, ignoreDotDirs = True):
-    files = []
-    for entry in os.listdir(dir):
-        fullPath = os.path.join(dir, entry)
-        if os.path.isdir(fullPath):
-            if ignoreDotDirs and entry.startswith('.'):
-                continue
-            if not entry in excludeDirs and recursive:
-                files += _getAllFiles(fullPath, ext, filenamePrefix, recursive, ignoreDotDirs)
-        elif fullPath.endswith('.'+ext if ext[0] != '.' else ext):
-            if not filenamePrefix or entry.startswith(filenamePrefix):
-                files.append(fullPath)
-    return files
-
-
-def _checkProject(projectDir):
-    # reset project-cached-data
-    global parsedHtmlFiles
-    parsedHtmlFiles = {}
-    # check project
+    return _checkOutline(soup)
+
+
+def _checkOutlineOfFile(file):
+    # check on individual file => result (or None)
+    fileName = os.path.relpath(file, projectBaseDir)
+    try:
+        outlineErrors = checkOutline(file)
+        if outlineErrors:
+            return [fileName, outlineErrors]
+    except TypeError as err:
+        return [fileName, 'Is propably empty...']
+    except BaseException as err:
+        return [fileName, f'Error while processing file... {type(err).__name__}: {str(err)}']
+    return None
+def _resetProjectData(projectDir):
     global projectBaseDir
     projectBaseDir = projectDir
+def _checkProject(projectDir):
+    # check project
+    _resetProjectData(projectDir)
     results = []
-    for file in _getAllFiles(projectDir, '.html', recursive=doCheckSubFolders, ignoreDotDirs=excludeDotDirs):
-        fileName = os.path.relpath(file, projectBaseDir)
-        try:
-            outlineErrors = checkOutline(file)
-            if outlineErrors:
-                results.append([fileName, outlineErrors])
-        except TypeError as err:
-            results.append([fileName, 'Is propably empty...'])
-        except BaseException as err:
-            results.append([fileName, f'Error while processing file... {type(err).__name__}: {str(err)}'])
+    htmlFiles = _getFiles(projectDir, '.html', recursive=doCheckSubFolders, ignoreDotDirs=excludeDotDirs, excludeDirs=excludeDirs)
+    # (possibly in worker processes, results in order of htmlFiles)
+    for result in _mapFiles(_checkOutlineOfFile, htmlFiles, projectBaseDir):
+        if result:
+            results.append(result)
     return results
 
 
@@ -2,6 +2,23 @@
 
 #v0.4
 
+try:
+    ## MODULE (when loaded as module) ##
+    from .documentStore import getParsedHtmlDocument as _getParsedHtmlDocument
+    from .htmlEvents import visitHtmlTags as _visitHtmlTags
+    from .parallel import mapFiles as _mapFiles
+    from .resultRecords import emitResults as _emitResults
+    from .projectFiles import getFiles as _getFiles
+    from .profiler import measure as _measure
+except ImportError:
+    ## SCRIPT (when run as script) ##
+    from documentStore import getParsedHtmlDocument as _getParsedHtmlDocument
+    from htmlEvents import visitHtmlTags as _visitHtmlTags
+    from parallel import mapFiles as _mapFiles
+    from resultRecords import emitResults as _emitResults
+    from projectFiles import getFiles as _getFiles
+    from profiler import measure as _measure
+
 import os
 import re #regex
 import esprima # pip install esprima
@@ -23,24 +40,52 @@ class JsChecks(Enum):
     EventLevelHandling = 31; EventAttributeHandling = 32
 
 # custom types
-ScopeInfo = namedtuple('ScopeInfo', ['level','type','variables','range','children','parent'])
+ScopeInfo = namedtuple('ScopeInfo', ['level','type','variables','range','children','parent','declarations']) # declarations: name => [VariableInfo] (declarations + parameters)
 VariableInfo = namedtuple('VariableInfo', ['name', 'kind', 'type', 'initialValue', 'scopeInfo', 'line', 'column','range'])
 
 
 ## JS files ##
-parsedJsFiles = {}
-def _parseJsFile(jsFile):
+# what each check needs of the parser: 'ast' (syntax tree), 'loc' (line/column) and/or 'tokens'
+jsCheckParseNeeds = {
+    JsChecks.SourceType: {'ast'},
+    JsChecks.StrictMode: {'ast'},
+    JsChecks.GlobalVariables: {'ast', 'loc'},
+    JsChecks.VarVariables: {'ast', 'loc'},
+    JsChecks.UndeclaredVariables: {'ast', 'loc'},
+    JsChecks.EventLevelHandling: {'tokens', 'loc'},
+}
+def _getParseProfile(checks):
+    # cheapest parse that covers the needs of all checks
+    profile = set()
+    for check in checks:
+        profile |= jsCheckParseNeeds.get(check, set())
+    return frozenset(profile)
+
+parsedJsFiles = {} # fileName => (profile, script or tokens)
+def _parseJsFile(jsFile, profile = None):
+    # profile None = whatever is parsed already (default: everything)
     global parsedJsFiles
     fileName = os.path.relpath(jsFile, projectBaseDir)
+    if profile is None:
+        profile = parsedJsFiles[fileName][0] if fileName in parsedJsFiles else _getParseProfile(jsCheckParseNeeds)
     script = None
-    if fileName in parsedJsFiles:
-        script = parsedJsFiles[fileName]
+    if fileName in parsedJsFiles and parsedJsFiles[fileName][0] >= profile:
+        script = parsedJsFiles[fileName][1]
+    elif not 'ast' in profile:
+        # tokens only: no syntax tree needed
+        f = open(jsFile, encoding='utf-8')
+        fileContent = f.read()
+        f.close()
+        with _measure('parse.js', jsFile):
+            script = esprima.tokenize(fileContent, {'loc': 'loc' in profile})
+        parsedJsFiles[fileName] = (profile, script)
     else:
         f = open(jsFile, encoding='utf-8')
         fileContent = f.read()
         f.close()
         # info: always parse as module, because .parseScript(...) gives error even if script only has 'import' en no 'export' declaration
-        script = esprima.parseModule(fileContent, {'comment': True, 'loc': True, 'range': True, 'tokens': True})
+        with _measure('parse.js', jsFile):
+            script = esprima.parseModule(fileContent, {'loc': 'loc' in profile, 'tokens': 'tokens' in profile})
         # fix: check if js-file is 'script' instead of 'module', and modify 'sourceType' from 'module' to 'script'
         scriptType = script.type if hasattr(script, 'type') else ''
         if scriptType == 'Program':
@@ -51,8 +96,63 @@ def _parseJsFile(jsFile):
                     break
             if not isModule:
                 script.sourceType = 'script'
-        parsedJsFiles[fileName] = script
+        parsedJsFiles[fileName] = (profile, script)
     return script
+def _getJsTokens(jsFile):
+    script = _parseJsFile(jsFile)
+    return script if isinstance(script, list) else script.tokens
+## AST walker ##
+# child-fields per node-type (in the order of esprima's nodes)
+jsChildFields = {
+    'Program': ('body',),
+    'ArrayExpression': ('elements',), 'ArrayPattern': ('elements',),
+    'ArrowFunctionExpression': ('params', 'body'), 'FunctionDeclaration': ('id', 'params', 'body'), 'FunctionExpression': ('id', 'params', 'body'),
+    'AssignmentExpression': ('left', 'right'), 'AssignmentPattern': ('left', 'right'),
+    'BinaryExpression': ('left', 'right'), 'LogicalExpression': ('left', 'right'),
+    'AwaitExpression': ('argument',), 'RestElement': ('argument',), 'ReturnStatement': ('argument',), 'SpreadElement': ('argument',),
+    'ThrowStatement': ('argument',), 'UnaryExpression': ('argument',), 'UpdateExpression': ('argument',), 'YieldExpression': ('argument',),
+    'BlockStatement': ('body',), 'ClassBody': ('body',),
+    'BreakStatement': ('label',), 'ContinueStatement': ('label',), 'LabeledStatement': ('label', 'body'),
+    'CallExpression': ('callee', 'arguments'), 'NewExpression': ('callee', 'arguments'),
+    'CatchClause': ('param', 'body'),
+    'ClassDeclaration': ('id', 'superClass', 'body'), 'ClassExpression': ('id', 'superClass', 'body'),
+    'MemberExpression': ('object', 'property'), 'MetaProperty': ('meta', 'property'),
+    'ConditionalExpression': ('test', 'consequent', 'alternate'), 'IfStatement': ('test', 'consequent', 'alternate'),
+    'DoWhileStatement': ('body', 'test'), 'WhileStatement': ('test', 'body'), 'WithStatement': ('object', 'body'),
+    'ForStatement': ('init', 'test', 'update', 'body'), 'ForInStatement': ('left', 'right', 'body'), 'ForOfStatement': ('left', 'right', 'body'),
+    'ExportAllDeclaration': ('source',), 'ExportDefaultDeclaration': ('declaration',), 'ExportNamedDeclaration': ('declaration', 'specifiers', 'source'),
+    'ExportSpecifier': ('exported', 'local'), 'ExportDefaultSpecifier': ('local',),
+    'ImportDeclaration': ('specifiers', 'source'), 'ImportSpecifier': ('local', 'imported'),
+    'ImportDefaultSpecifier': ('local',), 'ImportNamespaceSpecifier': ('local',),
+    'ExpressionStatement': ('expression',),
+    'MethodDefinition': ('key', 'value'), 'FieldDefinition': ('key', 'value'), 'Property': ('key', 'value'),
+    'ObjectExpression': ('properties',), 'ObjectPattern': ('properties',),
+    'SequenceExpression': ('expressions',),
+    'SwitchStatement': ('discriminant', 'cases'), 'SwitchCase': ('test', 'consequent'),
+    'TaggedTemplateExpression': ('tag', 'quasi'), 'TemplateLiteral': ('quasis', 'expressions'),
+    'TryStatement': ('block', 'handler', 'finalizer'),
+    'VariableDeclaration': ('declarations',), 'VariableDeclarator': ('id', 'init'),
+    'Identifier': (), 'Literal': (), 'TemplateElement': (), 'ThisExpression': (), 'Super': (), 'Import': (),
+    'EmptyStatement': (), 'DebuggerStatement': (),
+}
+def _getChildNodes(node, includeLists = True):
+    childNodes = []
+    childFields = jsChildFields.get(node.type)
+    values = [getattr(node, field) for field in childFields] if childFields is not None else vars(node).values() # unknown node-type: all fields
+    for value in values:
+        if isinstance(value, esprima.nodes.Node):
+            childNodes.append(value)
+        elif includeLists and isinstance(value, list):
+            childNodes += [item for item in value if isinstance(item, esprima.nodes.Node)]
+    return childNodes
+def _walkJsNodes(node, includeLists = True):
+    # iterative (no recursion limit on big/minified files) => nodes in source order
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        yield node
+        stack += reversed(_getChildNodes(node, includeLists))
+
 def _checkSourceType(jsFile):
     lex = _parseJsFile(jsFile)
     return [lex.sourceType]
@@ -64,8 +164,11 @@ def _checkStrictMode(jsFile):
     if firstObject.directive == 'use strict':
         return ['OK']
     return ['NOK']
+def _addVariable(scopeInfo, variableInfo):
+    scopeInfo.variables.append(variableInfo)
+    if variableInfo.type in ['declaration','parameter']:
+        scopeInfo.declarations.setdefault(variableInfo.name, []).append(variableInfo)
 def _getVariables(node, scopeInfo):
-    variables = scopeInfo.variables
     if hasattr(node, 'type'):
         name = None
         kind = None
@@ -87,7 +190,7 @@ def _getVariables(node, scopeInfo):
                     column = declaration.id.loc.start.column
                 if hasattr(declaration.id, 'range'): 
                     range = declaration.id.range
-                variables.append(VariableInfo(name, kind, type, initialValue, scopeInfo, line, column, range))
+                _addVariable(scopeInfo, VariableInfo(name, kind, type, initialValue, scopeInfo, line, column, range))
         elif node.type == "ExpressionStatement":
             # vb 'name;' # geeft ook runtime-error
             if node.expression.type == "Identifier":
@@ -98,33 +201,26 @@ def _getVariables(node, scopeInfo):
                     column = node.expression.loc.start.column
                 if hasattr(node.expression, 'range'): 
                     range = node.expression.range
-                variables.append(VariableInfo(name, kind, type, initialValue, scopeInfo, line, column, range))
+                _addVariable(scopeInfo, VariableInfo(name, kind, type, initialValue, scopeInfo, line, column, range))
         elif node.type == "AssignmentExpression":
             # vb 'name = ...;' / 'name. ... = ...;' / 'name[...] = ...;'
             type = 'assignment'
             if node.left.type == "Identifier":
                 name = node.left.name
             else:
-                ids = []
-                def findIdentifiers(nodeProp):
-                    localIds = []
-                    if hasattr(nodeProp, 'type') and nodeProp.type == 'Identifier':
-                        localIds.append(nodeProp.name)
-                    else:
-                        try:
-                            for attr, value in vars(nodeProp).items():
-                                localIds += findIdentifiers(value)
-                        except:
-                            pass # ignore
-                    return localIds
-                ids += findIdentifiers(node)
-                name = ids[0]
+                # first identifier (not in lists) of 'name. ... = ...' / 'name[...] = ...'
+                for nodeProp in _walkJsNodes(node, includeLists=False):
+                    if nodeProp.type == 'Identifier':
+                        name = nodeProp.name
+                        break
+                if not name:
+                    return # e.g. 'this[0] = ...'
             if hasattr(node.left, 'loc'): 
                 line = node.left.loc.start.line
                 column = node.left.loc.start.column
             if hasattr(node.left, 'range'): 
                 range = node.left.range
-            variables.append(VariableInfo(name, kind, type, initialValue, scopeInfo, line, column, range))
+            _addVariable(scopeInfo, VariableInfo(name, kind, type, initialValue, scopeInfo, line, column, range))
         elif node.type in ['FunctionDeclaration','FunctionExpression','ArrowFunctionExpression']:
             # vb 'function X(...) {...}' / 'function(...) {...}' / '(...) => {...}' / '(...) => ...'
             for param in node.params:
@@ -144,44 +240,51 @@ def _getVariables(node, scopeInfo):
                         column = param.left.loc.start.column
                     if hasattr(param.left, 'range'): 
                         range = param.left.range
-                variables.append(VariableInfo(name, kind, type, initialValue, scopeInfo, line, column, range))
+                _addVariable(scopeInfo, VariableInfo(name, kind, type, initialValue, scopeInfo, line, column, range))
 def _getScopeTree(node, parentScope = None):
-    if isinstance(node, list):
-        for subnode in node:
-            _getScopeTree(subnode, parentScope)
-    nodeType = node.type if hasattr(node, 'type') else ''
-    scopeInfo = None
-    if not parentScope or nodeType == 'Program':
-        nodeSourceType = node.sourceType if hasattr(node, 'sourceType') else ''
-        if not nodeSourceType == 'module':
-            nodeSourceType = 'global'
-        scopeInfo = ScopeInfo(0, nodeSourceType, [], None, [], None)
-        _getScopeTree(node.body, scopeInfo)
-    elif nodeType == 'BlockStatement':
-        scopeInfo = ScopeInfo(parentScope.level+1, 'block', [], None, [], parentScope)
-        parentScope.children.append(scopeInfo)
-        _getScopeTree(node.body, scopeInfo)
-    elif nodeType in ['FunctionDeclaration','FunctionExpression','ArrowFunctionExpression']:
-        scopeType = 'function'
-        if nodeType == 'ArrowFunctionExpression' and not node.body.type == 'BlockStatement':
-            scopeType = 'arrowexpression'
-        scopeInfo = ScopeInfo(parentScope.level+1, scopeType, [], None, [], parentScope)
-        parentScope.children.append(scopeInfo)
-        # (arrow-)function wit code-block syntax => function-node and block-statement same scope!
-        body = node.body
-        if node.body.type == 'BlockStatement':
-            body = body.body
-        _getScopeTree(body, scopeInfo)
-    else:
-        try:
-            scopeInfo = parentScope
-            for attr, value in vars(node).items():
-                _getScopeTree(value, scopeInfo)
-        except:
-            pass # ignore Exceptiovn
-
-    _getVariables(node, scopeInfo)
-    return scopeInfo
+    # iterative walk, variables of a node are added after those of its child nodes
+    rootScope = None
+    stack = [(node, parentScope, False)] # (node, scopeInfo, childNodesAdded)
+    while stack:
+        (node, scopeInfo, childNodesAdded) = stack.pop()
+        if childNodesAdded:
+            _getVariables(node, scopeInfo)
+            continue
+        nodeType = node.type
+        if not scopeInfo or nodeType == 'Program':
+            nodeSourceType = node.sourceType if node.sourceType else ''
+            if not nodeSourceType == 'module':
+                nodeSourceType = 'global'
+            scopeInfo = ScopeInfo(0, nodeSourceType, [], None, [], None, {})
+            rootScope = scopeInfo
+            childNodes = [childNode for childNode in node.body if isinstance(childNode, esprima.nodes.Node)]
+        elif nodeType == 'BlockStatement':
+            scopeInfo = ScopeInfo(scopeInfo.level+1, 'block', [], None, [], scopeInfo, {})
+            scopeInfo.parent.children.append(scopeInfo)
+            childNodes = _getChildNodes(node)
+        elif nodeType in ['FunctionDeclaration','FunctionExpression','ArrowFunctionExpression']:
+            scopeType = 'function'
+            if nodeType == 'ArrowFunctionExpression' and not node.body.type == 'BlockStatement':
+                scopeType = 'arrowexpression'
+            scopeInfo = ScopeInfo(scopeInfo.level+1, scopeType, [], None, [], scopeInfo, {})
+            scopeInfo.parent.children.append(scopeInfo)
+            # (arrow-)function wit code-block syntax => function-node and block-statement same scope!
+            childNodes = _getChildNodes(node.body) if node.body.type == 'BlockStatement' else [node.body]
+        else:
+            childNodes = _getChildNodes(node)
+        stack.append((node, scopeInfo, True))
+        stack += [(childNode, scopeInfo, False) for childNode in reversed(childNodes)]
+    return rootScope if rootScope else parentScope
+scopeTrees = {}
+def _getFileScopeTree(jsFile):
+    # one scope analysis per file, shared by the variable checks
+    global scopeTrees
+    fileName = os.path.relpath(jsFile, projectBaseDir)
+    if not fileName in scopeTrees:
+        script = _parseJsFile(jsFile)
+        with _measure('scope.js', jsFile):
+            scopeTrees[fileName] = _getScopeTree(script)
+    return scopeTrees[fileName]
 def _variableInfosToOutputResult(variableInfos):
     uniqueVariables = {}
     for variableInfo in variableInfos:
@@ -195,8 +298,7 @@ def _variableInfosToOutputResult(variableInfos):
         outputResults.append(f'{key:<20}\t\t{locations}')
     return outputResults
 def _checkGlobalDeclaredVariables(jsFile):
-    lex = _parseJsFile(jsFile)
-    scopeTree = _getScopeTree(lex)
+    scopeTree = _getFileScopeTree(jsFile)
     # global declared variables
     globalDeclaredVariables = list(filter(lambda v: v.type == 'declaration', scopeTree.variables))
     def findVarDeclaredVariablesOutsideFunctions(scopeInfo):
@@ -212,8 +314,7 @@ def _checkGlobalDeclaredVariables(jsFile):
             globalDeclaredVariables += findVarDeclaredVariablesOutsideFunctions(childScopeInfo)
     return _variableInfosToOutputResult(globalDeclaredVariables)
 def _checkAllVarDeclaredVariables(jsFile):
-    lex = _parseJsFile(jsFile)
-    scopeTree = _getScopeTree(lex)
+    scopeTree = _getFileScopeTree(jsFile)
     # all 'var' declared variables
     def findVarDeclaredVariables(scopeInfo):
         varVariables = list(filter(lambda v: v.type == 'declaration' and v.kind == 'var', scopeInfo.variables))
@@ -226,25 +327,15 @@ def _checkAllVarDeclaredVariables(jsFile):
 def _findUndeclaredVariables(scopeInfo, checkChildScopes = True, ignoreVariableNames = [], topParentScopeInfo = None):
     undeclaredVariables = []
     topScopeInfo = topParentScopeInfo if topParentScopeInfo else scopeInfo
-    def isVariableDeclaredInScope(name, scopeInfo):
-        declarationFound = False
-        for scopeVariableIfo in scopeInfo.variables:
-            if  scopeVariableIfo.name == name and scopeVariableIfo.type in ['declaration','parameter']:
-                declarationFound = True
-                break
-        return declarationFound
     def isVariableDeclaredInScopeTree(name, scopeInfo):
-        declarationFound = False
-        parentScope = None
-        while not declarationFound:
-            declarationFound = isVariableDeclaredInScope(name, parentScope if parentScope else scopeInfo )
-            if declarationFound:
+        # declaration tables of the scope and its parent scopes (up to the top scope)
+        while scopeInfo:
+            if name in scopeInfo.declarations:
+                return True
+            if scopeInfo is topScopeInfo:
                 break
-            elif scopeInfo.parent and not scopeInfo == topScopeInfo and not parentScope == topScopeInfo:
-                parentScope = parentScope.parent if parentScope else scopeInfo.parent
-            else:
-                break
-        return declarationFound
+            scopeInfo = scopeInfo.parent
+        return False
     for variableInfo in scopeInfo.variables:
         if (variableInfo.type == 'undeclared' or variableInfo.type == 'assignment'):
             variableName = variableInfo.name
@@ -257,155 +348,157 @@ def _findUndeclaredVariables(scopeInfo, checkChildScopes = True, ignoreVariableN
             undeclaredVariables += _findUndeclaredVariables(childScopeInfo, ignoreVariableNames=ignoreVariableNames, topParentScopeInfo=topScopeInfo)
     return undeclaredVariables
 def _checkGlobalUndeclaredVariables(jsFile):
-    lex = _parseJsFile(jsFile)
-    scopeTree = _getScopeTree(lex)
+    scopeTree = _getFileScopeTree(jsFile)
     # undeclared variables
     undeclaredVariables = _findUndeclaredVariables(scopeTree, checkChildScopes=True, ignoreVariableNames=['window','document'])
     return _variableInfosToOutputResult(undeclaredVariables)
 def _checkEventLevelHandling(jsFile):
-    lex = _parseJsFile(jsFile)
-    if not lex.tokens:
+    tokens = _getJsTokens(jsFile)
+    if not tokens:
         return
     #possibleEventMembers = list(filter(lambda token: token.name.startsWith('on') and token.type == 'Identifier', lex.tokens))
     possibleEventMembers = []
-    for index, token in enumerate(lex.tokens):
+    for index, token in enumerate(tokens):
         if token.type == 'Identifier' and token.value.startswith('on'):
             if index > 0:
-                prevToken = lex.tokens[index-1]
+                prevToken = tokens[index-1]
                 if prevToken.type == 'Punctuator' and prevToken.value == '.':
                     possibleEventMembers.append(token)
     outputResults = []
     for token in possibleEventMembers:
         outputResults.append(f'{token.value:<15}\t{token.loc.start.line}:{token.loc.start.column}')
     return outputResults
-def _checkJsFiles(jsFiles):
+jsFileChecks = [ # (check, name of the check function: looked up at call time, e.g. measured by --profile)
+    # info
+    (JsChecks.SourceType, '_checkSourceType'),
+    (JsChecks.StrictMode, '_checkStrictMode'),
+    # variables
+    (JsChecks.GlobalVariables, '_checkGlobalDeclaredVariables'),
+    (JsChecks.VarVariables, '_checkAllVarDeclaredVariables'),
+    (JsChecks.UndeclaredVariables, '_checkGlobalUndeclaredVariables'),
+    # events
+    (JsChecks.EventLevelHandling, '_checkEventLevelHandling'),
+]
+def _checkJsFile(jsFile, checks = None):
+    # checks on individual file => results (checks None = all)
+    fileName = os.path.relpath(jsFile, projectBaseDir)
+    results = []
+    enabledChecks = [(check, checkFunctionName) for (check, checkFunctionName) in jsFileChecks if checks is None or check in checks]
+    checkResults = []
+    try:
+        # parse once, only what the enabled checks need
+        _parseJsFile(jsFile, _getParseProfile(check for (check, _) in enabledChecks))
+        for (check, checkFunctionName) in enabledChecks:
+            checkResults.append(globals()[checkFunctionName](jsFile))
+    except Exception as exc:
+        results.append([fileName, JsChecks.Error, f'Error while processing file... {type(exc).__name__}: {str(exc)}'])
+        return results
+    for ((check, _), checkResult) in zip(enabledChecks, checkResults):
+        results.append([fileName, check, checkResult])
+    return results
+def _checkJsFiles(jsFiles, checks = None):
     if not jsFiles: return []
     ## DO CHECKs
     results = []
-    for jsFile in jsFiles:
-        fileName = os.path.relpath(jsFile, projectBaseDir)
-        sourceTypeResults = None
-        strictModeResults = None
-        globalDeclaredVariablesResults = None
-        varDeclaredVariablesResults = None
-        globalUndeclaredVariablesResults = None
-        eventLevelHandlingResults = None
-        try:
-            sourceTypeResults = _checkSourceType(jsFile)
-            strictModeResults = _checkStrictMode(jsFile)
-            globalDeclaredVariablesResults = _checkGlobalDeclaredVariables(jsFile)
-            varDeclaredVariablesResults = _checkAllVarDeclaredVariables(jsFile)
-            globalUndeclaredVariablesResults = _checkGlobalUndeclaredVariables(jsFile)
-            eventLevelHandlingResults = _checkEventLevelHandling(jsFile)
-        except Exception as exc:
-            results.append([fileName, JsChecks.Error, f'Error while processing file... {type(exc).__name__}: {str(exc)}'])
-            continue
-        # info
-        results.append([fileName, JsChecks.SourceType, sourceTypeResults])
-        results.append([fileName, JsChecks.StrictMode, strictModeResults])
-        # variables
-        results.append([fileName, JsChecks.GlobalVariables, globalDeclaredVariablesResults])
-        results.append([fileName, JsChecks.VarVariables, varDeclaredVariablesResults])
-        results.append([fileName, JsChecks.UndeclaredVariables, globalUndeclaredVariablesResults])
-        # events
-        results.append([fileName, JsChecks.EventLevelHandling, eventLevelHandlingResults])
+    for fileResults in _mapFiles(_checkJsFile, jsFiles, projectBaseDir, checks):
+        results += fileResults
+        _emitResults(fileResults) # records of the file (if a record output is open)
     return results
 
-
 ## HTML Files ##
-parsedHtmlFiles = {}
-def _parseHtmlFile(htmlFile):
-    global parsedHtmlFiles
-    fileName = os.path.relpath(htmlFile, projectBaseDir)
-    document = None
-    if fileName in parsedHtmlFiles:
-        document = parsedHtmlFiles[fileName]
-    else:
-        with open(htmlFile) as file:
-            document = bs4.BeautifulSoup(file.read(), 'html.parser')
-            parsedHtmlFiles[fileName] = document
-    return document
-def _checkInternJavaScript(htmlFile):
+# the html-checks only need name, attributes, position (and script-text) of tags:
+# one walk of the shared document (if parsed already), else one stream of the file (see htmlEvents)
+def _visitHtmlFile(htmlFile, visitTags):
+    def visitTag(tag, ancestorTags):
+        for visit in visitTags:
+            visit(tag, ancestorTags)
+    _visitHtmlTags(htmlFile, visitTag, _getParsedHtmlDocument(htmlFile))
+def _internJavaScriptVisitor():
+    tags = []
+    def visit(tag, ancestorTags):
+        if tag.name == 'script':
+            tags.append(tag)
+    def result():
+        # script-text: complete after the walk
+        outputResult = []
+        results = {}
+        for tag in tags:
+            if re.search('\w', tag.text):
+                if tag.name in results:
+                    results[tag.name].append(str(tag.sourceline))#+':'+str(tag.sourcepos))
+                else:
+                    results[tag.name] = [str(tag.sourceline)]#+':'+str(tag.sourcepos)]
+        for key,val in results.items():
+            outputResult.append('<'+key+'>: '+'; '.join(val))
+        return outputResult
+    return (visit, result)
+def _eventAttributeHandlingVisitor(): # = DOM Events Level 0
     outputResult = []
-    document = _parseHtmlFile(htmlFile)
-    tags = document.find_all('script')
-    results = {}
-    for tag in tags:
-        if re.search('\w', tag.text):
-            if tag.name in results:
-                results[tag.name].append(str(tag.sourceline))#+':'+str(tag.sourcepos))
-            else:
-                results[tag.name] = [str(tag.sourceline)]#+':'+str(tag.sourcepos)]
-    for key,val in results.items():
-        outputResult.append('<'+key+'>: '+'; '.join(val))
-    return outputResult
-def _checkEventAttributeHandling(htmlFile): # = DOM Events Level 0
-    outputResult = []
-    document = _parseHtmlFile(htmlFile)
     def getEventAttributes(tag):
         return [k+'="'+v+'"' for k,v in tag.attrs.items() if k.startswith('on')]
-    def hasEventAttribute(tag):
-        return True if getEventAttributes(tag) else False
-    tags = document.find_all(lambda tag : hasEventAttribute(tag))
-    for tag in tags:
-        outputResult.append(str(tag.sourceline)+': <'+str(tag.name)+' '+' '.join(getEventAttributes(tag))+'>')
-    return outputResult
+    def visit(tag, ancestorTags):
+        eventAttributes = getEventAttributes(tag)
+        if eventAttributes:
+            outputResult.append(str(tag.sourceline)+': <'+str(tag.name)+' '+' '.join(eventAttributes)+'>')
+    return (visit, lambda: outputResult)
+def _checkHtmlFileWithVisitors(htmlFile, visitors):
+    _visitHtmlFile(htmlFile, [visit for (visit, _) in visitors])
+    return [result() for (_, result) in visitors]
+def _checkInternJavaScript(htmlFile):
+    return _checkHtmlFileWithVisitors(htmlFile, [_internJavaScriptVisitor()])[0]
+def _checkEventAttributeHandling(htmlFile):
+    return _checkHtmlFileWithVisitors(htmlFile, [_eventAttributeHandlingVisitor()])[0]
+def _checkHtmlFile(htmlFile):
+    # checks on individual file => results
+    fileName = os.path.relpath(htmlFile, projectBaseDir)
+    results = []
+    internJavaScriptResults = None
+    eventAttributeHandlingResults = None
+    try:
+        # both in one walk (or stream) of the file
+        (internJavaScriptResults, eventAttributeHandlingResults) = _checkHtmlFileWithVisitors(htmlFile, [_internJavaScriptVisitor(), _eventAttributeHandlingVisitor()])
+    except Exception as exc:
+        results.append([fileName, JsChecks.ErrorHtml, f'Error while processing file... {type(exc).__name__}: {str(exc)}'])
+        return results
+    # intern scripts
+    results.append([fileName, JsChecks.InternScript, internJavaScriptResults])
+    # events
+    results.append([fileName, JsChecks.EventAttributeHandling, eventAttributeHandlingResults])
+    return results
 def _checkHtmlFiles(htmlFiles):
     if not htmlFiles: return []
     # DO CHECKs
     results = []
-    for htmlFile in htmlFiles:
-        fileName = os.path.relpath(htmlFile, projectBaseDir)
-        internJavaScriptResults = None
-        eventAttributeHandlingResults = None
-        try:
-            internJavaScriptResults = _checkInternJavaScript(htmlFile)
-            eventAttributeHandlingResults = _checkEventAttributeHandling(htmlFile)
-        except Exception as exc:
-            results.append([fileName, JsChecks.ErrorHtml, f'Error while processing file... {type(exc).__name__}: {str(exc)}'])
-            continue
-        # intern scripts
-        results.append([fileName, JsChecks.InternScript, internJavaScriptResults])
-        # events
-        results.append([fileName, JsChecks.EventAttributeHandling, eventAttributeHandlingResults])
+    for fileResults in _mapFiles(_checkHtmlFile, htmlFiles, projectBaseDir):
+        results += fileResults
+        _emitResults(fileResults)
     return results
 
 
-def _getAllFiles(dir, ext, filenamePrefix = None, recursive = True, ignoreDotDirs = True):
-    files = []
-    for entry in os.listdir(dir):
-        fullPath = os.path.join(dir, entry)
-        if os.path.isdir(fullPath):
-            if ignoreDotDirs and entry.startswith('.'):
-                continue
-            if not entry in excludeDirs and recursive:
-                files += _getAllFiles(fullPath, ext, filenamePrefix, recursive, ignoreDotDirs)
-        elif fullPath.endswith('.'+ext if ext[0] != '.' else ext):
-            if not filenamePrefix or entry.startswith(filenamePrefix):
-                files.append(fullPath)
-    return files
-
-
 ## MODULE (whem imported as module) ##
-def checkProject(projectDir):
+def _resetProjectData(projectDir):
     # reset project-cached-data
-    global parsedJsFiles, parsedHtmlFiles
+    global parsedJsFiles, scopeTrees
     parsedJsFiles = {}
-    parsedHtmlFiles = {}
-    # check project
+    scopeTrees = {}
     global projectBaseDir
     projectBaseDir = projectDir
+
+def checkProject(projectDir, checks = None):
+    # checks: JsChecks to do on the js-files (None = all)
+    _resetProjectData(projectDir)
+    # check project
     results = []
-    htmlFiles = _getAllFiles(projectDir, '.html', recursive=doCheckSubFolders, ignoreDotDirs=excludeDotDirs)
+    htmlFiles = _getFiles(projectDir, '.html', recursive=doCheckSubFolders, ignoreDotDirs=excludeDotDirs, excludeDirs=excludeDirs)
     results += _checkHtmlFiles(htmlFiles)
-    jsFiles = _getAllFiles(projectDir, '.js', recursive=doCheckSubFolders, ignoreDotDirs=excludeDotDirs)
-    results += _checkJsFiles(jsFiles)
+    jsFiles = _getFiles(projectDir, '.js', recursive=doCheckSubFolders, ignoreDotDirs=excludeDotDirs, excludeDirs=excludeDirs)
+    results += _checkJsFiles(jsFiles, checks)
     return results
 
 
 ## MAIN (executed as standalone script) ##
 def _clearOutputFiles(outputDir, outputFilenamePrefix):
-    resultFiles = _getAllFiles(outputDir, '.txt', filenamePrefix = outputFilenamePrefix)
+    resultFiles = _getFiles(outputDir, '.txt', filenamePrefix=outputFilenamePrefix, excludeDirs=excludeDirs)
     for resultFile in resultFiles:
         os.remove(resultFile)
 
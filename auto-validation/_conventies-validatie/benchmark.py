@@ -0,0 +1,322 @@
+#!/usr/bin/python3
+"""benchmark.py: Timings of the analysers on generated (synthetic) projects.
+
+A project is generated with a configurable number and size of html-, css- and
+js-files: pages with deep nesting, forms, images and inline styles/scripts,
+large stylesheets and a minified css- and js-bundle. On that project are timed:
+- checkProject of analyseHtml, analyseCss, analyseJs and analyseHtmlOutline
+- every _check* function of these analysers, on all files of its type
+  (per file: htmlFile/cssFile/jsFile, per project: htmlFiles/cssFiles/jsFiles)
+Every timing is 'cold': documents, project index and cached project data are
+cleared before it (so parsing is included) and the result cache is disabled.
+With --scales the numbers of files are multiplied, for a scaling curve.
+The timings are appended to a csv-file (a row per function per scale), so runs
+(--label) can be compared to catch regressions.
+"""
+
+try:
+    ## MODULE (when loaded as module) ##
+    from . import analyseHtml, analyseCss, analyseJs, analyseHtmlOutline
+    from .documentStore import clear as _clearDocuments
+    from .projectFiles import clear as _clearProjectIndexes, getFiles as _getFiles
+    from .resultCache import setEnabled as _setResultCacheEnabled
+except ImportError:
+    ## SCRIPT (when run as script) ##
+    import analyseHtml, analyseCss, analyseJs, analyseHtmlOutline
+    from documentStore import clear as _clearDocuments
+    from projectFiles import clear as _clearProjectIndexes, getFiles as _getFiles
+    from resultCache import setEnabled as _setResultCacheEnabled
+
+import os
+import csv
+import time
+import re #regex
+import random
+import inspect
+import argparse
+import tempfile
+from collections import namedtuple
+
+# custom types
+ProjectSettings = namedtuple('ProjectSettings', ['htmlFiles', 'cssFiles', 'jsFiles', 'htmlSize', 'cssSize', 'jsSize', 'depth', 'bundleSize'])
+Timing = namedtuple('Timing', ['module', 'function', 'input', 'calls', 'bestSeconds', 'meanSeconds', 'errors'])
+
+# global settings
+analyserModules = [analyseHtml, analyseCss, analyseJs, analyseHtmlOutline]
+csvColumns = ['label', 'scale', 'htmlFiles', 'cssFiles', 'jsFiles', 'projectBytes', 'fastCss'] + list(Timing._fields)
+
+# input of a _check* function, by the name of its first parameter => extension of the files (None = project)
+checkInputs = {'htmlFile': '.html', 'cssFile': '.css', 'jsFile': '.js',
+               'htmlFiles': '.html', 'cssFiles': '.css', 'jsFiles': '.js',
+               'file': '.html', 'soup': '.html', # (analyseHtmlOutline)
+               'projectDir': None}
+perFileInputs = ['htmlFile', 'cssFile', 'jsFile', 'file', 'soup']
+minifyRegex = re.compile(r'\s*([{};:])\s*')
+
+
+## GENERATOR ##
+def _generateHtmlBlock(rnd, n):
+    blocks = [
+        f'<section>\n<h2>Sectie {n}</h2>\n<p>Tekst <b>vet</b> en <i>schuin</i>.<br>regel {n}</p>\n</section>',
+        f'<article>\n<h3>Artikel {n}</h3>\n<article><h4>Genest</h4><p>Inhoud {n}</p></article>\n</article>',
+        f'<figure><img src="img/foto{n}.jpg" alt="foto {n}"><figcaption>Foto {n}</figcaption></figure>',
+        f'<p><img src="img/groot{n}.png" width="200" height="100"></p>',
+        f'<form action="#">\n<label>Naam <input type="text" name="naam{n}" required></label>\n<input type="emal">\n<input type="number" min="0" max="10" name="aantal{n}">\n<button onclick="verstuur({n})">OK</button>\n</form>',
+        f'<div class="kader c{n}" style="color: red; margin: 0" onmouseover="toon({n})"><span>inline {n}</span></div>',
+        f'<DIV><P>Hoofdletters {n}</P></DIV>',
+        f'<aside><nav><ul><li><a href="#s{n}">link {n}</a></li><li><a href="pagina{n}.html">pagina</a></li></ul></nav></aside>',
+        f'<table><tr><th>Kolom</th></tr><tr><td><font color="red">oud {n}</font><center>{n}</center></td></tr></table>',
+    ]
+    return rnd.choice(blocks)
+
+def _generateNestedHtml(depth):
+    # deep nesting, with a sectioning element and heading every few levels (outline)
+    opened = []
+    lines = []
+    for level in range(depth):
+        tagName = 'section' if level % 4 == 0 else 'div'
+        lines.append(f'<{tagName} class="niveau-{level}">' + (f'<h{min(level // 4 + 2, 6)}>Niveau {level}</h{min(level // 4 + 2, 6)}>' if tagName == 'section' else ''))
+        opened.append(tagName)
+    lines.append('<p>Diep genest</p>')
+    lines += [f'</{tagName}>' for tagName in reversed(opened)]
+    return '\n'.join(lines)
+
+def _generateHtmlPage(rnd, index, settings, cssNames, jsNames):
+    links = '\n'.join(f'<link rel="stylesheet" href="css/{cssName}">' for cssName in cssNames)
+    scripts = '\n'.join(f'<script src="js/{jsName}"></script>' for jsName in jsNames)
+    blocks = '\n'.join(_generateHtmlBlock(rnd, index * settings.htmlSize + n) for n in range(max(settings.htmlSize // 5, 1))) # ~5 elements per block
+    outsideBody = '<p>Na de body</p>\n' if index % 5 == 0 else ''
+    return f'''<!DOCTYPE html>
+<html lang="nl">
+<head>
+<meta charset="UTF-8">
+<title>Pagina {index}</title>
+{links}
+<link rel="stylesheet" href="https://fonts.example.com/css?family=Roboto">
+<style>
+.intern-{index} {{ color: blue; float: left; }}
+</style>
+{scripts}
+<script>
+var paginaNummer = {index};
+function toon(n) {{ console.log(n + paginaNummer); }}
+</script>
+</head>
+<body>
+<header><h1>Pagina {index}</h1></header>
+<main>
+{blocks}
+{_generateNestedHtml(settings.depth)}
+</main>
+<footer><p>Voettekst</p></footer>
+</body>
+{outsideBody}</html>
+'''
+
+def _generateCssRules(rnd, count, offset = 0, comments = True):
+    # => list of style rules (strings)
+    declarations = [
+        'color: #333', 'margin: 0 auto', 'padding: 1em', 'font-size: 1.2rem', 'display: block',
+        'float: left', 'text-indent: -9999px', 'position: absolute', 'box-sizing: border-box',
+        'display: grid', 'grid-template-columns: repeat(3, 1fr)', 'display: flex', 'flex-direction: column',
+        'width: 100%', 'background-color: #fff', 'border: 1px solid #ccc',
+    ]
+    rules = []
+    for n in range(offset, offset + count):
+        selector = rnd.choice([f'.c{n}', f'#id{n}', f'main > .c{n} p', f'nav a.link{n}:hover', f'h{n % 6 + 1}'])
+        properties = '; '.join(rnd.sample(declarations, rnd.randint(2, 6)))
+        rule = f'{selector} {{ {properties}; }}'
+        if comments and n % 7 == 0:
+            rule = f'/* positie en box-sizing {n} */\n{rule}'
+        if n % 25 == 0:
+            rule = f'@media (max-width: {600 + n}px) {{\n{rule}\n}}'
+        rules.append(rule)
+    return rules
+
+def _generateJsFunction(n, depth):
+    # function with nested closures (scope tree depth), declared/undeclared variables and event handling
+    nested = f'return totaal{n};'
+    for level in reversed(range(depth)):
+        nested = f'function binnen{n}_{level}(x{level}) {{ let y{level} = x{level} * 2; teller{n} += y{level}; {nested} }}\nreturn binnen{n}_{level}(totaal{n});'
+    return f'''function functie{n}(a, b) {{
+    var totaal{n} = a + b;
+    let lijst = [1, 2, 3];
+    for (var i = 0; i < lijst.length; i++) {{ totaal{n} += lijst[i]; }}
+    teller{n} = totaal{n};
+    {nested}
+}}
+document.getElementById('knop{n}').addEventListener('click', function (e) {{ functie{n}(1, 2); }});
+document.querySelector('.c{n}').onclick = () => {{ console.log('klik {n}'); }};
+const object{n} = {{ waarde: {n}, methode() {{ return this.waarde; }} }};
+class Klasse{n} {{ constructor(x) {{ this.x = x; }} get dubbel() {{ return this.x * 2; }} }}
+'''
+
+def _generateJsBundle(bundleSize):
+    # minified: everything on one line
+    parts = ['!function(){"use strict";var g=0;']
+    size = len(parts[0])
+    n = 0
+    while size < bundleSize:
+        part = f'function f{n}(a,b){{var c=a+b+g;for(var i=0;i<3;i++)c+=i;return function(d){{return c*d}}}}g=f{n}(g,{n})(2);document.querySelector(".b{n}")&&document.querySelector(".b{n}").addEventListener("click",function(){{g++}});'
+        parts.append(part)
+        size += len(part)
+        n += 1
+    parts.append('}();\n')
+    return ''.join(parts)
+
+def _generateCssBundle(rnd, bundleSize):
+    # minified: everything on one line
+    parts = []
+    size = 0
+    n = 0
+    while size < bundleSize:
+        part = minifyRegex.sub(r'\1', _generateCssRules(rnd, 1, n, comments=False)[0])
+        parts.append(part)
+        size += len(part)
+        n += 1
+    return ''.join(parts) + '\n'
+
+def _writeFile(file, content):
+    os.makedirs(os.path.dirname(file), exist_ok=True)
+    with open(file, 'w', encoding='utf-8') as output:
+        output.write(content)
+
+def generateProject(projectDir, settings, seed = 0):
+    # writes the synthetic project => total size of its files (bytes)
+    rnd = random.Random(seed)
+    cssNames = [f'stijl{n}.css' for n in range(settings.cssFiles)] + (['bundle.min.css'] if settings.bundleSize else [])
+    jsNames = [f'script{n}.js' for n in range(settings.jsFiles)] + (['bundle.min.js'] if settings.bundleSize else [])
+    for index in range(settings.htmlFiles):
+        pageDir = projectDir if index % 3 else os.path.join(projectDir, 'paginas') # also a subdirectory
+        _writeFile(os.path.join(pageDir, f'pagina{index}.html'), _generateHtmlPage(rnd, index, settings, cssNames, jsNames))
+    for index in range(settings.cssFiles):
+        _writeFile(os.path.join(projectDir, 'css', f'stijl{index}.css'), '\n\n'.join(_generateCssRules(rnd, settings.cssSize, index * settings.cssSize)) + '\n')
+    for index in range(settings.jsFiles):
+        content = ('"use strict";\n' if index % 2 else '') + '\n'.join(_generateJsFunction(index * settings.jsSize + n, settings.depth // 8) for n in range(settings.jsSize))
+        _writeFile(os.path.join(projectDir, 'js', f'script{index}.js'), content)
+    if settings.bundleSize:
+        _writeFile(os.path.join(projectDir, 'css', 'bundle.min.css'), _generateCssBundle(rnd, settings.bundleSize))
+        _writeFile(os.path.join(projectDir, 'js', 'bundle.min.js'), _generateJsBundle(settings.bundleSize))
+    projectBytes = 0
+    for (dirPath, _, fileNames) in os.walk(projectDir):
+        projectBytes += sum(os.path.getsize(os.path.join(dirPath, fileName)) for fileName in fileNames)
+    return projectBytes
+
+
+## TIMING ##
+def _resetProjectData(projectDir):
+    # cold start: nothing parsed or indexed yet
+    _clearDocuments()
+    _clearProjectIndexes()
+    for module in analyserModules:
+        module._resetProjectData(projectDir)
+
+def _getCheckFunctions(module):
+    # => [(name, function, input)] of the _check* functions that can be called with only their input
+    checkFunctions = []
+    for (name, function) in vars(module).items():
+        if not name.startswith('_check') or not inspect.isfunction(function) or function.__module__ != module.__name__:
+            continue
+        parameters = list(inspect.signature(function).parameters.values())
+        if not parameters or not parameters[0].name in checkInputs:
+            continue
+        if any(parameter.default is inspect.Parameter.empty for parameter in parameters[1:]):
+            continue # e.g. _checkHtmlFileWithRules(htmlFile, rules): timed as part of its callers
+        checkFunctions.append((name, function, parameters[0].name))
+    return checkFunctions
+
+def _getCheckArguments(projectDir, input):
+    # => argument per call
+    extension = checkInputs[input]
+    if not extension:
+        return [projectDir]
+    files = _getFiles(projectDir, extension, excludeDirs=analyseHtml.excludeDirs)
+    if input == 'soup':
+        return [analyseHtmlOutline._parseHtmlFile(file) for file in files] # (parsing not timed)
+    return files if input in perFileInputs else [files]
+
+def _timeCalls(projectDir, function, getArguments, repeat):
+    # => (best, mean, errors) of calling function with every argument, cold each repeat
+    durations = []
+    errors = 0
+    for _ in range(repeat):
+        _resetProjectData(projectDir)
+        arguments = getArguments()
+        startTime = time.perf_counter()
+        for argument in arguments:
+            try:
+                function(argument)
+            except Exception:
+                errors += 1
+        durations.append(time.perf_counter() - startTime)
+    return (min(durations), sum(durations) / len(durations), errors // repeat)
+
+def benchmarkProject(projectDir, repeat = 3, fastCss = False):
+    # => [Timing] of the checkProject and the _check* functions of all analysers
+    _setResultCacheEnabled(False)
+    projectFunctions = [(analyseHtml, lambda projectDir: analyseHtml.checkProject(projectDir)),
+                        (analyseCss, lambda projectDir: analyseCss.checkProject(projectDir, fastCss)),
+                        (analyseJs, lambda projectDir: analyseJs.checkProject(projectDir)),
+                        (analyseHtmlOutline, lambda projectDir: analyseHtmlOutline.checkProject(projectDir, outputToFile=False))]
+    timings = []
+    for (module, function) in projectFunctions:
+        (best, mean, errors) = _timeCalls(projectDir, function, lambda: [projectDir], repeat)
+        timings.append(Timing(module.__name__, 'checkProject', 'projectDir', 1, best, mean, errors))
+    for module in analyserModules:
+        for (name, function, input) in _getCheckFunctions(module):
+            if fastCss and 'fastTokenizer' in inspect.signature(function).parameters:
+                function = lambda argument, function=function: function(argument, fastTokenizer=True)
+            getArguments = lambda input=input: _getCheckArguments(projectDir, input)
+            (best, mean, errors) = _timeCalls(projectDir, function, getArguments, repeat)
+            timings.append(Timing(module.__name__, name, input, len(getArguments()), best, mean, errors))
+    return timings
+
+def _writeTimingsToCsvFile(csvFile, rows):
+    # append (header only in a new file)
+    isNewFile = not os.path.exists(csvFile) or os.path.getsize(csvFile) == 0
+    with open(csvFile, 'a', encoding='utf-8', newline='') as output:
+        csvWriter = csv.DictWriter(output, csvColumns)
+        if isNewFile:
+            csvWriter.writeheader()
+        csvWriter.writerows(rows)
+
+
+## MAIN (executed as standalone script) ##
+def main():
+    # script execution arguments
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--html-files', help='Number of html-files (at scale 1)', action='store', type=int, default=20)
+    parser.add_argument('--css-files', help='Number of css-files (at scale 1)', action='store', type=int, default=4)
+    parser.add_argument('--js-files', help='Number of js-files (at scale 1)', action='store', type=int, default=4)
+    parser.add_argument('--html-size', help='Number of elements per html-file (approx.)', action='store', type=int, default=200)
+    parser.add_argument('--css-size', help='Number of style rules per css-file', action='store', type=int, default=300)
+    parser.add_argument('--js-size', help='Number of functions per js-file', action='store', type=int, default=40)
+    parser.add_argument('--depth', help='Nesting depth of the html-elements (js-closures: depth/8)', action='store', type=int, default=40)
+    parser.add_argument('--bundle-size', help='Bytes of the minified css- and js-bundle (0 = no bundles)', action='store', type=int, default=100000)
+    parser.add_argument('--scales', help='Comma-separated multipliers of the numbers of files', action='store', default='1')
+    parser.add_argument('--repeat', help='Timings per function (best and mean are reported)', action='store', type=int, default=3)
+    parser.add_argument('--seed', help='Seed of the generator', action='store', type=int, default=0)
+    parser.add_argument('--fast-css', help='Read the css-rules with the fast tokenizer', action='store_true')
+    parser.add_argument('--csv', help='Csv-file the timings are appended to', action='store', default='benchmark.csv')
+    parser.add_argument('--label', help='Label of this run in the csv-file (default: date and time)', action='store')
+    parser.add_argument('--keep', help='Directory to generate the projects in (kept), instead of a temporary directory', action='store')
+    args = parser.parse_args()
+
+    label = args.label if args.label else time.strftime('%Y-%m-%d %H:%M:%S')
+    with tempfile.TemporaryDirectory() as tempDir:
+        baseDir = args.keep if args.keep else tempDir
+        for scale in [int(scale) for scale in args.scales.split(',')]:
+            settings = ProjectSettings(args.html_files * scale, args.css_files * scale, args.js_files * scale,
+                                       args.html_size, args.css_size, args.js_size, args.depth, args.bundle_size)
+            projectDir = os.path.join(baseDir, f'project-x{scale}')
+            projectBytes = generateProject(projectDir, settings, args.seed)
+            print(f'scale {scale}: {settings.htmlFiles} html, {settings.cssFiles} css, {settings.jsFiles} js ({projectBytes // 1024} KB)')
+            rows = []
+            for timing in benchmarkProject(projectDir, args.repeat, args.fast_css):
+                print(f'\t{timing.module}.{timing.function}: {timing.bestSeconds:.3f}s ({timing.calls} calls)' + (f', {timing.errors} errors' if timing.errors else ''))
+                rows.append({'label': label, 'scale': scale, 'htmlFiles': settings.htmlFiles, 'cssFiles': settings.cssFiles, 'jsFiles': settings.jsFiles,
+                             'projectBytes': projectBytes, 'fastCss': args.fast_css, **timing._asdict()})
+            _writeTimingsToCsvFile(args.csv, rows)
+
+if __name__ == '__main__':
+    main()
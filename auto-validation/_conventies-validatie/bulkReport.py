@@ -0,0 +1,49 @@
+#!/usr/bin/python3
+"""bulkReport.py: Consolidated report of a --bulk run (csv or json).
+
+One row per project: its status, OK/NOK per report (validatie-*.txt) and the
+number of results per check. Rows are written as soon as a project finishes,
+so memory doesn't grow with the number of projects; the columns are fixed
+before the first project. The report is written to a temp file and renamed
+when the run is done, so it's never partial.
+"""
+
+import os
+import csv
+import json
+from contextlib import contextmanager
+
+# constants
+bulkReportFormats = ['csv', 'json']
+projectColumns = ['project', 'status']
+
+def getColumns(reportNames, checkTypes):
+    return projectColumns + list(reportNames) + [str(checkType) for checkType in checkTypes]
+
+@contextmanager
+def bulkReportFile(outputFile, outputFormat, columns):
+    # => writeRow(row), row: column => value (missing columns are empty, other keys are ignored)
+    if outputFormat not in bulkReportFormats:
+        raise ValueError(f'unknown bulk report format: {outputFormat}')
+    tempFile = os.path.join(os.path.dirname(outputFile), f'.{os.path.basename(outputFile)}.{os.getpid()}.tmp')
+    rowCount = 0
+    try:
+        with open(tempFile, 'w', encoding='utf-8', newline='') as output:
+            if outputFormat == 'csv':
+                csvWriter = csv.DictWriter(output, columns, restval='', extrasaction='ignore')
+                csvWriter.writeheader()
+            def writeRow(row):
+                nonlocal rowCount
+                if outputFormat == 'csv':
+                    csvWriter.writerow(row)
+                else:
+                    output.write(('[\n' if rowCount == 0 else ',\n')+json.dumps({column: row.get(column) for column in columns}, ensure_ascii=False))
+                rowCount += 1
+                output.flush()
+            yield writeRow
+            if outputFormat == 'json':
+                output.write('[]\n' if rowCount == 0 else '\n]\n')
+        os.replace(tempFile, outputFile)
+    finally:
+        if os.path.exists(tempFile):
+            os.remove(tempFile)
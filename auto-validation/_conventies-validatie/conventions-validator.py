@@ -13,6 +13,8 @@ __status__ = "Production"
 
 
 import os
+import time
+import argparse
 
 # OUTLINE: do outline-check on project
 from analyseHtmlOutline import checkProject as _checkProject
@@ -21,18 +23,61 @@ from analyseHtmlOutline import checkProject as _checkProject
 from analyse import analyse as _analyseProject
 from analyse import AnalyseLevel
 
+# PARALLEL: spread per-file checks over worker processes
+from parallel import workers as _workers
+
+# RECORDS: results as records (ndjson/json)
+from resultRecords import outputFormats as _recordFormats
+
+# CACHE: per-file results of unchanged files
+from resultCache import setEnabled as _setResultCacheEnabled
+
+# WATCH: re-check after every change
+from projectWatcher import watchChanges as _watchChanges
+
+
+def _recheckProject(projectDir, changedFiles, fastCss = False, outputFormat = None):
+    # only the checks (and reports) that depend on the changed file types
+    extensions = {os.path.splitext(file)[1] for file in changedFiles}
+    isHtmlChanged = '.html' in extensions # css- and js-checks also check the html-files
+    startTime = time.monotonic()
+    if isHtmlChanged:
+        _checkProject(projectDir)
+    _analyseProject(projectDir, html = isHtmlChanged, css = isHtmlChanged or '.css' in extensions, js = isHtmlChanged or '.js' in extensions, level = AnalyseLevel.Normal, fastCss = fastCss, outputFormat = outputFormat)
+    changedFileNames = ', '.join(os.path.relpath(file, projectDir) for file in changedFiles)
+    print(f'{changedFileNames}: checked in {time.monotonic() - startTime:.2f}s')
+
 
 ## MAIN (executed as standalone script) ##
 def main():
+    # script execution arguments
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--jobs', help='Number of worker processes for the per-file checks (0 = all cpu\'s)', action='store', type=int, default=1)
+    parser.add_argument('--no-cache', help='Don\'t use (or fill) the cache of per-file results', action='store_true')
+    parser.add_argument('--watch', help='Keep running and re-check the project after every change', action='store_true')
+    parser.add_argument('--fast-css', help='Read the css-rules for the property-checks and duplicatie with the fast tokenizer (falls back to cssutils)', action='store_true')
+    parser.add_argument('--format', help='Also write the results as records (file, check, line, column, message) to validatie-resultaten.ndjson/.json', action='store', choices=_recordFormats)
+    args = parser.parse_args()
+    _setResultCacheEnabled(not args.no_cache)
+
     #scriptDir = path.realpath(os.path.dirname(__file__))
     #projectDir = scriptDir
     projectDir = os.getcwd()
 
     print('== Conventions check ==')
-    # OUTLINE: do outline-check on project
-    _checkProject(projectDir)
-    # ANALYSE: do analyse-check on project
-    _analyseProject(projectDir, level = AnalyseLevel.Normal)
+    with _workers(args.jobs):
+        # OUTLINE: do outline-check on project
+        _checkProject(projectDir)
+        # ANALYSE: do analyse-check on project
+        _analyseProject(projectDir, level = AnalyseLevel.Normal, fastCss = args.fast_css, outputFormat = args.format)
+        # WATCH: re-check changed files (parsers and caches stay warm)
+        if args.watch:
+            print('== Watching for changes (ctrl-c to stop) ==')
+            try:
+                for changedFiles in _watchChanges(projectDir):
+                    _recheckProject(projectDir, changedFiles, args.fast_css, args.format)
+            except KeyboardInterrupt:
+                pass
 
 
 if __name__ == "__main__":
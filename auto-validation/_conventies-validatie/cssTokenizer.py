@@ -0,0 +1,196 @@
+#!/usr/bin/python3
+"""cssTokenizer.py: Fast tokenizer for the style rules of a stylesheet.
+
+The stylesheet is read as a whole and only split, not interpreted: every
+top-level style rule is yielded as its raw selector and raw declarations
+(comments within a selector or value included), with line numbers.
+Other comments are skipped, unless asked for (withComments: top-level comments
+and comments between the declarations, in order, as cssutils' cssRules and
+style.children() have them). At-rules are skipped with their block (e.g.
+@media), like cssutils' rulesOfType(STYLE_RULE) does. Anything the tokenizer doesn't
+understand (unterminated comment or string, unbalanced braces, nested rules,
+...) raises a CssTokenizeError, so the caller can fall back to cssutils.
+"""
+
+import re
+from collections import namedtuple
+
+StyleRuleTokens = namedtuple('StyleRuleTokens', ['selector', 'line', 'declarations']) # declarations: [(declaration, line)] (+ CommentTokens)
+CommentTokens = namedtuple('CommentTokens', ['text', 'line'])
+
+class CssTokenizeError(ValueError):
+    pass
+
+# next character that matters (everything in between is copied as is)
+preludeRegex = re.compile(r'[{};"\'/\\()\[\]<-]')
+blockRegex = re.compile(r'[{};"\'/\\()]')
+stringEndRegexes = {'"': re.compile(r'["\\\n]'), "'": re.compile(r"['\\\n]")}
+charsetRegex = re.compile(r'@charset\s+["\']([^"\']*)["\']', re.IGNORECASE)
+
+class _Lines:
+    # line number of a position (positions are asked in increasing order)
+    def __init__(self, cssText):
+        self.cssText = cssText
+        self.position = 0
+        self.line = 1
+    def getLine(self, position):
+        self.line += self.cssText.count('\n', self.position, position)
+        self.position = position
+        return self.line
+
+def _skipComment(cssText, position):
+    # position at '/*' => position after '*/'
+    end = cssText.find('*/', position + 2)
+    if end < 0:
+        raise CssTokenizeError('unterminated comment')
+    return end + 2
+
+def _skipString(cssText, position):
+    # position at quote => position after closing quote
+    stringEndRegex = stringEndRegexes[cssText[position]]
+    position += 1
+    while True:
+        match = stringEndRegex.search(cssText, position)
+        if not match or match.group() == '\n':
+            raise CssTokenizeError('unterminated string')
+        if match.group() == '\\':
+            position = match.end() + 1 # escaped character
+            continue
+        return match.end()
+
+def _skipWhitespaceAndComments(cssText, position, comments = None, lines = None):
+    # comments: list the skipped comments are added to (CommentTokens), None = not needed
+    length = len(cssText)
+    while position < length:
+        if cssText[position].isspace():
+            position += 1
+        elif cssText.startswith('/*', position):
+            start = position
+            position = _skipComment(cssText, position)
+            if comments is not None:
+                comments.append(CommentTokens(cssText[start:position], lines.getLine(start)))
+        else:
+            break
+    return position
+
+def _readUntil(cssText, position, stopChars, regex):
+    # => (raw text, position of the stop character), brackets, strings and comments are skipped
+    depth = 0
+    start = position
+    while True:
+        match = regex.search(cssText, position)
+        if not match:
+            raise CssTokenizeError('unexpected end of stylesheet')
+        char = match.group()
+        position = match.start()
+        if char in '"\'':
+            position = _skipString(cssText, position)
+        elif char == '/':
+            if cssText.startswith('/*', position):
+                position = _skipComment(cssText, position)
+            else:
+                position += 1
+        elif char == '\\':
+            position += 2 # escaped character
+        elif char in '([':
+            depth += 1
+            position += 1
+        elif char in ')]':
+            depth -= 1
+            if depth < 0:
+                raise CssTokenizeError(f'unexpected "{char}"')
+            position += 1
+        elif char == '<' or char == '-':
+            if cssText.startswith('<!--', position) or cssText.startswith('-->', position):
+                raise CssTokenizeError('html comment markers') # ignored by cssutils
+            position += 1
+        elif depth > 0:
+            if char in '{}':
+                raise CssTokenizeError(f'unexpected "{char}"')
+            position += 1
+        elif char in stopChars:
+            return (cssText[start:position], position)
+        else:
+            raise CssTokenizeError(f'unexpected "{char}"')
+
+def _skipAtRule(cssText, position):
+    # position at '@' => position after the at-rule (with its block)
+    (_, position) = _readUntil(cssText, position + 1, ';{', preludeRegex)
+    if cssText[position] == ';':
+        return position + 1
+    depth = 0
+    while True:
+        match = blockRegex.search(cssText, position)
+        if not match:
+            raise CssTokenizeError('unexpected end of stylesheet')
+        char = match.group()
+        position = match.start()
+        if char in '"\'':
+            position = _skipString(cssText, position)
+            continue
+        if char == '/' and cssText.startswith('/*', position):
+            position = _skipComment(cssText, position)
+            continue
+        if char == '\\':
+            position += 2
+            continue
+        if char == '{':
+            depth += 1
+        elif char == '}':
+            depth -= 1
+            if depth == 0:
+                return position + 1
+        position += 1
+
+def _readDeclarations(cssText, position, lines, withComments = False):
+    # position after '{' => ([(declaration, line)], position after '}')
+    declarations = []
+    while True:
+        position = _skipWhitespaceAndComments(cssText, position, declarations if withComments else None, lines)
+        if position >= len(cssText):
+            raise CssTokenizeError('unexpected end of stylesheet')
+        if cssText[position] == '}':
+            return (declarations, position + 1)
+        if cssText[position] == ';':
+            position += 1
+            continue
+        line = lines.getLine(position)
+        (declaration, position) = _readUntil(cssText, position, ';}', blockRegex)
+        declaration = declaration.strip()
+        if declaration:
+            declarations.append((declaration, line))
+
+def tokenizeStyleRules(cssText, withComments = False):
+    # generator => StyleRuleTokens of the top-level style rules (withComments: + CommentTokens)
+    lines = _Lines(cssText)
+    position = 0
+    while True:
+        comments = [] if withComments else None
+        position = _skipWhitespaceAndComments(cssText, position, comments, lines)
+        if comments:
+            yield from comments
+        if position >= len(cssText):
+            return
+        char = cssText[position]
+        if char == '@':
+            position = _skipAtRule(cssText, position)
+            continue
+        if char in '{};':
+            raise CssTokenizeError(f'unexpected "{char}"')
+        line = lines.getLine(position)
+        (selector, position) = _readUntil(cssText, position, '{', preludeRegex)
+        (declarations, position) = _readDeclarations(cssText, position + 1, lines, withComments)
+        yield StyleRuleTokens(selector.strip(), line, declarations)
+
+def readStylesheet(cssFile):
+    # => text of the stylesheet, only utf-8 (other encodings: CssTokenizeError)
+    with open(cssFile, 'rb') as file:
+        content = file.read()
+    try:
+        cssText = content.decode('utf-8-sig')
+    except UnicodeDecodeError:
+        raise CssTokenizeError('not utf-8')
+    charsetMatch = charsetRegex.match(cssText)
+    if charsetMatch and charsetMatch.group(1).lower() != 'utf-8':
+        raise CssTokenizeError(f'charset {charsetMatch.group(1)}')
+    return cssText
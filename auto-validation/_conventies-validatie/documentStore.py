@@ -0,0 +1,56 @@
+#!/usr/bin/python3
+"""documentStore.py: Shared store of parsed project documents.
+
+Every analyser (html, css, js, outline) asks this store for the parsed
+version of an html-file, so one conventions run parses each file only once.
+Documents are keyed by their absolute path and validated against the file's
+mtime/size, so an edited file is parsed again.
+Documents handed out by the store are shared: analysers must NOT modify them!
+"""
+
+try:
+    ## MODULE (when loaded as module) ##
+    from .profiler import measure as _measure
+except ImportError:
+    ## SCRIPT (when run as script) ##
+    from profiler import measure as _measure
+
+import os
+import bs4 # pip install beautifulsoup4
+
+## HTML Files ##
+parsedHtmlDocuments = {} # absolute path => (fileStamp, document)
+
+def _getFileStamp(file):
+    stat = os.stat(file)
+    return (stat.st_mtime_ns, stat.st_size)
+
+def getHtmlDocument(htmlFile):
+    global parsedHtmlDocuments
+    key = os.path.abspath(htmlFile)
+    fileStamp = _getFileStamp(htmlFile)
+    cached = parsedHtmlDocuments.get(key)
+    if cached and cached[0] == fileStamp:
+        return cached[1]
+    with _measure('parse.html', htmlFile), open(htmlFile) as file:
+        document = bs4.BeautifulSoup(file.read(), 'html.parser')
+        #document = bs4.BeautifulSoup(file.read(), 'html5lib') # requires 'pip install html5lib' # creates valid HTML5, but we wan't the original code + is slow
+    parsedHtmlDocuments[key] = (fileStamp, document)
+    return document
+
+def getParsedHtmlDocument(htmlFile):
+    # => the shared document if it's parsed already (and up to date), else None (nothing is parsed)
+    cached = parsedHtmlDocuments.get(os.path.abspath(htmlFile))
+    if cached and cached[0] == _getFileStamp(htmlFile):
+        return cached[1]
+    return None
+
+def clear(projectDir = None):
+    # forget all documents (of a project)
+    global parsedHtmlDocuments
+    if not projectDir:
+        parsedHtmlDocuments = {}
+        return
+    projectPrefix = os.path.join(os.path.abspath(projectDir), '')
+    for key in [key for key in parsedHtmlDocuments if key.startswith(projectPrefix)]:
+        del parsedHtmlDocuments[key]
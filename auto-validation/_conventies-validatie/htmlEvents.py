@@ -0,0 +1,135 @@
+#!/usr/bin/python3
+"""htmlEvents.py: Event-stream (SAX-style) engine for html-checks that don't need a tree.
+
+The html-file is streamed once through html.parser (the parser of the shared
+documents, see documentStore), without building a tree: at every start tag the
+visitor gets a light tag (name, attributes, parent, sourceline/sourcepos) and
+the names of its open ancestors. Tags are opened and closed exactly like
+BeautifulSoup does, so tags, ancestors, attributes and positions are the same
+as in the shared document, and a visitor works on both (see visitHtmlTags).
+Checks that need the structure or the markup of the document (base structure,
+outline, str(tag), ...) keep using the shared document.
+"""
+
+try:
+    ## MODULE (when loaded as module) ##
+    from .profiler import measure as _measure
+except ImportError:
+    ## SCRIPT (when run as script) ##
+    from profiler import measure as _measure
+
+import re #regex
+import html.parser
+import bs4 # pip install beautifulsoup4
+from bs4.builder import HTMLTreeBuilder
+from collections import Counter
+
+# global settings
+streamChunkSize = 64 * 1024 # characters fed to the parser at once
+
+# same tag-handling as BeautifulSoup (html.parser)
+emptyElementTags = HTMLTreeBuilder.empty_element_tags # closed at their start tag
+multiValuedAttributes = HTMLTreeBuilder.DEFAULT_CDATA_LIST_ATTRIBUTES # e.g. class="a b" => ['a', 'b']
+multiValueRegex = re.compile(r'\S+')
+
+class HtmlEventTag:
+    # the part of a bs4.Tag the event-visitors use
+    # text: only of raw text elements (script, style), complete after the element is closed
+    __slots__ = ('name', 'attrs', 'parent', 'sourceline', 'sourcepos', 'text')
+    def __init__(self, name, attrs, parent, sourceline, sourcepos):
+        self.name = name
+        self.attrs = attrs
+        self.parent = parent
+        self.sourceline = sourceline
+        self.sourcepos = sourcepos
+        self.text = ''
+    def has_attr(self, key):
+        return key in self.attrs
+    def get(self, key, default = None):
+        return self.attrs.get(key, default)
+    def __getitem__(self, key):
+        return self.attrs[key]
+
+def _getAttributes(name, attrs):
+    # = attrs of the bs4.Tag (last duplicate wins, no value = '', multi-valued attributes split)
+    attributes = {}
+    for (key, value) in attrs:
+        attributes[key] = '' if value is None else value
+    for key in multiValuedAttributes['*'] + multiValuedAttributes.get(name, []):
+        if key in attributes:
+            attributes[key] = multiValueRegex.findall(attributes[key])
+    return attributes
+
+class _HtmlEventParser(html.parser.HTMLParser):
+    # opens/closes tags like bs4's BeautifulSoupHTMLParser + BeautifulSoup._popToTag
+    def __init__(self, visitTag):
+        super().__init__(convert_charrefs=False)
+        self.visitTag = visitTag
+        self.openTags = [] # innermost last
+        self.ancestorTags = Counter() # names of the open tags
+        self.alreadyClosedEmptyElements = []
+    def handle_startendtag(self, name, attrs):
+        # <tag/>
+        self.handle_starttag(name, attrs, isEmptyElementClosed=False)
+        self.handle_endtag(name)
+    def handle_starttag(self, name, attrs, isEmptyElementClosed=True):
+        (sourceline, sourcepos) = self.getpos()
+        tag = HtmlEventTag(name, _getAttributes(name, attrs), self.openTags[-1] if self.openTags else None, sourceline, sourcepos)
+        self.visitTag(tag, self.ancestorTags)
+        self.openTags.append(tag)
+        self.ancestorTags[name] += 1
+        if isEmptyElementClosed and name in emptyElementTags:
+            self.handle_endtag(name, checkAlreadyClosed=False)
+            self.alreadyClosedEmptyElements.append(name)
+    def handle_endtag(self, name, checkAlreadyClosed=True):
+        if checkAlreadyClosed and name in self.alreadyClosedEmptyElements:
+            self.alreadyClosedEmptyElements.remove(name)
+            return
+        # close up to (and including) the innermost open tag with this name (none open => ignored)
+        while self.ancestorTags[name]:
+            tag = self.openTags.pop()
+            self.ancestorTags[tag.name] -= 1
+            if tag.name == name:
+                break
+    def handle_data(self, data):
+        if self.cdata_elem and self.openTags: # content of script/style
+            self.openTags[-1].text += data
+
+def streamHtmlFile(htmlFile, visitTag):
+    # visitTag(tag, ancestorTags) at every start tag, in document order (memory: only the open tags)
+    parser = _HtmlEventParser(visitTag)
+    with _measure('parse.html.stream', htmlFile): # (incl. the visits)
+        with open(htmlFile) as file:
+            while True:
+                content = file.read(streamChunkSize)
+                if not content:
+                    break
+                parser.feed(content)
+        parser.close()
+
+def walkHtmlDocument(document, visitTag):
+    # the same visits, from the tags of a parsed document (in document order, without recursion)
+    ancestorTags = Counter()
+    openTagNames = []
+    stack = [iter(document.contents)]
+    while stack:
+        for node in stack[-1]:
+            if not isinstance(node, bs4.Tag):
+                continue
+            visitTag(node, ancestorTags)
+            if node.contents:
+                ancestorTags[node.name] += 1
+                openTagNames.append(node.name)
+                stack.append(iter(node.contents))
+                break
+        else:
+            stack.pop()
+            if openTagNames:
+                ancestorTags[openTagNames.pop()] -= 1
+
+def visitHtmlTags(htmlFile, visitTag, document = None):
+    # walk the document (if parsed already), else stream the file: no tree is built for it
+    if document is not None:
+        walkHtmlDocument(document, visitTag)
+    else:
+        streamHtmlFile(htmlFile, visitTag)
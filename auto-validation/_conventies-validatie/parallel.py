@@ -0,0 +1,113 @@
+#!/usr/bin/python3
+"""parallel.py: Spread per-file checks over worker processes.
+
+Workers are single-process 'lanes': a file is always checked by the same lane,
+so its parsed document (see documentStore) is reused by the next analyser.
+Results are returned in the order of the given files (each as soon as it's
+checked), so the reports are identical to a serial run. The cached data of an
+analyser (parsed sheets, scope trees, ...) lives for one mapFiles run in a
+worker, as it lives for one checkProject in the main process: lanes are reused
+across runs (e.g. --watch) and an edited file must be parsed again. Files whose results are in the result cache (see
+resultCache) are not checked again.
+"""
+
+try:
+    ## MODULE (when loaded as module) ##
+    from .documentStore import clear as _clearDocuments
+    from .resultCache import getKey as _getCacheKey, get as _getCachedResult, put as _putCachedResult
+    from .profiler import isEnabled as _isProfileEnabled, setEnabled as _setProfileEnabled, callMeasured as _callMeasured, addProjectProfile as _addProjectProfile
+except ImportError:
+    ## SCRIPT (when run as script) ##
+    from documentStore import clear as _clearDocuments
+    from resultCache import getKey as _getCacheKey, get as _getCachedResult, put as _putCachedResult
+    from profiler import isEnabled as _isProfileEnabled, setEnabled as _setProfileEnabled, callMeasured as _callMeasured, addProjectProfile as _addProjectProfile
+
+import os
+import sys
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+
+workerLanes = [] # running lanes (empty = check files in this process)
+workerProjectDir = None # project of the previous check (in a worker process)
+workerModuleRuns = {} # module name => run of its cached data (in a worker process)
+mapRunCount = 0 # mapFiles runs (in the main process)
+
+def _getJobCount(jobs):
+    if not jobs or jobs < 1:
+        return os.cpu_count() or 1 # 0 = all cpu's
+    return jobs
+
+def startWorkers(jobs):
+    global workerLanes
+    jobs = _getJobCount(jobs)
+    if workerLanes or jobs <= 1:
+        return False
+    workerLanes = [ProcessPoolExecutor(max_workers=1) for _ in range(jobs)]
+    return True
+
+def stopWorkers():
+    global workerLanes
+    for lane in workerLanes:
+        lane.shutdown()
+    workerLanes = []
+
+@contextmanager
+def workers(jobs):
+    # start lanes for the duration of a run (no-op if already running)
+    isStarted = startWorkers(jobs)
+    try:
+        yield
+    finally:
+        if isStarted:
+            stopWorkers()
+
+def _checkFileOfProject(checkFile, projectDir, runId, file, args, isProfiled = False):
+    # isProfiled => (result, profile of the check)
+    global workerProjectDir
+    if projectDir != workerProjectDir:
+        # new project: forget documents of previous project (documents of edited files are parsed again anyway)
+        _clearDocuments()
+        workerProjectDir = projectDir
+    module = sys.modules[checkFile.__module__]
+    if workerModuleRuns.get(module.__name__) != runId or module.projectBaseDir != projectDir:
+        # new run: forget cached data of the previous run (files may be edited in between)
+        module._resetProjectData(projectDir)
+        workerModuleRuns[module.__name__] = runId
+    if isProfiled:
+        _setProfileEnabled(True)
+        return _callMeasured(projectDir, checkFile, file, *args)
+    return checkFile(file, *args)
+
+def _getProfiledResult(projectDir, profiledResult):
+    # measures of the worker process => profile of this process
+    (result, projectProfile) = profiledResult
+    _addProjectProfile(projectDir, projectProfile)
+    return result
+
+def _checkFiles(checkFile, files, projectDir, args):
+    # => iterator of the results, in the order of files
+    global mapRunCount
+    if not workerLanes or len(files) < 2:
+        return (checkFile(file, *args) for file in files)
+    mapRunCount += 1
+    futures = []
+    isProfiled = _isProfileEnabled()
+    for file in files:
+        lane = workerLanes[zlib.crc32(os.path.abspath(file).encode()) % len(workerLanes)]
+        futures.append(lane.submit(_checkFileOfProject, checkFile, projectDir, mapRunCount, file, args, isProfiled))
+    if isProfiled:
+        return (_getProfiledResult(projectDir, future.result()) for future in futures)
+    return (future.result() for future in futures)
+
+def mapFiles(checkFile, files, projectDir, *args):
+    # generator => checkFile(file, *args) for all files, in order, each as soon as it's checked
+    # results of unchanged files come from the result cache, only the others are checked
+    cacheKeys = [_getCacheKey(checkFile, file, projectDir, args) for file in files]
+    cachedResults = [_getCachedResult(cacheKey) for cacheKey in cacheKeys]
+    checkedResults = _checkFiles(checkFile, [file for file, (isFound, _) in zip(files, cachedResults) if not isFound], projectDir, args)
+    for cacheKey, (isFound, result) in zip(cacheKeys, cachedResults):
+        if not isFound:
+            result = next(checkedResults)
+            _putCachedResult(cacheKey, result)
+        yield result
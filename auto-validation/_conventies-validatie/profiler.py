@@ -0,0 +1,186 @@
+#!/usr/bin/python3
+"""profiler.py: Opt-in timing of the phases of a run (--profile).
+
+Per phase the wall time, the number of calls and the bytes of the files are
+recorded, per project and per file:
+- scan: walk of the project (projectFiles)
+- parse.html, parse.html.stream, parse.css, parse.css.tokenizer, parse.js
+- scope.js: scope tree of a js-file (analyseJs._getScopeTree)
+- check.<analyser>.<function>: the _check* functions (see instrumentChecks)
+- write: the validatie-*.txt reports
+Phases nest (a check parses its file): the seconds of a phase include the
+phases within it, ownSeconds don't. The seconds of a file (total and per
+phase) are own seconds, so no moment is counted twice.
+Measures of worker processes (--jobs) are added to the profile of the main
+process. Disabled (default), a measure is a no-op.
+"""
+
+import os
+import json
+import time
+import inspect
+from functools import wraps
+from contextlib import contextmanager, nullcontext
+
+# global settings
+profileEnabled = False
+
+projectProfiles = {} # projectDir => {'seconds', 'phases': phase => {...}, 'files': fileName => {...}}
+currentProjectDir = None # project the measures are added to
+openMeasures = [] # per running measure: seconds of the measures within it
+noMeasure = nullcontext()
+
+def setEnabled(enabled):
+    global profileEnabled
+    profileEnabled = enabled
+
+def isEnabled():
+    return profileEnabled
+
+
+## MEASURES ##
+def _getProjectProfile(projectDir):
+    projectProfile = projectProfiles.get(projectDir)
+    if not projectProfile:
+        projectProfile = projectProfiles[projectDir] = {'seconds': 0.0, 'phases': {}, 'files': {}}
+    return projectProfile
+
+def _getFileSize(file):
+    try:
+        return os.path.getsize(file)
+    except OSError:
+        return 0
+
+def _addMeasure(phase, file, seconds, ownSeconds):
+    projectProfile = _getProjectProfile(currentProjectDir)
+    fileSize = 0
+    if file:
+        fileName = os.path.relpath(file, currentProjectDir) if currentProjectDir else file
+        fileProfile = projectProfile['files'].get(fileName)
+        if not fileProfile:
+            fileProfile = projectProfile['files'][fileName] = {'seconds': 0.0, 'bytes': _getFileSize(file), 'phases': {}}
+        fileProfile['seconds'] += ownSeconds
+        fileProfile['phases'][phase] = fileProfile['phases'].get(phase, 0.0) + ownSeconds
+        fileSize = fileProfile['bytes']
+    phaseProfile = projectProfile['phases'].get(phase)
+    if not phaseProfile:
+        phaseProfile = projectProfile['phases'][phase] = {'seconds': 0.0, 'ownSeconds': 0.0, 'calls': 0, 'bytes': 0}
+    phaseProfile['seconds'] += seconds
+    phaseProfile['ownSeconds'] += ownSeconds
+    phaseProfile['calls'] += 1
+    phaseProfile['bytes'] += fileSize
+
+@contextmanager
+def _measure(phase, file):
+    openMeasures.append(0.0)
+    startTime = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - startTime
+        ownSeconds = seconds - openMeasures.pop()
+        if openMeasures:
+            openMeasures[-1] += seconds
+        _addMeasure(phase, file, seconds, ownSeconds)
+
+def measure(phase, file = None):
+    # with measure('parse.css', cssFile): ...
+    if not profileEnabled:
+        return noMeasure
+    return _measure(phase, file)
+
+def _measuredFunction(phase, function):
+    @wraps(function) # same __module__ and __qualname__ (pickle, result cache)
+    def measuredFunction(*args, **kwargs):
+        with measure(phase, args[0] if args and isinstance(args[0], str) else None):
+            return function(*args, **kwargs)
+    return measuredFunction
+
+def instrumentChecks(module, prefix = '_check'):
+    # from now on every <prefix>* function of module is measured (called through the module, e.g. by _mapFiles)
+    moduleName = module.__name__.rsplit('.', 1)[-1]
+    for (name, function) in list(vars(module).items()):
+        if name.startswith(prefix) and inspect.isfunction(function) and function.__module__ == module.__name__ and not hasattr(function, '__wrapped__'):
+            setattr(module, name, _measuredFunction(f'check.{moduleName}.{name}', function))
+
+
+## PROJECTS ##
+@contextmanager
+def profileProject(projectDir):
+    # measures within are added to the profile of projectDir
+    global currentProjectDir
+    if not profileEnabled:
+        yield
+        return
+    (previousProjectDir, currentProjectDir) = (currentProjectDir, projectDir)
+    startTime = time.perf_counter()
+    try:
+        yield
+    finally:
+        _getProjectProfile(projectDir)['seconds'] += time.perf_counter() - startTime
+        currentProjectDir = previousProjectDir
+
+def callMeasured(projectDir, function, *args):
+    # in a worker process => (result, profile of this call), for addProjectProfile in the main process
+    global currentProjectDir
+    projectProfiles.pop(projectDir, None) # (measures of the main process, copied by fork)
+    (previousProjectDir, currentProjectDir) = (currentProjectDir, projectDir)
+    try:
+        result = function(*args)
+    finally:
+        currentProjectDir = previousProjectDir
+    return (result, takeProjectProfile(projectDir))
+
+def takeProjectProfile(projectDir):
+    # => profile of the project (None = nothing measured), forgotten here
+    return projectProfiles.pop(projectDir, None)
+
+def addProjectProfile(projectDir, addedProfile):
+    # add a profile of an other process (project process of --bulk, worker process of --jobs)
+    if not addedProfile:
+        return
+    projectProfile = _getProjectProfile(projectDir)
+    projectProfile['seconds'] += addedProfile['seconds']
+    for (phase, addedPhaseProfile) in addedProfile['phases'].items():
+        phaseProfile = projectProfile['phases'].setdefault(phase, {'seconds': 0.0, 'ownSeconds': 0.0, 'calls': 0, 'bytes': 0})
+        for key in phaseProfile:
+            phaseProfile[key] += addedPhaseProfile[key]
+    for (fileName, addedFileProfile) in addedProfile['files'].items():
+        fileProfile = projectProfile['files'].setdefault(fileName, {'seconds': 0.0, 'bytes': addedFileProfile['bytes'], 'phases': {}})
+        fileProfile['seconds'] += addedFileProfile['seconds']
+        for (phase, seconds) in addedFileProfile['phases'].items():
+            fileProfile['phases'][phase] = fileProfile['phases'].get(phase, 0.0) + seconds
+
+
+## OUTPUT ##
+def getSlowestFiles(count = 10):
+    # => [(project, fileName, fileProfile)], slowest first
+    files = [(os.path.basename(projectDir or ''), fileName, fileProfile)
+             for (projectDir, projectProfile) in projectProfiles.items() for (fileName, fileProfile) in projectProfile['files'].items()]
+    return sorted(files, key=lambda file: file[2]['seconds'], reverse=True)[:count]
+
+def getProfile(topCount = 10):
+    # json-ready: totals per phase, profile per project and the slowest files
+    phases = {}
+    for projectProfile in projectProfiles.values():
+        for (phase, phaseProfile) in projectProfile['phases'].items():
+            totalPhaseProfile = phases.setdefault(phase, {'seconds': 0.0, 'ownSeconds': 0.0, 'calls': 0, 'bytes': 0})
+            for key in totalPhaseProfile:
+                totalPhaseProfile[key] += phaseProfile[key]
+    return {'seconds': sum(projectProfile['seconds'] for projectProfile in projectProfiles.values()),
+            'phases': dict(sorted(phases.items(), key=lambda phase: phase[1]['ownSeconds'], reverse=True)),
+            'projects': {os.path.basename(projectDir or ''): projectProfile for (projectDir, projectProfile) in projectProfiles.items()},
+            'slowestFiles': [{'project': project, 'file': fileName, 'seconds': fileProfile['seconds'], 'bytes': fileProfile['bytes']}
+                             for (project, fileName, fileProfile) in getSlowestFiles(topCount)]}
+
+def writeProfile(outputFile, topCount = 10):
+    with open(outputFile, 'w', encoding='utf-8') as output:
+        json.dump(getProfile(topCount), output, indent=1, ensure_ascii=False)
+
+def formatSlowestFiles(topCount = 10):
+    # => text table of the slowest files (own seconds, bytes, slowest phase)
+    lines = [f'{"seconds":>9} {"bytes":>10}  file (slowest phase)']
+    for (project, fileName, fileProfile) in getSlowestFiles(topCount):
+        slowestPhase = max(fileProfile['phases'].items(), key=lambda phase: phase[1])[0] if fileProfile['phases'] else ''
+        lines.append(f'{fileProfile["seconds"]:9.3f} {fileProfile["bytes"]:10} {os.path.join(project, fileName)} ({slowestPhase})')
+    return '\n'.join(lines)
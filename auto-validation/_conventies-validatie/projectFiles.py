@@ -0,0 +1,84 @@
+#!/usr/bin/python3
+"""projectFiles.py: Index of the files of a project.
+
+A project is walked once (os.scandir) into an index of its files, grouped by
+extension, with relative path. All analysers read their files
+from this index, in the same order as os.listdir (files of a subdirectory at
+the position of that subdirectory).
+The index is reused as long as none of the walked directories is modified
+(one stat per directory instead of a walk), so an added, removed or renamed
+file is always seen. A changed file doesn't modify its directory, so nothing
+of the content of a file (size, mtime) is kept in the index.
+"""
+
+try:
+    ## MODULE (when loaded as module) ##
+    from .profiler import measure as _measure
+except ImportError:
+    ## SCRIPT (when run as script) ##
+    from profiler import measure as _measure
+
+import os
+from collections import namedtuple
+
+FileInfo = namedtuple('FileInfo', ['path', 'relativePath'])
+ProjectIndex = namedtuple('ProjectIndex', ['dirStamps', 'files']) # files: extension => [FileInfo]
+
+projectIndexes = {} # (projectDir, settings) => ProjectIndex
+
+def _getExtension(fileName):
+    # same as endswith(ext): 'x.min.css' => '.css'
+    dotIndex = fileName.rfind('.')
+    return fileName[dotIndex:] if dotIndex >= 0 else ''
+
+def _walkDir(dir, projectDir, recursive, ignoreDotDirs, excludeDirs, dirStamps, files):
+    dirStamps.append((dir, os.stat(dir).st_mtime_ns))
+    with os.scandir(dir) as entries:
+        for entry in entries:
+            if entry.is_dir():
+                if ignoreDotDirs and entry.name.startswith('.'):
+                    continue
+                if not entry.name in excludeDirs and recursive:
+                    _walkDir(entry.path, projectDir, recursive, ignoreDotDirs, excludeDirs, dirStamps, files)
+            else:
+                fileInfo = FileInfo(entry.path, os.path.relpath(entry.path, projectDir))
+                files.setdefault(_getExtension(entry.name), []).append(fileInfo)
+
+def _isUpToDate(projectIndex):
+    try:
+        return all(os.stat(dir).st_mtime_ns == mtime for (dir, mtime) in projectIndex.dirStamps)
+    except OSError:
+        return False
+
+def getProjectIndex(projectDir, recursive = True, ignoreDotDirs = True, excludeDirs = ()):
+    global projectIndexes
+    key = (projectDir, recursive, ignoreDotDirs, tuple(excludeDirs))
+    projectIndex = projectIndexes.get(key)
+    if not projectIndex or not _isUpToDate(projectIndex):
+        dirStamps = []
+        files = {}
+        with _measure('scan'):
+            _walkDir(projectDir, projectDir, recursive, ignoreDotDirs, excludeDirs, dirStamps, files)
+        projectIndex = ProjectIndex(dirStamps, files)
+        projectIndexes[key] = projectIndex
+    return projectIndex
+
+def getFileInfos(projectDir, ext, recursive = True, ignoreDotDirs = True, excludeDirs = ()):
+    extension = '.'+ext if ext[0] != '.' else ext
+    return getProjectIndex(projectDir, recursive, ignoreDotDirs, excludeDirs).files.get(extension, [])
+
+def getFiles(projectDir, ext, filenamePrefix = None, recursive = True, ignoreDotDirs = True, excludeDirs = ()):
+    files = []
+    for fileInfo in getFileInfos(projectDir, ext, recursive, ignoreDotDirs, excludeDirs):
+        if not filenamePrefix or os.path.basename(fileInfo.path).startswith(filenamePrefix):
+            files.append(fileInfo.path)
+    return files
+
+def clear(projectDir = None):
+    # forget all indexes (of a project)
+    global projectIndexes
+    if not projectDir:
+        projectIndexes = {}
+        return
+    for key in [key for key in projectIndexes if key[0] == projectDir]:
+        del projectIndexes[key]
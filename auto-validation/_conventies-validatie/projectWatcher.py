@@ -0,0 +1,120 @@
+#!/usr/bin/python3
+"""projectWatcher.py: Wait for changes to the files of a project.
+
+Linux: woken up by inotify (via ctypes, no extra package needed).
+Other systems (or no inotify): the files are polled.
+Changed files are found by comparing mtime/size of the html/css/js-files of
+the project index (see projectFiles), so added and removed files count too.
+"""
+
+try:
+    ## MODULE (when loaded as module) ##
+    from .projectFiles import getProjectIndex as _getProjectIndex, getFileInfos as _getFileInfos
+except ImportError:
+    ## SCRIPT (when run as script) ##
+    from projectFiles import getProjectIndex as _getProjectIndex, getFileInfos as _getFileInfos
+
+import os
+import time
+import select
+import struct
+import ctypes
+import ctypes.util
+
+# global settings
+watchedExtensions = ('.html', '.css', '.js')
+excludeDirs = ['auto-validation','__MACOSX']
+pollInterval = 0.5 # seconds between polls (without inotify)
+settleDelay = 0.1 # editors save in several steps => wait for the last one
+
+# inotify (see 'man inotify')
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+inotifyMask = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+inotifyEventHeader = struct.Struct('iIII') # wd, mask, cookie, len (+ name)
+
+def _openInotify():
+    # => (libc, fd) or None (not available)
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        fd = libc.inotify_init()
+    except (OSError, AttributeError, TypeError):
+        return None
+    return (libc, fd) if fd >= 0 else None
+
+def _addInotifyWatches(inotify, projectDir, watchedDirs):
+    # every (new) directory of the project
+    (libc, fd) = inotify
+    for (dir, _) in _getProjectIndex(projectDir, excludeDirs=excludeDirs).dirStamps:
+        if not dir in watchedDirs.values():
+            wd = libc.inotify_add_watch(fd, os.fsencode(dir), inotifyMask)
+            if wd >= 0:
+                watchedDirs[wd] = dir
+
+def _readInotifyEvents(inotify, watchedDirs):
+    # => True if a watched file or a directory has changed
+    isChanged = False
+    data = os.read(inotify[1], 64 * 1024)
+    offset = 0
+    while offset < len(data):
+        (wd, mask, _, length) = inotifyEventHeader.unpack_from(data, offset)
+        name = data[offset + inotifyEventHeader.size:offset + inotifyEventHeader.size + length].rstrip(b'\0')
+        offset += inotifyEventHeader.size + length
+        if mask & IN_IGNORED:
+            watchedDirs.pop(wd, None) # directory removed
+        if mask & (IN_Q_OVERFLOW | IN_ISDIR) or os.fsdecode(name).endswith(watchedExtensions):
+            isChanged = True
+    return isChanged
+
+def _waitForInotify(inotify, watchedDirs, timeout = None):
+    isChanged = False
+    while select.select([inotify[1]], [], [], timeout)[0]:
+        isChanged = _readInotifyEvents(inotify, watchedDirs) or isChanged
+        timeout = settleDelay # collect the rest of the save
+    return isChanged
+
+def _getSnapshot(projectDir):
+    # file => (mtime, size) of the watched files
+    snapshot = {}
+    for extension in watchedExtensions:
+        for fileInfo in _getFileInfos(projectDir, extension, excludeDirs=excludeDirs):
+            try:
+                stat = os.stat(fileInfo.path)
+                snapshot[fileInfo.path] = (stat.st_mtime_ns, stat.st_size)
+            except OSError:
+                pass # removed in the meantime
+    return snapshot
+
+def _getChangedFiles(oldSnapshot, newSnapshot):
+    return sorted(file for file in set(oldSnapshot) | set(newSnapshot) if oldSnapshot.get(file) != newSnapshot.get(file))
+
+def watchChanges(projectDir):
+    # generator => list of changed (added, removed) files, after each change
+    inotify = _openInotify()
+    watchedDirs = {} # wd => directory
+    try:
+        # watch first, then take the snapshot: no change is missed
+        if inotify:
+            _addInotifyWatches(inotify, projectDir, watchedDirs)
+        snapshot = _getSnapshot(projectDir)
+        while True:
+            if inotify:
+                if not _waitForInotify(inotify, watchedDirs):
+                    continue # e.g. a report was written
+                _addInotifyWatches(inotify, projectDir, watchedDirs) # new directories
+            else:
+                time.sleep(pollInterval)
+            newSnapshot = _getSnapshot(projectDir)
+            changedFiles = _getChangedFiles(snapshot, newSnapshot)
+            snapshot = newSnapshot
+            if changedFiles:
+                yield changedFiles
+    finally:
+        if inotify:
+            os.close(inotify[1])
@@ -0,0 +1,108 @@
+#!/usr/bin/python3
+"""resultCache.py: On-disk cache of per-file check results.
+
+A result is keyed by the check function (and its settings), the analyser
+version (source of the modules of the checks + versions of the parsers), the
+relative file name (part of the results) and the hash of the file content.
+So the checks of an unchanged file are not done again (not even parsed), and
+project-wide results (tag summary, css duplicates) are rebuilt from the cached
+per-file results.
+"""
+
+import os
+import sys
+import pickle
+import hashlib
+import tempfile
+
+# global settings
+cacheDir = os.path.join(os.path.expanduser('~'), '.cache', 'auto-validation', 'conventions')
+cacheEnabled = True
+cacheFormat = 1 # change when the layout of the cache (or of results) changes
+parserPackages = ['beautifulsoup4', 'cssutils', 'esprima']
+# modules the per-file checks use (not the runners, reports, profiler, benchmark, ...)
+checkModules = ['analyseHtml.py', 'analyseHtmlOutline.py', 'analyseCss.py', 'analyseJs.py', 'documentStore.py', 'htmlEvents.py', 'cssTokenizer.py', 'projectFiles.py']
+
+analyserVersion = None # hash of sources and parser versions (calculated once)
+memoryResults = {} # key => pickled result (warm cache of a long running process, e.g. --watch)
+
+def setEnabled(enabled):
+    global cacheEnabled
+    cacheEnabled = enabled
+
+def isEnabled():
+    return cacheEnabled
+
+def _getAnalyserVersion():
+    global analyserVersion
+    if analyserVersion:
+        return analyserVersion
+    versionHash = hashlib.sha1(f'{cacheFormat}:{sys.version}'.encode())
+    # any change to the code of the checks invalidates the cache
+    scriptDir = os.path.realpath(os.path.dirname(__file__))
+    for sourceFile in checkModules:
+        with open(os.path.join(scriptDir, sourceFile), 'rb') as file:
+            versionHash.update(file.read())
+    # ... as does an other version of a parser
+    try:
+        from importlib.metadata import version, PackageNotFoundError
+        for package in parserPackages:
+            try:
+                versionHash.update(f'{package}={version(package)}'.encode())
+            except PackageNotFoundError:
+                pass
+    except ImportError: # python < 3.8
+        pass
+    analyserVersion = versionHash.hexdigest()
+    return analyserVersion
+
+def getKey(checkFile, file, projectDir, args = ()):
+    # None = don't use the cache (disabled or unreadable file)
+    if not cacheEnabled:
+        return None
+    try:
+        with open(file, 'rb') as fileContent:
+            contentHash = hashlib.sha1(fileContent.read()).hexdigest()
+    except OSError:
+        return None
+    # args = settings of the check (e.g. the enabled checks)
+    keyInfo = [_getAnalyserVersion(), checkFile.__module__, checkFile.__qualname__, repr(args), os.path.relpath(file, projectDir), contentHash]
+    return hashlib.sha1('\0'.join(keyInfo).encode()).hexdigest()
+
+def _getCacheFile(key):
+    return os.path.join(cacheDir, key[:2], key + '.pickle')
+
+def get(key):
+    # => (isFound, result)
+    global memoryResults
+    if not key:
+        return (False, None)
+    try:
+        pickledResult = memoryResults.get(key)
+        if pickledResult is None:
+            with open(_getCacheFile(key), 'rb') as cacheFile:
+                pickledResult = cacheFile.read()
+        result = pickle.loads(pickledResult) # a new copy: results may be changed by the caller
+        memoryResults[key] = pickledResult
+        return (True, result)
+    except Exception: # not cached or damaged cache-file
+        return (False, None)
+
+def put(key, result):
+    global memoryResults
+    if not key:
+        return
+    cacheFile = _getCacheFile(key)
+    tempFile = None
+    try:
+        pickledResult = pickle.dumps(result, pickle.HIGHEST_PROTOCOL)
+        memoryResults[key] = pickledResult
+        os.makedirs(os.path.dirname(cacheFile), exist_ok=True)
+        # write + rename: other processes never read a partial cache-file
+        (fileHandle, tempFile) = tempfile.mkstemp(dir=os.path.dirname(cacheFile), suffix='.tmp')
+        with os.fdopen(fileHandle, 'wb') as file:
+            file.write(pickledResult)
+        os.replace(tempFile, cacheFile)
+    except Exception: # cache is optional (read-only home, disk full, ...)
+        if tempFile and os.path.exists(tempFile):
+            os.remove(tempFile)
@@ -0,0 +1,113 @@
+#!/usr/bin/python3
+"""resultRecords.py: Structured result records and machine-readable output (ndjson/json).
+
+The analysers report [fileName, check, result] lists, with a result line (or
+a list of result lines) per check. Every result line becomes a ResultRecord
+(file, check, line, column, message); line and column are taken from the
+position the line starts with ('12: <b>', '12:4 <div ...>', '[Outside body] 12: <p>')
+or from a tab-separated 'line:column' field ('onclick\t17:3'), else they are
+None (e.g. a summary of several lines: '[Verboden tag] <b>: 15; 24').
+The message is the line as it is in the text reports.
+While a record output is open (see recordOutputFile), the analysers emit the
+results of every file as soon as the file is checked, so the records are
+streamed alongside the text reports.
+"""
+
+import re #regex
+import json
+from collections import namedtuple
+from contextlib import contextmanager
+
+# custom types
+ResultRecord = namedtuple('ResultRecord', ['file', 'check', 'line', 'column', 'message'])
+
+# constants
+outputFormats = ['ndjson', 'json']
+positionRegexes = [re.compile(r'^(?:\[[^\]]*\] )?(\d+)(?::(\d+))?(?=:| |$)'), re.compile(r'\t(\d+):(\d+)(?=\(|$)')]
+
+recordOutput = None # (file, outputFormat, recordCount) of the open record output (None = no output)
+
+def _getPosition(message):
+    # => (line, column)
+    for positionRegex in positionRegexes:
+        match = positionRegex.search(message)
+        if match:
+            return (int(match.group(1)), int(match.group(2)) if match.group(2) else None)
+    return (None, None)
+
+def getResultRecords(results):
+    # generator => ResultRecord per result line of [fileName, check, result] lists
+    for (fileName, check, result) in results:
+        if not result:
+            continue
+        for resultLine in [result] if type(result) is str else result:
+            message = f'{resultLine}'
+            (line, column) = _getPosition(message)
+            yield ResultRecord(fileName, check, line, column, message)
+
+def _formatRecord(record):
+    return json.dumps({'file': record.file, 'check': str(record.check), 'line': record.line, 'column': record.column, 'message': record.message}, ensure_ascii=False)
+
+def _writeRecordLines(recordLines):
+    # json-lines of records => open record output
+    global recordOutput
+    (file, outputFormat, recordCount) = recordOutput
+    for recordLine in recordLines:
+        if outputFormat == 'json':
+            file.write(('[\n' if recordCount == 0 else ',\n')+recordLine)
+        else:
+            file.write(recordLine+'\n')
+        recordCount += 1
+    file.flush() # readable while the project is checked
+    recordOutput = (file, outputFormat, recordCount)
+
+def emitResults(results):
+    # write the records of results to the open record output (no output: nothing to do)
+    if not recordOutput:
+        return
+    _writeRecordLines(_formatRecord(record) for record in getResultRecords(results))
+
+def emitRecords(records):
+    # write records as read by readRecords (e.g. kept of a previous run) to the open record output
+    if not recordOutput:
+        return
+    _writeRecordLines(json.dumps(record, ensure_ascii=False) for record in records)
+
+def readRecords(outputFile):
+    # => records (dicts) of an existing record output (ndjson or json, by extension), [] if none or unreadable
+    try:
+        with open(outputFile, encoding='utf-8') as file:
+            if outputFile.endswith('.json'):
+                return json.load(file)
+            return [json.loads(line) for line in file if line.strip()]
+    except (OSError, ValueError):
+        return []
+
+def openRecordOutput(outputFile, outputFormat):
+    global recordOutput
+    closeRecordOutput()
+    if outputFormat not in outputFormats:
+        raise ValueError(f'unknown record format: {outputFormat}')
+    recordOutput = (open(outputFile, 'w', encoding='utf-8'), outputFormat, 0)
+
+def closeRecordOutput():
+    global recordOutput
+    if not recordOutput:
+        return
+    (file, outputFormat, recordCount) = recordOutput
+    if outputFormat == 'json':
+        file.write('[]\n' if recordCount == 0 else '\n]\n')
+    file.close()
+    recordOutput = None
+
+@contextmanager
+def recordOutputFile(outputFile, outputFormat):
+    # records emitted during the run go to outputFile (outputFormat None = no record output)
+    if not outputFormat:
+        yield
+        return
+    openRecordOutput(outputFile, outputFormat)
+    try:
+        yield
+    finally:
+        closeRecordOutput()
@@ -1,5 +1,14 @@
 import subprocess
 import os
+import argparse
+import json
+import socket
+import hashlib
+import tempfile
+import time
+import urllib.parse
+import urllib.request
+from contextlib import contextmanager
 
 vnuHtmlOutputFilename = 'validatie-01_html-00_w3c.txt'
 vnuCssOutputFilename = 'validatie-02_css-00_w3c.txt'
@@ -8,17 +17,232 @@ okSuffix = '_OK'
 scriptDir = os.path.realpath(os.path.dirname(__file__))
 relPath = os.path.relpath(scriptDir, os.getcwd())
 
+excludeDirs = ['auto-validation','__MACOSX'] # same as the conventions-check (+ dot-directories)
+vnuHtmlExtensions = ('.html', '.htm', '.xhtml', '.xht') # all html-files vnu checked in a directory (conventions-check: only .html)
+vnuCssExtensions = ('.css',)
+vnuServiceStartTimeout = 60 # max. seconds to wait for the local vnu service
+vnuService = None # (process, url) of the running local vnu service (None = use 'java -jar')
+vnuCacheDir = os.path.join(os.path.expanduser('~'), '.cache', 'auto-validation', 'vnu')
+vnuCacheEnabled = True
+vnuJarChecksum = None # sha1 of vnu.jar (calculated once)
 
-def _checkVnuHtml(projectDir):
-    vnuHtmlCmdFile = os.path.join(relPath, 'vnu.jar')
-    vnuHtml = subprocess.run(['java', '-jar', vnuHtmlCmdFile, '--skip-non-html', '--errors-only', '--stdout', projectDir], capture_output=True)
-    result = vnuHtml.stdout.decode()
-    return result
-    
-def _checkVnuCss(projectDir):
-    vnuCssCmdFile = os.path.join(relPath, 'vnu.jar')
-    vnuHtml = subprocess.run(['java', '-jar', vnuCssCmdFile, '--skip-non-css', '--errors-only', '--stdout', projectDir], capture_output=True)
-    result = vnuHtml.stdout.decode()
+
+def _getAllFiles(dir, extensions):
+    # html/css of the project itself: same directories as the conventions-check, but all extensions of vnu
+    files = []
+    for entry in os.listdir(dir):
+        fullPath = os.path.join(dir, entry)
+        if os.path.isdir(fullPath):
+            if entry.startswith('.') or entry in excludeDirs:
+                continue
+            files += _getAllFiles(fullPath, extensions)
+        elif entry.lower().endswith(extensions):
+            files.append(fullPath)
+    return files
+
+def _getFileUrl(file):
+    return 'file:' + urllib.request.pathname2url(os.path.abspath(file))
+
+def _getUrlPath(fileUrl):
+    # file-url => normalized path (java keeps non-ascii characters in the url, pathname2url percent-encodes them)
+    return os.path.normcase(os.path.normpath(urllib.request.url2pathname(urllib.parse.urlparse(fileUrl).path)))
+
+def _checkVnuCmd(files):
+    # one 'java -jar vnu.jar' for all files, json-messages are read while vnu writes them
+    vnuCmdFile = os.path.join(relPath, 'vnu.jar')
+    vnu = subprocess.Popen(['java', '-jar', vnuCmdFile, '--also-check-css', '--errors-only', '--format', 'json', '--stdout'] + files, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    with vnu.stdout:
+        try:
+            messages = json.load(vnu.stdout).get('messages', [])
+        except ValueError:
+            messages = None # no (valid) output
+    vnu.wait()
+    return messages
+
+
+## VNU RESULTS CACHE ##
+def _getVnuJarChecksum():
+    global vnuJarChecksum
+    if not vnuJarChecksum:
+        jarHash = hashlib.sha1()
+        with open(os.path.join(scriptDir, 'vnu.jar'), 'rb') as jarFile:
+            for block in iter(lambda: jarFile.read(1 << 20), b''):
+                jarHash.update(block)
+        vnuJarChecksum = jarHash.hexdigest()
+    return vnuJarChecksum
+
+def _getCacheKey(file):
+    # None = don't use the cache (disabled, unreadable file or no vnu.jar)
+    if not vnuCacheEnabled:
+        return None
+    try:
+        with open(file, 'rb') as fileContent:
+            contentHash = hashlib.sha1(fileContent.read()).hexdigest()
+        fileType = 'css' if file.lower().endswith(vnuCssExtensions) else 'html'
+        return hashlib.sha1(f'{_getVnuJarChecksum()}:{fileType}:{contentHash}'.encode()).hexdigest()
+    except OSError:
+        return None
+
+def _getCacheFile(key):
+    return os.path.join(vnuCacheDir, key[:2], key + '.json')
+
+def _getCachedMessages(key):
+    # => messages of the file (without url) or None
+    if not key:
+        return None
+    try:
+        with open(_getCacheFile(key), encoding='utf-8') as cacheFile:
+            return json.load(cacheFile)
+    except (OSError, ValueError):
+        return None
+
+def _putCachedMessages(key, messages):
+    if not key:
+        return
+    cacheFile = _getCacheFile(key)
+    tempFile = None
+    try:
+        os.makedirs(os.path.dirname(cacheFile), exist_ok=True)
+        # write + rename: other runs never read a partial cache-file
+        (fileHandle, tempFile) = tempfile.mkstemp(dir=os.path.dirname(cacheFile), suffix='.tmp')
+        with os.fdopen(fileHandle, 'w', encoding='utf-8') as file:
+            json.dump(messages, file)
+        os.replace(tempFile, cacheFile)
+    except OSError: # cache is optional (read-only home, disk full, ...)
+        if tempFile and os.path.exists(tempFile):
+            os.remove(tempFile)
+
+
+## LOCAL VNU SERVICE ##
+def _getFreePort():
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def _isVnuServiceUp(url):
+    try:
+        with urllib.request.urlopen(url, timeout=1):
+            return True
+    except OSError:
+        return False
+
+def startVnuService():
+    # start vnu once as a local http-service (returns False if it can't be started)
+    global vnuService
+    if vnuService:
+        return True
+    vnuCmdFile = os.path.join(scriptDir, 'vnu.jar')
+    if not os.path.isfile(vnuCmdFile):
+        return False
+    port = _getFreePort()
+    url = 'http://127.0.0.1:{0}/'.format(port)
+    try:
+        process = subprocess.Popen(['java', '-cp', vnuCmdFile, '-Dnu.validator.servlet.bind-address=127.0.0.1', 'nu.validator.servlet.Main', str(port)], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    except OSError:
+        return False # no java
+    startTime = time.monotonic()
+    while time.monotonic() - startTime < vnuServiceStartTimeout:
+        if process.poll() is not None:
+            return False
+        if _isVnuServiceUp(url):
+            vnuService = (process, url)
+            return True
+        time.sleep(0.2)
+    process.kill()
+    process.wait()
+    return False
+
+def stopVnuService():
+    global vnuService
+    if not vnuService:
+        return
+    process = vnuService[0]
+    vnuService = None
+    process.terminate()
+    try:
+        process.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+@contextmanager
+def vnuServiceRunning(useService=True):
+    # keep the local vnu service running for the duration of a run (no-op if already running)
+    isStarted = useService and not vnuService and startVnuService()
+    try:
+        yield
+    finally:
+        if isStarted:
+            stopVnuService()
+
+def _formatVnuMessage(fileUrl, message):
+    # same 'gnu'-format as the vnu.jar command line
+    location = ''
+    if 'lastLine' in message:
+        firstLine = message.get('firstLine', message['lastLine'])
+        firstColumn = message.get('firstColumn', message.get('lastColumn', 0))
+        location = '{0}.{1}-{2}.{3}:'.format(firstLine, firstColumn, message['lastLine'], message.get('lastColumn', 0))
+    messageType = message.get('type', 'error')
+    if message.get('subType'):
+        messageType += ' ' + message['subType']
+    return '"{0}":{1} {2}: {3}\n'.format(fileUrl, location, messageType, message.get('message', ''))
+
+def _checkVnuServiceFiles(files):
+    messages = []
+    for file in files:
+        contentType = 'text/css' if file.lower().endswith(vnuCssExtensions) else 'text/html'
+        with open(file, 'rb') as fileContent:
+            request = urllib.request.Request(vnuService[1] + '?out=json&level=error', data=fileContent.read(), headers={'Content-Type': contentType + '; charset=utf-8'})
+        with urllib.request.urlopen(request) as response:
+            fileMessages = json.load(response).get('messages', [])
+        fileUrl = _getFileUrl(file)
+        for message in fileMessages:
+            message['url'] = fileUrl
+        messages += fileMessages
+    return messages
+
+def _checkVnuFiles(files):
+    # => messages or None (vnu failed)
+    # use the local vnu service if it's running, else fallback to 'java -jar vnu.jar'
+    if vnuService:
+        try:
+            return _checkVnuServiceFiles(files)
+        except OSError:
+            stopVnuService() # service died => fallback for the rest of the run
+    return _checkVnuCmd(files)
+
+def _checkVnu(projectDir):
+    # check all html- and css-files at once and split the messages by file type
+    files = _getAllFiles(projectDir, vnuHtmlExtensions + vnuCssExtensions)
+    # only new or changed files are sent to vnu, the messages of the others come from the cache
+    cacheKeys = {file: _getCacheKey(file) for file in files}
+    fileMessages = {file: _getCachedMessages(cacheKeys[file]) for file in files}
+    uncheckedFiles = [file for file in files if fileMessages[file] is None]
+    otherMessages = [] # messages not about one of the files
+    if uncheckedFiles:
+        messages = _checkVnuFiles(uncheckedFiles)
+        filePaths = {os.path.normcase(os.path.abspath(file)): file for file in uncheckedFiles}
+        for file in uncheckedFiles:
+            fileMessages[file] = []
+        for message in messages or []:
+            fileUrl = message.pop('url', None)
+            filePath = _getUrlPath(fileUrl) if fileUrl and fileUrl.startswith('file:') else None
+            if filePath in filePaths:
+                fileMessages[filePaths[filePath]].append(message)
+            else:
+                otherMessages.append((fileUrl or '', message))
+        if messages is not None and not otherMessages:
+            for file in uncheckedFiles:
+                _putCachedMessages(cacheKeys[file], fileMessages[file])
+    # same order as the files
+    result = {'html':'', 'css':''}
+    for file in files:
+        fileType = 'css' if file.lower().endswith(vnuCssExtensions) else 'html'
+        fileUrl = _getFileUrl(file)
+        for message in fileMessages[file]:
+            result[fileType] += _formatVnuMessage(fileUrl, message)
+    for (fileUrl, message) in otherMessages:
+        result['html'] += _formatVnuMessage(fileUrl, message)
     return result
 
 
@@ -44,40 +268,41 @@ def _writeToOutputFile(outputFile, content):
 
 ## MODULE (when imported as module) ##
 def checkProject(projectDir, outputToFile=True):
+    result = _checkVnu(projectDir)
     if outputToFile:
         htmlOutputFile = os.path.join(projectDir, vnuHtmlOutputFilename)
         _clearOutputFile(htmlOutputFile)
-    htmlResult = _checkVnuHtml(projectDir)
-    if outputToFile:
-        _writeToOutputFile(htmlOutputFile, htmlResult)
-
-    if outputToFile:
+        _writeToOutputFile(htmlOutputFile, result['html'])
         cssOutputFile = os.path.join(projectDir, vnuCssOutputFilename)
         _clearOutputFile(cssOutputFile)
-    cssResult = _checkVnuCss(projectDir)
-    if outputToFile:
-        _writeToOutputFile(cssOutputFile, cssResult)
-    
-    return {'html':htmlResult, 'css':cssResult}
+        _writeToOutputFile(cssOutputFile, result['css'])
+    return result
 
 
 ## MAIN (executed as standalone script) ##
 def main():
-    outputDir = os.getcwd()
+    # script execution arguments
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--bulk', help='Check subdirectories as seperate projects', action='store_true')
+    parser.add_argument('--no-cache', help='Don\'t use (or fill) the cache of vnu-results per file', action='store_true')
+    parser.add_argument('--daemon', help='Start vnu once as local service for all projects (fallback: java -jar per project)', action='store_true')
+    args = parser.parse_args()
+    global vnuCacheEnabled
+    vnuCacheEnabled = not args.no_cache
 
-    projectDir = '.'
+    outputDir = os.getcwd()
 
-    print('== HTML check ==')
-    htmlOutputFile = os.path.join(outputDir, vnuHtmlOutputFilename)
-    _clearOutputFile(htmlOutputFile)
-    htmlResult = _checkVnuHtml(projectDir)
-    _writeToOutputFile(htmlOutputFile, htmlResult)
+    with vnuServiceRunning(args.daemon):
+        if args.bulk:
+            for entry in sorted(os.listdir(outputDir)):
+                fullPath = os.path.join(outputDir, entry)
+                if os.path.isdir(fullPath) and not entry.startswith('.'):
+                    print('== Syntax check: {0} =='.format(entry))
+                    checkProject(fullPath)
+            return
 
-    print('== CSS check ==')
-    cssOutputFile = os.path.join(outputDir, vnuCssOutputFilename)
-    _clearOutputFile(cssOutputFile)
-    cssResult = _checkVnuCss(projectDir)
-    _writeToOutputFile(cssOutputFile, cssResult)
+        print('== HTML & CSS check ==')
+        checkProject(outputDir)
 
 
 if __name__ == "__main__":